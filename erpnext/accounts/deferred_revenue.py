@@ -20,6 +20,7 @@ from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 )
 from erpnext.accounts.utils import get_account_currency
 
+DEFERRED_ACCOUNTING_BATCH_SIZE = 500
 
 def validate_service_stop_date(doc):
 	''' Validates service_stop_date for Purchase Invoice and Sales Invoice '''
@@ -77,9 +78,7 @@ def convert_deferred_expense_to_expense(deferred_process, start_date=None, end_d
 	'''.format(conditions), (end_date, start_date)) #nosec
 
 	# For each invoice, book deferred expense
-	for invoice in invoices:
-		doc = frappe.get_doc("Purchase Invoice", invoice)
-		book_deferred_income_or_expense(doc, deferred_process, end_date)
+	book_deferred_entries_for_invoices("Purchase Invoice", invoices, deferred_process, end_date)
 
 	if frappe.flags.deferred_accounting_error:
 		send_mail(deferred_process)
@@ -102,42 +101,93 @@ def convert_deferred_revenue_to_income(deferred_process, start_date=None, end_da
 		{0}
 	'''.format(conditions), (end_date, start_date)) #nosec
 
-	for invoice in invoices:
-		doc = frappe.get_doc("Sales Invoice", invoice)
-		book_deferred_income_or_expense(doc, deferred_process, end_date)
+	book_deferred_entries_for_invoices("Sales Invoice", invoices, deferred_process, end_date)
 
 	if frappe.flags.deferred_accounting_error:
 		send_mail(deferred_process)
 
-def get_booking_dates(doc, item, posting_date=None):
+def book_deferred_entries_for_invoices(doctype, invoices, deferred_process, posting_date):
+	"""Book deferred income/expense for the invoices, reading the amounts booked so far in batches"""
+	settings = get_deferred_accounting_settings()
+
+	for i in range(0, len(invoices), DEFERRED_ACCOUNTING_BATCH_SIZE):
+		batch = invoices[i:i + DEFERRED_ACCOUNTING_BATCH_SIZE]
+		booked_amounts = get_booked_amounts(doctype, batch)
+
+		for invoice in batch:
+			doc = frappe.get_doc(doctype, invoice)
+			book_deferred_income_or_expense(doc, deferred_process, posting_date,
+				booked_amounts=booked_amounts, settings=settings)
+
+def get_deferred_accounting_settings():
+	return frappe._dict({
+		"via_journal_entry": cint(frappe.db.get_singles_value('Accounts Settings', 'book_deferred_entries_via_journal_entry')),
+		"submit_journal_entry": cint(frappe.db.get_singles_value('Accounts Settings', 'submit_journal_entries')),
+		"book_deferred_entries_based_on": frappe.db.get_singles_value('Accounts Settings', 'book_deferred_entries_based_on'),
+		"accounts_frozen_upto": frappe.get_cached_value('Accounts Settings', 'None', 'acc_frozen_upto')
+	})
+
+def get_deferred_account_field(doctype):
+	return "deferred_revenue_account" if doctype == "Sales Invoice" else "deferred_expense_account"
+
+def get_booked_amounts(doctype, invoices):
+	"""
+		Returns the amounts booked so far from the deferred accounts and the date booked till,
+		for all items of the invoices, by (item row, account)
+	"""
+	if not invoices:
+		return {}
+
+	dr_or_cr = "debit" if doctype == "Sales Invoice" else "credit"
+	booked_amounts = {}
+
+	gl_entries = frappe.db.sql('''
+		select voucher_detail_no as detail_no, account, company, max(posting_date) as posting_date,
+			sum({0}) as amount, sum({0}_in_account_currency) as amount_in_account_currency
+		from `tabGL Entry`
+		where voucher_type=%s and voucher_no in %s and is_cancelled = 0
+		group by voucher_detail_no, account, company
+	'''.format(dr_or_cr), (doctype, invoices), as_dict=True)
+
+	journal_entries = frappe.db.sql('''
+		SELECT c.reference_detail_no as detail_no, c.account, p.company, max(p.posting_date) as posting_date,
+			sum(c.{0}) as amount, sum(c.{0}_in_account_currency) as amount_in_account_currency
+		FROM `tabJournal Entry` p, `tabJournal Entry Account` c
+		WHERE p.name = c.parent and c.reference_type=%s and c.reference_name in %s and c.docstatus < 2
+		group by c.reference_detail_no, c.account, p.company
+	'''.format(dr_or_cr), (doctype, invoices), as_dict=True)
+
+	for d in list(gl_entries) + list(journal_entries):
+		booked = get_booked_amount_for(booked_amounts, d.company, d.detail_no, d.account)
+		if not booked.posting_date or booked.posting_date < d.posting_date:
+			booked.posting_date = d.posting_date
+		booked.amount += flt(d.amount)
+		booked.amount_in_account_currency += flt(d.amount_in_account_currency)
+
+	return booked_amounts
+
+def get_booked_amount_for(booked_amounts, company, detail_no, account):
+	return booked_amounts.setdefault((company, detail_no, account),
+		frappe._dict(posting_date=None, amount=0.0, amount_in_account_currency=0.0))
+
+def get_item_booked_amount(doc, item, booked_amounts=None):
+	if booked_amounts is None:
+		booked_amounts = get_booked_amounts(doc.doctype, [doc.name])
+
+	return get_booked_amount_for(booked_amounts, doc.company, item.name,
+		item.get(get_deferred_account_field(doc.doctype)))
+
+def get_booking_dates(doc, item, posting_date=None, booked=None):
 	if not posting_date:
 		posting_date = add_days(today(), -1)
 
 	last_gl_entry = False
 
-	deferred_account = "deferred_revenue_account" if doc.doctype=="Sales Invoice" else "deferred_expense_account"
-
-	prev_gl_entry = frappe.db.sql('''
-		select name, posting_date from `tabGL Entry` where company=%s and account=%s and
-		voucher_type=%s and voucher_no=%s and voucher_detail_no=%s
-		and is_cancelled = 0
-		order by posting_date desc limit 1
-	''', (doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-
-	prev_gl_via_je = frappe.db.sql('''
-		SELECT p.name, p.posting_date FROM `tabJournal Entry` p, `tabJournal Entry Account` c
-		WHERE p.name = c.parent and p.company=%s and c.account=%s
-		and c.reference_type=%s and c.reference_name=%s
-		and c.reference_detail_no=%s and c.docstatus < 2 order by posting_date desc limit 1
-	''', (doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-
-	if prev_gl_via_je:
-		if (not prev_gl_entry) or (prev_gl_entry and
-			prev_gl_entry[0].posting_date < prev_gl_via_je[0].posting_date):
-			prev_gl_entry = prev_gl_via_je
-
-	if prev_gl_entry:
-		start_date = getdate(add_days(prev_gl_entry[0].posting_date, 1))
+	if booked is None:
+		booked = get_item_booked_amount(doc, item)
+
+	if booked.posting_date:
+		start_date = getdate(add_days(booked.posting_date, 1))
 	else:
 		start_date = item.service_start_date
 
@@ -157,7 +207,8 @@ def get_booking_dates(doc, item, posting_date=None):
 	else:
 		return None, None, None
 
-def calculate_monthly_amount(doc, item, last_gl_entry, start_date, end_date, total_days, total_booking_days, account_currency):
+def calculate_monthly_amount(doc, item, last_gl_entry, start_date, end_date, total_days, total_booking_days, account_currency,
+	booked=None):
 	amount, base_amount = 0, 0
 
 	if not last_gl_entry:
@@ -169,7 +220,7 @@ def calculate_monthly_amount(doc, item, last_gl_entry, start_date, end_date, tot
 
 		actual_months = rounded(total_months * prorate_factor, 1)
 
-		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item)
+		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item, booked)
 		base_amount = flt(item.base_net_amount / actual_months, item.precision("base_net_amount"))
 
 		if base_amount + already_booked_amount > item.base_net_amount:
@@ -189,7 +240,7 @@ def calculate_monthly_amount(doc, item, last_gl_entry, start_date, end_date, tot
 			base_amount = rounded(partial_month, 1) * base_amount
 			amount = rounded(partial_month, 1) * amount
 	else:
-		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item)
+		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item, booked)
 		base_amount = flt(item.base_net_amount - already_booked_amount, item.precision("base_net_amount"))
 		if account_currency==doc.company_currency:
 			amount = base_amount
@@ -198,7 +249,7 @@ def calculate_monthly_amount(doc, item, last_gl_entry, start_date, end_date, tot
 
 	return amount, base_amount
 
-def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, account_currency):
+def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, account_currency, booked=None):
 	amount, base_amount = 0, 0
 	if not last_gl_entry:
 		base_amount = flt(item.base_net_amount*total_booking_days/flt(total_days), item.precision("base_net_amount"))
@@ -207,7 +258,7 @@ def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, a
 		else:
 			amount = flt(item.net_amount*total_booking_days/flt(total_days), item.precision("net_amount"))
 	else:
-		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item)
+		already_booked_amount, already_booked_amount_in_account_currency = get_already_booked_amount(doc, item, booked)
 
 		base_amount = flt(item.base_net_amount - already_booked_amount, item.precision("base_net_amount"))
 		if account_currency==doc.company_currency:
@@ -217,50 +268,32 @@ def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, a
 
 	return amount, base_amount
 
-def get_already_booked_amount(doc, item):
-	if doc.doctype == "Sales Invoice":
-		total_credit_debit, total_credit_debit_currency = "debit", "debit_in_account_currency"
-		deferred_account = "deferred_revenue_account"
-	else:
-		total_credit_debit, total_credit_debit_currency = "credit", "credit_in_account_currency"
-		deferred_account = "deferred_expense_account"
-
-	gl_entries_details = frappe.db.sql('''
-		select sum({0}) as total_credit, sum({1}) as total_credit_in_account_currency, voucher_detail_no
-		from `tabGL Entry` where company=%s and account=%s and voucher_type=%s and voucher_no=%s and voucher_detail_no=%s
-		and is_cancelled = 0
-		group by voucher_detail_no
-	'''.format(total_credit_debit, total_credit_debit_currency),
-		(doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-
-	journal_entry_details = frappe.db.sql('''
-		SELECT sum(c.{0}) as total_credit, sum(c.{1}) as total_credit_in_account_currency, reference_detail_no
-		FROM `tabJournal Entry` p , `tabJournal Entry Account` c WHERE p.name = c.parent and
-		p.company = %s and c.account=%s and c.reference_type=%s and c.reference_name=%s and c.reference_detail_no=%s
-		and p.docstatus < 2 group by reference_detail_no
-	'''.format(total_credit_debit, total_credit_debit_currency),
-		(doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-
-	already_booked_amount = gl_entries_details[0].total_credit if gl_entries_details else 0
-	already_booked_amount += journal_entry_details[0].total_credit if journal_entry_details else 0
+def get_already_booked_amount(doc, item, booked=None):
+	if booked is None:
+		booked = get_item_booked_amount(doc, item)
+
+	already_booked_amount = booked.amount
 
 	if doc.currency == doc.company_currency:
 		already_booked_amount_in_account_currency = already_booked_amount
 	else:
-		already_booked_amount_in_account_currency = gl_entries_details[0].total_credit_in_account_currency if gl_entries_details else 0
-		already_booked_amount_in_account_currency += journal_entry_details[0].total_credit_in_account_currency if journal_entry_details else 0
+		already_booked_amount_in_account_currency = booked.amount_in_account_currency
 
 	return already_booked_amount, already_booked_amount_in_account_currency
 
-def book_deferred_income_or_expense(doc, deferred_process, posting_date=None):
+def book_deferred_income_or_expense(doc, deferred_process, posting_date=None, booked_amounts=None, settings=None):
 	enable_check = "enable_deferred_revenue" \
 		if doc.doctype=="Sales Invoice" else "enable_deferred_expense"
 
-	accounts_frozen_upto = frappe.get_cached_value('Accounts Settings', 'None', 'acc_frozen_upto')
+	settings = settings or get_deferred_accounting_settings()
+	if booked_amounts is None:
+		booked_amounts = get_booked_amounts(doc.doctype, [doc.name])
+
+	# GL Entries of all items, by posting date, to be posted together
+	gl_entries_by_date = {}
 
-	def _book_deferred_revenue_or_expense(item, via_journal_entry, submit_journal_entry, book_deferred_entries_based_on):
-		start_date, end_date, last_gl_entry = get_booking_dates(doc, item, posting_date=posting_date)
-		if not (start_date and end_date): return
+	def _book_deferred_revenue_or_expense(item):
+		booked = get_item_booked_amount(doc, item, booked_amounts)
 
 		account_currency = get_account_currency(item.expense_account or item.income_account)
 		if doc.doctype == "Sales Invoice":
@@ -271,43 +304,70 @@ def book_deferred_income_or_expense(doc, deferred_process, posting_date=None):
 			credit_account, debit_account = item.deferred_expense_account, item.expense_account
 
 		total_days = date_diff(item.service_end_date, item.service_start_date) + 1
-		total_booking_days = date_diff(end_date, start_date) + 1
 
-		if book_deferred_entries_based_on == 'Months':
-			amount, base_amount = calculate_monthly_amount(doc, item, last_gl_entry,
-				start_date, end_date, total_days, total_booking_days, account_currency)
-		else:
-			amount, base_amount = calculate_amount(doc, item, last_gl_entry,
-				total_days, total_booking_days, account_currency)
+		# book each period till the posting date, keeping the booked amount up to date in memory
+		while True:
+			start_date, end_date, last_gl_entry = get_booking_dates(doc, item, posting_date=posting_date, booked=booked)
+			if not (start_date and end_date): return
 
-		if not amount:
-			return
+			total_booking_days = date_diff(end_date, start_date) + 1
 
-		# check if books nor frozen till endate:
-		if accounts_frozen_upto and (end_date) <= getdate(accounts_frozen_upto):
-			end_date = get_last_day(add_days(accounts_frozen_upto, 1))
+			if settings.book_deferred_entries_based_on == 'Months':
+				amount, base_amount = calculate_monthly_amount(doc, item, last_gl_entry,
+					start_date, end_date, total_days, total_booking_days, account_currency, booked=booked)
+			else:
+				amount, base_amount = calculate_amount(doc, item, last_gl_entry,
+					total_days, total_booking_days, account_currency, booked=booked)
 
-		if via_journal_entry:
-			book_revenue_via_journal_entry(doc, credit_account, debit_account, against, amount,
-				base_amount, end_date, project, account_currency, item.cost_center, item, deferred_process, submit_journal_entry)
-		else:
-			make_gl_entries(doc, credit_account, debit_account, against,
-				amount, base_amount, end_date, project, account_currency, item.cost_center, item, deferred_process)
+			if not amount:
+				return
 
-		# Returned in case of any errors because it tries to submit the same record again and again in case of errors
-		if frappe.flags.deferred_accounting_error:
-			return
+			# check if books nor frozen till endate:
+			if settings.accounts_frozen_upto and (end_date) <= getdate(settings.accounts_frozen_upto):
+				end_date = get_last_day(add_days(settings.accounts_frozen_upto, 1))
+
+			if settings.via_journal_entry:
+				journal_entry = book_revenue_via_journal_entry(doc, credit_account, debit_account, against, amount,
+					base_amount, end_date, project, account_currency, item.cost_center, item, deferred_process,
+					settings.submit_journal_entry)
 
-		if getdate(end_date) < getdate(posting_date) and not last_gl_entry:
-			_book_deferred_revenue_or_expense(item, via_journal_entry, submit_journal_entry, book_deferred_entries_based_on)
+				# Returned in case of any errors because it tries to submit the same record again and again in case of errors
+				if not journal_entry or frappe.flags.deferred_accounting_error:
+					return
+
+				booked_entries = journal_entry.get("accounts", {"reference_detail_no": item.name})
+			else:
+				booked_entries = get_deferred_gl_entries(doc, credit_account, debit_account, against,
+					amount, base_amount, end_date, project, account_currency, item.cost_center, item, deferred_process)
+				gl_entries_by_date.setdefault(getdate(end_date), []).extend(booked_entries)
 
-	via_journal_entry = cint(frappe.db.get_singles_value('Accounts Settings', 'book_deferred_entries_via_journal_entry'))
-	submit_journal_entry = cint(frappe.db.get_singles_value('Accounts Settings', 'submit_journal_entries'))
-	book_deferred_entries_based_on = frappe.db.get_singles_value('Accounts Settings', 'book_deferred_entries_based_on')
+			update_booked_amount(doc, item, booked, booked_entries, end_date)
+
+			if not (getdate(end_date) < getdate(posting_date) and not last_gl_entry):
+				return
 
 	for item in doc.get('items'):
 		if item.get(enable_check):
-			_book_deferred_revenue_or_expense(item, via_journal_entry, submit_journal_entry, book_deferred_entries_based_on)
+			_book_deferred_revenue_or_expense(item)
+
+	for date in sorted(gl_entries_by_date):
+		post_deferred_gl_entries(doc, gl_entries_by_date[date])
+
+		# later periods are not booked after a failed one, they are picked up in the next run
+		if frappe.flags.deferred_accounting_error:
+			break
+
+def update_booked_amount(doc, item, booked, entries, posting_date):
+	"""Add the amounts booked from the deferred account to the booked amount of the item"""
+	deferred_account = item.get(get_deferred_account_field(doc.doctype))
+	dr_or_cr = "debit" if doc.doctype == "Sales Invoice" else "credit"
+
+	for d in entries:
+		if d.account == deferred_account:
+			booked.amount += flt(d.get(dr_or_cr))
+			booked.amount_in_account_currency += flt(d.get(dr_or_cr + "_in_account_currency"))
+
+	booked.posting_date = getdate(posting_date)
 
 def process_deferred_accounting(posting_date=None):
 	''' Converts deferred income/expense into income/expense
@@ -340,11 +400,15 @@ def process_deferred_accounting(posting_date=None):
 
 def make_gl_entries(doc, credit_account, debit_account, against,
 	amount, base_amount, posting_date, project, account_currency, cost_center, item, deferred_process=None):
-	# GL Entry for crediting the amount in the deferred expense
-	from erpnext.accounts.general_ledger import make_gl_entries
-
 	if amount == 0: return
 
+	gl_entries = get_deferred_gl_entries(doc, credit_account, debit_account, against,
+		amount, base_amount, posting_date, project, account_currency, cost_center, item, deferred_process)
+	post_deferred_gl_entries(doc, gl_entries)
+
+def get_deferred_gl_entries(doc, credit_account, debit_account, against,
+	amount, base_amount, posting_date, project, account_currency, cost_center, item, deferred_process=None):
+	# GL Entry for crediting the amount in the deferred expense
 	gl_entries = []
 	gl_entries.append(
 		doc.get_gl_dict({
@@ -376,6 +440,11 @@ def make_gl_entries(doc, credit_account, debit_account, against,
 		}, account_currency, item=item)
 	)
 
+	return gl_entries
+
+def post_deferred_gl_entries(doc, gl_entries):
+	from erpnext.accounts.general_ledger import make_gl_entries
+
 	if gl_entries:
 		try:
 			make_gl_entries(gl_entries, cancel=(doc.docstatus == 2), merge_entries=True)
@@ -453,6 +522,7 @@ def book_revenue_via_journal_entry(doc, credit_account, debit_account, against,
 			journal_entry.submit()
 
 		frappe.db.commit()
+		return journal_entry
 	except Exception:
 		frappe.db.rollback()
 		traceback = frappe.get_traceback()
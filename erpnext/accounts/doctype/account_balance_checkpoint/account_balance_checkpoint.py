@@ -0,0 +1,150 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, flt, get_first_day, get_last_day, getdate
+
+BALANCE_FIELDS = ("debit", "credit", "debit_in_account_currency", "credit_in_account_currency")
+
+
+class AccountBalanceCheckpoint(Document):
+	"""
+		Debit and credit posted in a month against an account (and party).
+		Every GL posting inserts its own rows, so postings never wait on each
+		other for a checkpoint. Balances are read by adding up the rows of a
+		month, and `fold_balance_checkpoints` merges them into one row per month.
+	"""
+	pass
+
+
+def update_balance_checkpoints(gl_entries, cancel=False):
+	"""Add the amounts of the given GL Entries to their checkpoints, or remove them on cancel"""
+	checkpoints = {}
+	for gle in gl_entries:
+		# reversal entries are cancelled themselves, only the original entries count
+		if gle.get("is_cancelled") or not gle.get("account"):
+			continue
+
+		# like get_balance_on, profit and loss balances do not include the closing entries
+		if (gle.get("voucher_type") == "Period Closing Voucher"
+			and frappe.get_cached_value("Account", gle.get("account"), "report_type") == "Profit and Loss"):
+			continue
+
+		key = (gle.get("company"), gle.get("account"), gle.get("party_type") or "", gle.get("party") or "",
+			get_first_day(gle.get("posting_date")))
+
+		amounts = checkpoints.setdefault(key, dict.fromkeys(BALANCE_FIELDS, 0.0))
+		for fieldname in BALANCE_FIELDS:
+			amounts[fieldname] += (-1 if cancel else 1) * flt(gle.get(fieldname))
+
+	# insert only, the rows of a month are folded together later
+	for key, amounts in checkpoints.items():
+		make_balance_checkpoint(*key, amounts)
+
+
+def make_balance_checkpoint(company, account, party_type, party, period_start_date, amounts):
+	checkpoint = frappe.new_doc("Account Balance Checkpoint")
+	checkpoint.update({
+		"company": company,
+		"account": account,
+		"party_type": party_type or None,
+		"party": party or None,
+		"period_start_date": period_start_date
+	})
+	checkpoint.update(amounts)
+	checkpoint.owner = frappe.session.user
+	checkpoint.set_new_name()
+	checkpoint.db_insert()
+
+
+def fold_balance_checkpoints(commit=True):
+	"""Merge the rows inserted by GL postings into one checkpoint per account, party and month"""
+	keys = frappe.db.sql("""
+		select company, account, ifnull(party_type, '') as party_type, ifnull(party, '') as party,
+			period_start_date
+		from `tabAccount Balance Checkpoint`
+		group by company, account, ifnull(party_type, ''), ifnull(party, ''), period_start_date
+		having count(*) > 1""", as_dict=1)
+
+	for key in keys:
+		checkpoints = frappe.db.sql("""
+			select name, debit, credit, debit_in_account_currency, credit_in_account_currency
+			from `tabAccount Balance Checkpoint`
+			where account = %(account)s and ifnull(party_type, '') = %(party_type)s
+				and ifnull(party, '') = %(party)s and period_start_date = %(period_start_date)s
+				and company = %(company)s""", key, as_dict=1)
+
+		# only the rows read here are replaced, rows posted meanwhile are folded in the next run
+		frappe.db.sql("""delete from `tabAccount Balance Checkpoint` where name in %s""",
+			([d.name for d in checkpoints],))
+
+		make_balance_checkpoint(key.company, key.account, key.party_type, key.party, key.period_start_date,
+			{fieldname: sum(flt(d[fieldname]) for d in checkpoints) for fieldname in BALANCE_FIELDS})
+
+		if commit:
+			frappe.db.commit()
+
+
+def remove_voucher_from_balance_checkpoints(voucher_type, voucher_no):
+	"""To be called before the GL Entries of a voucher are deleted"""
+	gl_entries = frappe.db.sql("""
+		select company, account, party_type, party, posting_date, voucher_type, is_cancelled,
+			debit, credit, debit_in_account_currency, credit_in_account_currency
+		from `tabGL Entry`
+		where voucher_type = %s and voucher_no = %s and is_cancelled = 0""", (voucher_type, voucher_no), as_dict=1)
+
+	update_balance_checkpoints(gl_entries, cancel=True)
+
+
+def get_checkpoint_periods(date=None, from_date=None):
+	"""
+		Returns the range of checkpoint periods (by start date) that lie entirely within
+		`from_date` and `date`, the rest of the range has to be read from the GL Entries
+	"""
+	from_period = None
+	if from_date:
+		from_date = getdate(from_date)
+		from_period = from_date if from_date == get_first_day(from_date) \
+			else add_days(get_last_day(from_date), 1)
+
+	to_period = None
+	if date:
+		date = getdate(date)
+		to_period = get_first_day(date) if date == get_last_day(date) \
+			else get_first_day(add_days(get_first_day(date), -1))
+
+	return from_period, to_period
+
+
+def rebuild_balance_checkpoints(company=None):
+	"""Recreate the checkpoints from the GL Entries"""
+	conditions = ""
+	if company:
+		conditions = " and company = %(company)s"
+
+	frappe.db.sql("delete from `tabAccount Balance Checkpoint` where 1=1 {0}".format(conditions),
+		{"company": company})
+
+	gl_entries = frappe.db.sql("""
+		select company, account, ifnull(party_type, '') as party_type, ifnull(party, '') as party,
+			year(posting_date) as year, month(posting_date) as month,
+			sum(debit) as debit, sum(credit) as credit,
+			sum(debit_in_account_currency) as debit_in_account_currency,
+			sum(credit_in_account_currency) as credit_in_account_currency
+		from `tabGL Entry` gle
+		where is_cancelled = 0
+			and (voucher_type != 'Period Closing Voucher' or exists(select 1 from `tabAccount` ac
+				where ac.name = gle.account and ac.report_type != 'Profit and Loss'))
+			{0}
+		group by company, account, ifnull(party_type, ''), ifnull(party, ''), year(posting_date), month(posting_date)
+	""".format(conditions), {"company": company}, as_dict=1)
+
+	for d in gl_entries:
+		make_balance_checkpoint(d.company, d.account, d.party_type, d.party,
+			getdate("{0}-{1:02d}-01".format(d.year, d.month)), {fieldname: flt(d[fieldname]) for fieldname in BALANCE_FIELDS})
+
+
+def on_doctype_update():
+	frappe.db.add_index("Account Balance Checkpoint", ["account", "period_start_date"])
+	frappe.db.add_index("Account Balance Checkpoint", ["party_type", "party", "period_start_date"])
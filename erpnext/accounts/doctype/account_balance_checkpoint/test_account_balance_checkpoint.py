@@ -0,0 +1,50 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+from frappe.utils import add_days, flt, get_first_day, nowdate
+
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	fold_balance_checkpoints,
+	rebuild_balance_checkpoints,
+)
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.utils import get_balance_on
+
+
+class TestAccountBalanceCheckpoint(unittest.TestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_ledger_balance(self, account, date):
+		return flt(frappe.db.sql("""select sum(debit) - sum(credit) from `tabGL Entry`
+			where account = %s and posting_date <= %s and is_cancelled = 0""", (account, date))[0][0])
+
+	def test_balance_from_checkpoints(self):
+		account = "_Test Bank - _TC"
+		last_month = add_days(get_first_day(nowdate()), -1)
+
+		make_journal_entry(account, "_Test Cash - _TC", 100, posting_date=add_days(last_month, -3), submit=True)
+		make_journal_entry(account, "_Test Cash - _TC", 50, posting_date=nowdate(), submit=True)
+		jv = make_journal_entry(account, "_Test Cash - _TC", 30, posting_date=last_month, submit=True)
+
+		for date in (add_days(last_month, -1), last_month, nowdate()):
+			self.assertEqual(get_balance_on(account, date), self.get_ledger_balance(account, date))
+
+		jv.cancel()
+		self.assertEqual(get_balance_on(account, nowdate()), self.get_ledger_balance(account, nowdate()))
+
+		# postings only insert rows, folding leaves one row per month with the same balance
+		fold_balance_checkpoints(commit=False)
+		self.assertFalse(frappe.db.sql("""select 1 from `tabAccount Balance Checkpoint`
+			group by company, account, ifnull(party_type, ''), ifnull(party, ''), period_start_date
+			having count(*) > 1"""))
+		for date in (add_days(last_month, -1), last_month, nowdate()):
+			self.assertEqual(get_balance_on(account, date), self.get_ledger_balance(account, date))
+
+		# rebuilt checkpoints match the ones maintained with the entries
+		balance = get_balance_on(account, last_month)
+		rebuild_balance_checkpoints("_Test Company")
+		self.assertEqual(get_balance_on(account, last_month), balance)
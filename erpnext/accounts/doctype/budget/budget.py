@@ -11,7 +11,7 @@ from frappe.utils import add_months, flt, fmt_money, get_last_day, getdate
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 )
-from erpnext.accounts.utils import get_fiscal_year
+from erpnext.accounts.utils import get_cached, get_fiscal_year, local_cache
 
 
 class BudgetError(frappe.ValidationError): pass
@@ -88,6 +88,24 @@ class Budget(Document):
 			or self.applicable_on_purchase_order or self.applicable_on_booking_actual_expenses):
 			self.applicable_on_booking_actual_expenses = 1
 
+BUDGET_ARGS_FIELDS = ('doctype', 'company', 'fiscal_year', 'posting_date', 'account', 'expense_account',
+	'item_code', 'item_group', 'cost_center', 'project')
+
+def validate_expenses_against_budget(args_list):
+	"""
+		Validates the lines of a document together. Lines with the same account, budget dimensions
+		and item are checked once, and budgets and amounts are looked up once for the document.
+	"""
+	dimensions = get_accounting_dimensions()
+
+	with local_cache():
+		validated = set()
+		for args in args_list:
+			key = tuple(args.get(field) for field in BUDGET_ARGS_FIELDS + tuple(dimensions))
+			if key not in validated:
+				validated.add(key)
+				validate_expense_against_budget(args)
+
 def validate_expense_against_budget(args):
 	args = frappe._dict(args)
 
@@ -105,44 +123,50 @@ def validate_expense_against_budget(args):
 	if not args.account:
 		return
 
-	for budget_against in ['project', 'cost_center'] + get_accounting_dimensions():
-		if (args.get(budget_against) and args.account
-				and frappe.db.get_value("Account", {"name": args.account, "root_type": "Expense"})):
+	if frappe.get_cached_value("Account", args.account, "root_type") != "Expense":
+		return
 
+	for budget_against in ['project', 'cost_center'] + get_accounting_dimensions():
+		if args.get(budget_against):
 			doctype = frappe.unscrub(budget_against)
 
-			if frappe.get_cached_value('DocType', doctype, 'is_tree'):
-				lft, rgt = frappe.db.get_value(doctype, args.get(budget_against), ["lft", "rgt"])
-				condition = """and exists(select name from `tab%s`
-					where lft<=%s and rgt>=%s and name=b.%s)""" % (doctype, lft, rgt, budget_against) #nosec
-				args.is_tree = True
-			else:
-				condition = "and b.%s=%s" % (budget_against, frappe.db.escape(args.get(budget_against)))
-				args.is_tree = False
-
+			args.is_tree = bool(frappe.get_cached_value('DocType', doctype, 'is_tree'))
 			args.budget_against_field = budget_against
 			args.budget_against_doctype = doctype
 
-			budget_records = frappe.db.sql("""
-				select
-					b.{budget_against_field} as budget_against, ba.budget_amount, b.monthly_distribution,
-					ifnull(b.applicable_on_material_request, 0) as for_material_request,
-					ifnull(applicable_on_purchase_order, 0) as for_purchase_order,
-					ifnull(applicable_on_booking_actual_expenses,0) as for_actual_expenses,
-					b.action_if_annual_budget_exceeded, b.action_if_accumulated_monthly_budget_exceeded,
-					b.action_if_annual_budget_exceeded_on_mr, b.action_if_accumulated_monthly_budget_exceeded_on_mr,
-					b.action_if_annual_budget_exceeded_on_po, b.action_if_accumulated_monthly_budget_exceeded_on_po
-				from
-					`tabBudget` b, `tabBudget Account` ba
-				where
-					b.name=ba.parent and b.fiscal_year=%s
-					and ba.account=%s and b.docstatus=1
-					{condition}
-			""".format(condition=condition, budget_against_field=budget_against), (args.fiscal_year, args.account), as_dict=True) #nosec
+			budget_records = get_cached(('budget_records', args.fiscal_year, args.account, budget_against,
+				args.get(budget_against)), get_budget_records, args)
 
 			if budget_records:
 				validate_budget_records(args, budget_records)
 
+def get_budget_records(args):
+	budget_against = args.budget_against_field
+
+	if args.is_tree:
+		lft, rgt = frappe.db.get_value(args.budget_against_doctype, args.get(budget_against), ["lft", "rgt"])
+		condition = """and exists(select name from `tab%s`
+			where lft<=%s and rgt>=%s and name=b.%s)""" % (args.budget_against_doctype, lft, rgt, budget_against) #nosec
+	else:
+		condition = "and b.%s=%s" % (budget_against, frappe.db.escape(args.get(budget_against)))
+
+	return frappe.db.sql("""
+			select
+				b.{budget_against_field} as budget_against, ba.budget_amount, b.monthly_distribution,
+				ifnull(b.applicable_on_material_request, 0) as for_material_request,
+				ifnull(applicable_on_purchase_order, 0) as for_purchase_order,
+				ifnull(applicable_on_booking_actual_expenses,0) as for_actual_expenses,
+				b.action_if_annual_budget_exceeded, b.action_if_accumulated_monthly_budget_exceeded,
+				b.action_if_annual_budget_exceeded_on_mr, b.action_if_accumulated_monthly_budget_exceeded_on_mr,
+				b.action_if_annual_budget_exceeded_on_po, b.action_if_accumulated_monthly_budget_exceeded_on_po
+			from
+				`tabBudget` b, `tabBudget Account` ba
+			where
+				b.name=ba.parent and b.fiscal_year=%s
+				and ba.account=%s and b.docstatus=1
+				{condition}
+		""".format(condition=condition, budget_against_field=budget_against), (args.fiscal_year, args.account), as_dict=True) #nosec
+
 def validate_budget_records(args, budget_records):
 	for budget in budget_records:
 		if flt(budget.budget_amount):
@@ -150,7 +174,8 @@ def validate_budget_records(args, budget_records):
 			yearly_action, monthly_action = get_actions(args, budget)
 
 			if monthly_action in ["Stop", "Warn"]:
-				budget_amount = get_accumulated_monthly_budget(budget.monthly_distribution,
+				budget_amount = get_cached(('monthly_budget', budget.monthly_distribution, args.posting_date,
+					args.fiscal_year, budget.budget_amount), get_accumulated_monthly_budget, budget.monthly_distribution,
 					args.posting_date, args.fiscal_year, budget.budget_amount)
 
 				args["month_end_date"] = get_last_day(args.posting_date)
@@ -164,7 +189,7 @@ def validate_budget_records(args, budget_records):
 						_("Annual"), yearly_action, budget.budget_against, amount)
 
 def compare_expense_with_budget(args, budget_amount, action_for, action, budget_against, amount=0):
-	actual_expense = amount or get_actual_expense(args)
+	actual_expense = amount or get_cached_actual_expense(args)
 	if actual_expense > budget_amount:
 		diff = actual_expense - budget_amount
 		currency = frappe.get_cached_value('Company',  args.company,  'default_currency')
@@ -202,14 +227,58 @@ def get_amount(args, budget):
 	amount = 0
 
 	if args.get('doctype') == 'Material Request' and budget.for_material_request:
-		amount = (get_requested_amount(args, budget)
-			+ get_ordered_amount(args, budget) + get_actual_expense(args))
+		amount = (get_cached(get_amount_key('requested_amount', args), get_requested_amount, args, budget)
+			+ get_cached(get_amount_key('ordered_amount', args), get_ordered_amount, args, budget)
+			+ get_cached_actual_expense(args))
 
 	elif args.get('doctype') == 'Purchase Order' and budget.for_purchase_order:
-		amount = get_ordered_amount(args, budget) + get_actual_expense(args)
+		amount = (get_cached(get_amount_key('ordered_amount', args), get_ordered_amount, args, budget)
+			+ get_cached_actual_expense(args))
 
 	return amount
 
+def get_amount_key(amount_type, args):
+	return (amount_type, args.get('item_code'), args.get('expense_account'), args.get('budget_against_field'),
+		args.get(args.get('budget_against_field')), args.get('fiscal_year'))
+
+def get_cached_actual_expense(args):
+	"""
+		Actual expense against the budget dimension of the line. The expense of the account is read
+		once per dimension for all its values, and the lines of the document add up their own values.
+	"""
+	key = ('actual_expense', args.get('account'), args.get('company'), args.get('fiscal_year'),
+		args.get('month_end_date'), args.get('budget_against_field'))
+	expenses = get_cached(key, get_actual_expense_by_dimension, args)
+
+	budget_against = args.get(args.get('budget_against_field'))
+
+	if args.is_tree:
+		lft, rgt = frappe.get_cached_value(args.budget_against_doctype, budget_against, ["lft", "rgt"])
+		return flt(sum(flt(d.amount) for d in expenses if d.lft >= lft and d.rgt <= rgt))
+
+	return flt(sum(flt(d.amount) for d in expenses if d.budget_against == budget_against))
+
+def get_actual_expense_by_dimension(args):
+	budget_against_field = args.get('budget_against_field')
+	condition = " and gle.posting_date <= %(month_end_date)s" \
+		if args.get("month_end_date") else ""
+
+	tree_fields = ", dim.lft, dim.rgt" if args.is_tree else ""
+
+	return frappe.db.sql("""
+		select gle.{budget_against_field} as budget_against, sum(gle.debit) - sum(gle.credit) as amount
+			{tree_fields}
+		from `tabGL Entry` gle, `tab{doctype}` dim
+		where dim.name = gle.{budget_against_field}
+			and gle.account=%(account)s
+			{condition}
+			and gle.fiscal_year=%(fiscal_year)s
+			and gle.company=%(company)s
+			and gle.docstatus=1
+		group by gle.{budget_against_field} {tree_fields}
+	""".format(budget_against_field=budget_against_field, doctype=args.budget_against_doctype, #nosec
+		tree_fields=tree_fields, condition=condition), args, as_dict=True)
+
 def get_requested_amount(args, budget):
 	item_code = args.get('item_code')
 	condition = get_other_condition(args, budget, 'Material Request')
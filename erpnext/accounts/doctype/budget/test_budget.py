@@ -2,11 +2,17 @@
 # See license.txt
 
 import unittest
+from unittest.mock import patch
 
 import frappe
-from frappe.utils import now_datetime, nowdate
-
-from erpnext.accounts.doctype.budget.budget import BudgetError, get_actual_expense
+from frappe.utils import flt, now_datetime, nowdate
+
+from erpnext.accounts.doctype.budget.budget import (
+	BudgetError,
+	get_actual_expense,
+	get_actual_expense_by_dimension,
+	get_cached_actual_expense,
+)
 from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
 from erpnext.accounts.utils import get_fiscal_year
 from erpnext.buying.doctype.purchase_order.test_purchase_order import create_purchase_order
@@ -146,6 +152,65 @@ class TestBudget(unittest.TestCase):
 
 		budget.cancel()
 
+	def test_yearly_budget_crossed_by_multiple_rows(self):
+		set_total_expense_zero(nowdate(), "cost_center")
+
+		budget = make_budget(budget_against="Cost Center")
+
+		jv = make_journal_entry("_Test Account Cost for Goods Sold - _TC",
+			"_Test Bank - _TC", 150000, "_Test Cost Center - _TC", posting_date=nowdate(), save=False)
+		jv.append("accounts", {
+			"account": "_Test Account Cost for Goods Sold - _TC",
+			"cost_center": "_Test Cost Center - _TC",
+			"debit_in_account_currency": 100000
+		})
+		jv.accounts[1].credit_in_account_currency = 250000
+		jv.insert()
+
+		# each row is within the budget, together they cross it
+		self.assertRaises(BudgetError, jv.submit)
+
+		budget.cancel()
+
+	def test_actual_expense_read_once_for_all_cost_centers(self):
+		set_total_expense_zero(nowdate(), "cost_center")
+		set_total_expense_zero(nowdate(), "cost_center", "_Test Cost Center 2 - _TC")
+
+		budget = make_budget(budget_against="Cost Center", cost_center="_Test Company - _TC")
+
+		jv = make_journal_entry("_Test Account Cost for Goods Sold - _TC",
+			"_Test Bank - _TC", 50000, "_Test Cost Center - _TC", posting_date=nowdate(), save=False)
+		jv.append("accounts", {
+			"account": "_Test Account Cost for Goods Sold - _TC",
+			"cost_center": "_Test Cost Center 2 - _TC",
+			"debit_in_account_currency": 50000
+		})
+		jv.accounts[1].credit_in_account_currency = 100000
+		jv.insert()
+
+		with patch("erpnext.accounts.doctype.budget.budget.get_actual_expense_by_dimension",
+			wraps=get_actual_expense_by_dimension) as expense_query:
+			jv.submit()
+
+		# one ledger scan for both cost centers of the voucher
+		self.assertEqual(expense_query.call_count, 1)
+
+		for cost_center in ("_Test Cost Center - _TC", "_Test Cost Center 2 - _TC", "_Test Company - _TC"):
+			args = frappe._dict({
+				"account": "_Test Account Cost for Goods Sold - _TC",
+				"company": "_Test Company",
+				"fiscal_year": get_fiscal_year(nowdate())[0],
+				"budget_against_field": "cost_center",
+				"budget_against_doctype": "Cost Center",
+				"is_tree": True,
+				"cost_center": cost_center
+			})
+			self.assertEqual(flt(get_cached_actual_expense(args), 2), flt(get_actual_expense(args), 2))
+
+		budget.load_from_db()
+		budget.cancel()
+		jv.cancel()
+
 	def test_yearly_budget_crossed_stop2(self):
 		set_total_expense_zero(nowdate(), "project")
 
@@ -60,8 +60,13 @@ class GLEntry(Document):
 			if (self.against_voucher_type in ['Journal Entry', 'Sales Invoice', 'Purchase Invoice', 'Fees']
 				and self.against_voucher and self.flags.update_outstanding == 'Yes'
 				and not frappe.flags.is_reverse_depr_entry):
-					update_outstanding_amt(self.account, self.party_type, self.party, self.against_voucher_type,
-						self.against_voucher)
+					if frappe.flags.pending_outstanding_updates is not None:
+						# collected and updated once per voucher by the caller
+						frappe.flags.pending_outstanding_updates.add((self.account, self.party_type, self.party,
+							self.against_voucher_type, self.against_voucher))
+					else:
+						update_outstanding_amt(self.account, self.party_type, self.party, self.against_voucher_type,
+							self.against_voucher)
 
 	def check_mandatory(self):
 		mandatory = ['account','voucher_type','voucher_no','company']
@@ -2,8 +2,12 @@
 # For license information, please see license.txt
 
 
+import frappe
 from frappe.model.document import Document
 
 
 class JournalEntryAccount(Document):
 	pass
+
+def on_doctype_update():
+	frappe.db.add_index("Journal Entry Account", ["reference_type", "reference_name"])
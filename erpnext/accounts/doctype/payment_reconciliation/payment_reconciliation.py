@@ -2,10 +2,12 @@
 # For license information, please see license.txt
 
 
+from collections import deque
+
 import frappe
 from frappe import _, msgprint
 from frappe.model.document import Document
-from frappe.utils import flt, getdate, nowdate, today
+from frappe.utils import cint, flt, getdate, nowdate, today
 
 import erpnext
 from erpnext.accounts.utils import get_outstanding_invoices, reconcile_against_document
@@ -76,10 +78,12 @@ class PaymentReconciliation(Document):
 					ELSE {bank_account_condition}
 				END)
 			order by t1.posting_date
+			{limit_cond}
 			""".format(**{
 				"dr_or_cr": dr_or_cr,
 				"bank_account_condition": bank_account_condition,
-				"condition": condition
+				"condition": condition,
+				"limit_cond": "limit %s" % cint(self.payment_limit) if self.payment_limit else ""
 			}), {
 				"party_type": self.party_type,
 				"party": self.party,
@@ -116,8 +120,10 @@ class PaymentReconciliation(Document):
 			Having
 				amount > 0
 			ORDER BY doc.posting_date
+			{limit_cond}
 		""".format(
 			doc=voucher_type,
+			limit_cond="limit %s" % cint(self.payment_limit) if self.payment_limit else "",
 			dr_or_cr=dr_or_cr,
 			reconciled_dr_or_cr=reconciled_dr_or_cr,
 			party_type_field=frappe.scrub(self.party_type),
@@ -142,7 +148,7 @@ class PaymentReconciliation(Document):
 		condition = self.get_conditions(get_invoices=True)
 
 		non_reconciled_invoices = get_outstanding_invoices(self.party_type, self.party,
-			self.receivable_payable_account, condition=condition)
+			self.receivable_payable_account, condition=condition, limit=self.invoice_limit)
 
 		if self.invoice_limit:
 			non_reconciled_invoices = non_reconciled_invoices[:self.invoice_limit]
@@ -165,26 +171,17 @@ class PaymentReconciliation(Document):
 	@frappe.whitelist()
 	def allocate_entries(self, args):
 		self.validate_entries()
+		payments = [frappe._dict(d) for d in args.get('payments')]
+		invoices = [frappe._dict(d) for d in args.get('invoices')]
+
+		for pay in payments:
+			pay.unreconciled_amount = pay.amount
+
 		entries = []
-		for pay in args.get('payments'):
-			pay.update({'unreconciled_amount': pay.get('amount')})
-			for inv in args.get('invoices'):
-				if pay.get('amount') >= inv.get('outstanding_amount'):
-					res = self.get_allocated_entry(pay, inv, inv['outstanding_amount'])
-					pay['amount'] = flt(pay.get('amount')) - flt(inv.get('outstanding_amount'))
-					inv['outstanding_amount'] = 0
-				else:
-					res = self.get_allocated_entry(pay, inv, pay['amount'])
-					inv['outstanding_amount'] = flt(inv.get('outstanding_amount')) - flt(pay.get('amount'))
-					pay['amount'] = 0
-				if pay.get('amount') == 0:
-					entries.append(res)
-					break
-				elif inv.get('outstanding_amount') == 0:
-					entries.append(res)
-					continue
-			else:
-				break
+		if self.allocation_method == "Exact Amount First":
+			entries.extend(self.allocate_exact_amounts(payments, invoices))
+
+		entries.extend(self.allocate_oldest_first(payments, invoices))
 
 		self.set('allocation', [])
 		for entry in entries:
@@ -192,6 +189,55 @@ class PaymentReconciliation(Document):
 				row = self.append('allocation', {})
 				row.update(entry)
 
+	def allocate_exact_amounts(self, payments, invoices):
+		"""Allocate payments against the oldest invoice having the same outstanding amount"""
+		precision = self.get_allocation_precision()
+
+		invoices_by_amount = {}
+		for inv in invoices:
+			invoices_by_amount.setdefault(flt(inv.outstanding_amount, precision), deque()).append(inv)
+
+		entries = []
+		for pay in payments:
+			matching_invoices = invoices_by_amount.get(flt(pay.amount, precision))
+			if not matching_invoices or flt(pay.amount, precision) <= 0:
+				continue
+
+			inv = matching_invoices.popleft()
+			entries.append(self.get_allocated_entry(pay, inv, flt(inv.outstanding_amount)))
+			pay.amount = 0
+			inv.outstanding_amount = 0
+
+		return entries
+
+	def allocate_oldest_first(self, payments, invoices):
+		"""Allocate payments against invoices in FIFO order, walking both lists once"""
+		precision = self.get_allocation_precision()
+
+		entries = []
+		pay_idx, inv_idx = 0, 0
+		while pay_idx < len(payments) and inv_idx < len(invoices):
+			pay, inv = payments[pay_idx], invoices[inv_idx]
+
+			if flt(pay.amount, precision) <= 0:
+				pay_idx += 1
+				continue
+
+			if flt(inv.outstanding_amount, precision) <= 0:
+				inv_idx += 1
+				continue
+
+			allocated_amount = min(flt(pay.amount), flt(inv.outstanding_amount))
+			entries.append(self.get_allocated_entry(pay, inv, allocated_amount))
+
+			pay.amount = flt(pay.amount) - allocated_amount
+			inv.outstanding_amount = flt(inv.outstanding_amount) - allocated_amount
+
+		return entries
+
+	def get_allocation_precision(self):
+		return frappe.get_precision("Payment Reconciliation Allocation", "allocated_amount") or 2
+
 	def get_allocated_entry(self, pay, inv, allocated_amount):
 		return frappe._dict({
 			'reference_type': pay.get('reference_type'),
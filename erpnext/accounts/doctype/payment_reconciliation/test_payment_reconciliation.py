@@ -1,9 +1,55 @@
 # Copyright (c) 2021, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
 import unittest
 
+import frappe
+
 
 class TestPaymentReconciliation(unittest.TestCase):
-	pass
+	def get_reconciliation(self, payments, invoices, allocation_method="Oldest First"):
+		"""Returns the reconciliation with `payments` and `invoices` fetched and allocated"""
+		pr = frappe.new_doc("Payment Reconciliation")
+		pr.allocation_method = allocation_method
+		for row in payments:
+			pr.append("payments", dict(row))
+		for row in invoices:
+			pr.append("invoices", dict(row))
+
+		pr.allocate_entries({"payments": payments, "invoices": invoices})
+		return pr
+
+	def test_allocate_oldest_first(self):
+		pr = self.get_reconciliation([
+			{"reference_type": "Payment Entry", "reference_name": "PE-1", "amount": 100},
+			{"reference_type": "Payment Entry", "reference_name": "PE-2", "amount": 50}
+		], [
+			{"invoice_type": "Sales Invoice", "invoice_number": "SI-1", "outstanding_amount": 60},
+			{"invoice_type": "Sales Invoice", "invoice_number": "SI-2", "outstanding_amount": 70},
+			{"invoice_type": "Sales Invoice", "invoice_number": "SI-3", "outstanding_amount": 30}
+		])
+
+		allocation = [(d.reference_name, d.invoice_number, d.allocated_amount) for d in pr.allocation]
+		self.assertEqual(allocation, [
+			("PE-1", "SI-1", 60),
+			("PE-1", "SI-2", 40),
+			("PE-2", "SI-2", 30),
+			("PE-2", "SI-3", 20)
+		])
+		self.assertEqual(pr.allocation[1].amount, 40)
+		self.assertEqual(pr.allocation[1].unreconciled_amount, 100)
+
+	def test_allocate_exact_amount_first(self):
+		pr = self.get_reconciliation([
+			{"reference_type": "Payment Entry", "reference_name": "PE-1", "amount": 70},
+			{"reference_type": "Payment Entry", "reference_name": "PE-2", "amount": 60}
+		], [
+			{"invoice_type": "Sales Invoice", "invoice_number": "SI-1", "outstanding_amount": 60},
+			{"invoice_type": "Sales Invoice", "invoice_number": "SI-2", "outstanding_amount": 70}
+		], allocation_method="Exact Amount First")
+
+		allocation = [(d.reference_name, d.invoice_number, d.allocated_amount) for d in pr.allocation]
+		self.assertEqual(allocation, [
+			("PE-1", "SI-2", 70),
+			("PE-2", "SI-1", 60)
+		])
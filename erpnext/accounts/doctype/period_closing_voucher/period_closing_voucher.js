@@ -33,6 +33,17 @@ frappe.ui.form.on('Period Closing Voucher', {
 				frappe.set_route("query-report", "General Ledger");
 			}, "fa fa-table");
 		}
+
+		if (frm.doc.docstatus === 1 && frm.doc.gle_processing_status === "In Progress") {
+			frm.dashboard.set_headline(__("Closing entries are being posted in the background."));
+		}
+
+		// a job stopped without updating the status leaves it in progress, the server checks for one running
+		if (frm.doc.docstatus === 1 && ["Failed", "In Progress"].includes(frm.doc.gle_processing_status)) {
+			frm.add_custom_button(__('Resume Closing Entries'), function() {
+				frm.call("resume_gle_processing").then(() => frm.reload_doc());
+			});
+		}
 	}
 
 })
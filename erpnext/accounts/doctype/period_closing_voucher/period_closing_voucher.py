@@ -13,6 +13,10 @@ from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 from erpnext.accounts.utils import get_account_currency
 from erpnext.controllers.accounts_controller import AccountsController
 
+# closings with more balances than this are posted in a background job
+BACKGROUND_CLOSING_THRESHOLD = 5000
+# balances posted and committed together in a background job
+CLOSING_CHUNK_SIZE = 1000
 
 class PeriodClosingVoucher(AccountsController):
 	def validate(self):
@@ -20,9 +24,20 @@ class PeriodClosingVoucher(AccountsController):
 		self.validate_posting_date()
 
 	def on_submit(self):
-		self.make_gl_entries()
+		self.db_set("gle_processing_status", "In Progress")
+
+		pl_balances = self.get_pl_balances()
+		if len(pl_balances) > BACKGROUND_CLOSING_THRESHOLD:
+			self.enqueue_gl_entries()
+		else:
+			self.make_gl_entries(pl_balances)
+			self.db_set("gle_processing_status", "Completed")
 
 	def on_cancel(self):
+		if self.is_gle_processing_running():
+			frappe.throw(_("Closing entries of {0} are being posted, please try again once they are done")
+				.format(self.name))
+
 		self.ignore_linked_doctypes = ('GL Entry', 'Stock Ledger Entry')
 		from erpnext.accounts.general_ledger import make_reverse_gl_entries
 		make_reverse_gl_entries(voucher_type="Period Closing Voucher", voucher_no=self.name)
@@ -53,15 +68,67 @@ class PeriodClosingVoucher(AccountsController):
 			frappe.throw(_("Another Period Closing Entry {0} has been made after {1}")
 				.format(pce[0][0], self.posting_date))
 
-	def make_gl_entries(self):
-		gl_entries = self.get_gl_entries()
-		if gl_entries:
-			from erpnext.accounts.general_ledger import make_gl_entries
-			make_gl_entries(gl_entries)
-
-	def get_gl_entries(self):
+	def enqueue_gl_entries(self):
+		frappe.enqueue(process_gl_entries, queue="long", timeout=3600, enqueue_after_commit=True,
+			job_name=self.get_gle_processing_job_name(), voucher_name=self.name, now=frappe.flags.in_test)
+		frappe.msgprint(_("The closing entries will be posted in the background, it can take a few minutes."),
+			alert=True)
+
+	@frappe.whitelist()
+	def resume_gle_processing(self):
+		"""Post the closing entries left unposted by a failed or killed background job"""
+		self.check_permission("submit")
+		if (self.docstatus != 1 or self.gle_processing_status not in ("Failed", "In Progress")
+			or self.is_gle_processing_running()):
+			frappe.throw(_("Only the closing entries of a submitted voucher that failed or stopped can be resumed"))
+
+		self.db_set("gle_processing_status", "In Progress")
+		self.enqueue_gl_entries()
+
+	def get_gle_processing_job_name(self):
+		return "period_closing_voucher::" + self.name
+
+	def is_gle_processing_running(self):
+		"""
+			Returns if the closing entries are being posted. A job killed by its timeout or a worker
+			restart leaves the status in progress with no job queued or running, which can be resumed.
+		"""
+		from frappe.utils.background_jobs import get_jobs
+
+		if self.gle_processing_status != "In Progress":
+			return False
+
+		jobs = get_jobs(site=frappe.local.site, queue="long", key="job_name")
+		return self.get_gle_processing_job_name() in jobs.get(frappe.local.site, [])
+
+	def make_gl_entries(self, pl_balances=None, chunk_size=None, commit=False):
+		"""
+			Post the closing entries, in chunks of balances when `chunk_size` is given.
+			Balances that were closed already are zero and so are not posted again.
+		"""
+		from erpnext.accounts.general_ledger import make_gl_entries
+
+		if pl_balances is None:
+			pl_balances = self.get_pl_balances()
+
+		if not pl_balances:
+			return
+
+		chunk_size = chunk_size or len(pl_balances)
+		for i in range(0, len(pl_balances), chunk_size):
+			gl_entries = self.get_gl_entries(pl_balances[i:i + chunk_size])
+			if gl_entries:
+				make_gl_entries(gl_entries)
+
+			if commit:
+				frappe.db.commit()
+				frappe.publish_progress(min(i + chunk_size, len(pl_balances)) * 100 / len(pl_balances),
+					title=_("Posting Closing Entries..."), doctype=self.doctype, docname=self.name)
+
+	def get_gl_entries(self, pl_accounts=None):
 		gl_entries = []
-		pl_accounts = self.get_pl_balances()
+		if pl_accounts is None:
+			pl_accounts = self.get_pl_balances()
 
 		for acc in pl_accounts:
 			if flt(acc.bal_in_company_currency):
@@ -110,14 +177,17 @@ class PeriodClosingVoucher(AccountsController):
 		if not self.accounting_dimensions:
 			self.accounting_dimensions = get_accounting_dimensions()
 
-		_, default_dimensions = get_dimensions()
+		if self.get("default_dimensions") is None:
+			_, default_dimensions = get_dimensions()
+			self.default_dimensions = default_dimensions.get(self.company, {})
+
 		for dimension in self.accounting_dimensions:
 			gl_entry.update({
-				dimension: default_dimensions.get(self.company, {}).get(dimension)
+				dimension: self.default_dimensions.get(dimension)
 			})
 
 	def get_pl_balances(self):
-		"""Get balance for dimension-wise pl accounts"""
+		"""Get non-zero balance for dimension-wise pl accounts"""
 
 		dimension_fields = ['t1.cost_center', 't1.finance_book']
 
@@ -135,4 +205,21 @@ class PeriodClosingVoucher(AccountsController):
 			and t2.docstatus < 2 and t2.company = %s
 			and t1.posting_date between %s and %s
 			group by t1.account, {dimension_fields}
+			having bal_in_company_currency != 0
 		""".format(dimension_fields = ', '.join(dimension_fields)), (self.company, self.get("year_start_date"), self.posting_date), as_dict=1)
+
+def process_gl_entries(voucher_name):
+	"""Post the closing entries of the Period Closing Voucher in committed chunks"""
+	pcv = frappe.get_doc("Period Closing Voucher", voucher_name)
+
+	try:
+		pcv.make_gl_entries(chunk_size=CLOSING_CHUNK_SIZE, commit=True)
+		pcv.db_set("gle_processing_status", "Completed")
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title=_("Error while processing Period Closing Voucher {0}").format(voucher_name),
+			message=frappe.get_traceback())
+		pcv.db_set("gle_processing_status", "Failed")
+
+	frappe.db.commit()
+	pcv.notify_update()
@@ -10,6 +10,9 @@ from frappe.utils import today
 
 from erpnext.accounts.doctype.finance_book.test_finance_book import create_finance_book
 from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.doctype.period_closing_voucher.period_closing_voucher import (
+	process_gl_entries,
+)
 from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
 from erpnext.accounts.utils import get_fiscal_year, now
 
@@ -152,6 +155,39 @@ class TestPeriodClosingVoucher(unittest.TestCase):
 
 		self.assertEqual(pcv_gle, expected_gle)
 
+	def test_resume_closing_entries(self):
+		frappe.db.sql("delete from `tabGL Entry` where company='Test PCV Company'")
+
+		company = create_company()
+		cost_center = create_cost_center("Test Cost Center 1")
+
+		jv = make_journal_entry(
+			amount=400,
+			account1="Cash - TPC",
+			account2="Sales - TPC",
+			cost_center=cost_center,
+			posting_date=now(),
+			save=False
+		)
+		jv.company = company
+		jv.save()
+		jv.submit()
+
+		pcv = self.make_period_closing_voucher()
+		self.assertEqual(pcv.gle_processing_status, "Completed")
+		gl_entries = frappe.db.count("GL Entry", {"voucher_no": pcv.name})
+
+		# balances closed already are not posted again
+		process_gl_entries(pcv.name)
+		self.assertEqual(frappe.db.count("GL Entry", {"voucher_no": pcv.name}), gl_entries)
+		self.assertEqual(frappe.db.get_value("Period Closing Voucher", pcv.name, "gle_processing_status"), "Completed")
+
+		# a job that died without updating the status leaves it in progress, with no job queued
+		pcv.db_set("gle_processing_status", "In Progress")
+		pcv.resume_gle_processing()
+		self.assertEqual(frappe.db.count("GL Entry", {"voucher_no": pcv.name}), gl_entries)
+		self.assertEqual(frappe.db.get_value("Period Closing Voucher", pcv.name, "gle_processing_status"), "Completed")
+
 	def make_period_closing_voucher(self, submit=True):
 		surplus_account = create_account()
 		cost_center = create_cost_center("Test Cost Center 1")
@@ -50,3 +50,8 @@ class TestProcessDeferredAccounting(unittest.TestCase):
 		]
 
 		check_gl_entries(self, si.name, expected_gle, "2019-01-10")
+
+		# amounts already booked are not booked again
+		gl_entries = frappe.db.count("GL Entry", {"voucher_no": si.name, "is_cancelled": 0})
+		frappe.copy_doc(process_deferred_accounting).submit()
+		self.assertEqual(frappe.db.count("GL Entry", {"voucher_no": si.name, "is_cancelled": 0}), gl_entries)
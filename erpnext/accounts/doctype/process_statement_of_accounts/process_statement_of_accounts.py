@@ -10,6 +10,7 @@ from frappe.model.document import Document
 from frappe.utils import add_days, add_months, format_date, getdate, today
 from frappe.utils.jinja import validate_template
 from frappe.utils.pdf import get_pdf
+from frappe.utils.redis_wrapper import RedisWrapper
 from frappe.www.printview import get_print_style
 
 from erpnext import get_company_currency
@@ -38,70 +39,23 @@ class ProcessStatementOfAccounts(Document):
 			self.from_date = add_months(self.to_date, -1 * self.filter_duration)
 
 
-def get_report_pdf(doc, consolidated=True):
-	statement_dict = {}
-	ageing = ''
-	base_template_path = "frappe/www/printview.html"
-	template_path = "erpnext/accounts/doctype/process_statement_of_accounts/process_statement_of_accounts.html"
+# customers whose statements are rendered and mailed by one background job
+STATEMENT_BATCH_SIZE = 100
 
-	for entry in doc.customers:
-		if doc.include_ageing:
-			ageing_filters = frappe._dict({
-				'company': doc.company,
-				'report_date': doc.to_date,
-				'ageing_based_on': doc.ageing_based_on,
-				'range1': 30,
-				'range2': 60,
-				'range3': 90,
-				'range4': 120,
-				'customer': entry.customer
-			})
-			col1, ageing = get_ageing(ageing_filters)
-
-			if ageing:
-				ageing[0]['ageing_based_on'] = doc.ageing_based_on
-
-		tax_id = frappe.get_doc('Customer', entry.customer).tax_id
-		presentation_currency = get_party_account_currency('Customer', entry.customer, doc.company) \
-				or doc.currency or get_company_currency(doc.company)
-		if doc.letter_head:
-			from frappe.www.printview import get_letter_head
-			letter_head = get_letter_head(doc, 0)
-
-		filters= frappe._dict({
-			'from_date': doc.from_date,
-			'to_date': doc.to_date,
-			'company': doc.company,
-			'finance_book': doc.finance_book if doc.finance_book else None,
-			'account': [doc.account] if doc.account else None,
-			'party_type': 'Customer',
-			'party': [entry.customer],
-			'presentation_currency': presentation_currency,
-			'group_by': doc.group_by,
-			'currency': doc.currency,
-			'cost_center': [cc.cost_center_name for cc in doc.cost_center],
-			'project': [p.project_name for p in doc.project],
-			'show_opening_entries': 0,
-			'include_default_book_entries': 0,
-			'tax_id': tax_id if tax_id else None
-		})
-		col, res = get_soa(filters)
-
-		for x in [0, -2, -1]:
-			res[x]['account'] = res[x]['account'].replace("'","")
+def get_report_pdf(doc, consolidated=True, customers=None, ageing=None):
+	statement_dict = {}
 
-		if len(res) == 3:
-			continue
+	if customers is None:
+		customers = get_customers_with_ledger_entries(doc)
+	if ageing is None:
+		ageing = get_ageing_for_customers(doc, customers)
 
-		html = frappe.render_template(template_path, \
-			{"filters": filters, "data": res, "ageing": ageing[0] if (doc.include_ageing and ageing) else None,
-				"letter_head": letter_head if doc.letter_head else None,
-				"terms_and_conditions": frappe.db.get_value('Terms and Conditions', doc.terms_and_conditions, 'terms')
-					if doc.terms_and_conditions else None})
+	context = get_statement_context(doc, customers)
 
-		html = frappe.render_template(base_template_path, {"body": html, \
-			"css": get_print_style(), "title": "Statement For " + entry.customer})
-		statement_dict[entry.customer] = html
+	for customer in customers:
+		html = get_statement_html(doc, customer, context, ageing.get(customer))
+		if html:
+			statement_dict[customer] = html
 
 	if not bool(statement_dict):
 		return False
@@ -113,6 +67,113 @@ def get_report_pdf(doc, consolidated=True):
 			statement_dict[customer]=get_pdf(statement_html, {'orientation': doc.orientation})
 		return statement_dict
 
+def get_customers_with_ledger_entries(doc):
+	"""Returns the selected customers with General Ledger entries in the period, others have no statement"""
+	selected = [entry.customer for entry in doc.customers]
+	if not selected:
+		return []
+
+	with_entries = set(frappe.db.sql_list("""
+		select distinct party from `tabGL Entry`
+		where company = %(company)s and party_type = 'Customer' and party in %(customers)s
+			and posting_date between %(from_date)s and %(to_date)s and is_cancelled = 0""", {
+		'company': doc.company,
+		'customers': selected,
+		'from_date': doc.from_date,
+		'to_date': doc.to_date
+	}))
+
+	return [customer for customer in selected if customer in with_entries]
+
+def get_ageing_for_customers(doc, customers):
+	"""Returns {customer: ageing row}, from one run of Accounts Receivable Summary for all customers"""
+	if not doc.include_ageing or not customers:
+		return {}
+
+	ageing_filters = frappe._dict({
+		'company': doc.company,
+		'report_date': doc.to_date,
+		'ageing_based_on': doc.ageing_based_on,
+		'range1': 30,
+		'range2': 60,
+		'range3': 90,
+		'range4': 120
+	})
+	if len(customers) == 1:
+		ageing_filters.customer = customers[0]
+
+	col, ageing = get_ageing(ageing_filters)
+
+	customers = set(customers)
+	ageing_map = {}
+	for row in ageing or []:
+		if row.get('party') in customers:
+			row['ageing_based_on'] = doc.ageing_based_on
+			ageing_map[row.get('party')] = row
+
+	return ageing_map
+
+def get_statement_context(doc, customers):
+	"""Returns what is common to the statements of the customers"""
+	context = frappe._dict({
+		'tax_ids': {},
+		'letter_head': None,
+		'terms_and_conditions': frappe.db.get_value('Terms and Conditions', doc.terms_and_conditions, 'terms')
+			if doc.terms_and_conditions else None,
+		'css': get_print_style()
+	})
+
+	if doc.letter_head:
+		from frappe.www.printview import get_letter_head
+		context.letter_head = get_letter_head(doc, 0)
+
+	for i in range(0, len(customers), 1000):
+		context.tax_ids.update(frappe.get_all('Customer', filters={'name': ['in', customers[i:i + 1000]]},
+			fields=['name', 'tax_id'], as_list=1))
+
+	return context
+
+def get_statement_html(doc, customer, context, ageing=None):
+	base_template_path = "frappe/www/printview.html"
+	template_path = "erpnext/accounts/doctype/process_statement_of_accounts/process_statement_of_accounts.html"
+
+	tax_id = context.tax_ids.get(customer)
+	presentation_currency = get_party_account_currency('Customer', customer, doc.company) \
+			or doc.currency or get_company_currency(doc.company)
+
+	filters= frappe._dict({
+		'from_date': doc.from_date,
+		'to_date': doc.to_date,
+		'company': doc.company,
+		'finance_book': doc.finance_book if doc.finance_book else None,
+		'account': [doc.account] if doc.account else None,
+		'party_type': 'Customer',
+		'party': [customer],
+		'presentation_currency': presentation_currency,
+		'group_by': doc.group_by,
+		'currency': doc.currency,
+		'cost_center': [cc.cost_center_name for cc in doc.cost_center],
+		'project': [p.project_name for p in doc.project],
+		'show_opening_entries': 0,
+		'include_default_book_entries': 0,
+		'tax_id': tax_id if tax_id else None
+	})
+	col, res = get_soa(filters)
+
+	for x in [0, -2, -1]:
+		res[x]['account'] = res[x]['account'].replace("'","")
+
+	if len(res) == 3:
+		return
+
+	html = frappe.render_template(template_path, \
+		{"filters": filters, "data": res, "ageing": ageing if doc.include_ageing else None,
+			"letter_head": context.letter_head,
+			"terms_and_conditions": context.terms_and_conditions})
+
+	return frappe.render_template(base_template_path, {"body": html, \
+		"css": context.css, "title": "Statement For " + customer})
+
 def get_customers_based_on_territory_or_customer_group(customer_collection, collection_name):
 	fields_dict = {
 		'Customer Group': 'customer_group',
@@ -258,34 +319,72 @@ def download_statements(document_name):
 
 @frappe.whitelist()
 def send_emails(document_name, from_scheduler=False):
+	"""Queues the statements to be rendered and mailed in batches of customers"""
 	doc = frappe.get_doc('Process Statement Of Accounts', document_name)
-	report = get_report_pdf(doc, consolidated=False)
+	customers = get_customers_with_ledger_entries(doc)
 
-	if report:
-		for customer, report_pdf in report.items():
-			attachments = [{
-				'fname': customer + '.pdf',
-				'fcontent': report_pdf
-			}]
-
-			recipients, cc = get_recipients_and_cc(customer, doc)
-			context = get_context(customer, doc)
-			subject = frappe.render_template(doc.subject, context)
-			message = frappe.render_template(doc.body, context)
-
-			frappe.enqueue(
-				queue='short',
-				method=frappe.sendmail,
-				recipients=recipients,
-				sender=frappe.session.user,
-				cc=cc,
-				subject=subject,
-				message=message,
-				now=True,
-				reference_doctype='Process Statement Of Accounts',
-				reference_name=document_name,
-				attachments=attachments
-			)
+	if not customers:
+		return False
+
+	ageing = get_ageing_for_customers(doc, customers)
+	batches = [customers[i:i + STATEMENT_BATCH_SIZE] for i in range(0, len(customers), STATEMENT_BATCH_SIZE)]
+
+	get_redis().set(get_progress_key(doc, 'pending'), len(batches), ex=7 * 24 * 60 * 60)
+
+	for batch in batches:
+		frappe.enqueue(
+			send_statements,
+			queue='long',
+			document_name=document_name,
+			customers=batch,
+			ageing={customer: ageing[customer] for customer in batch if customer in ageing},
+			from_scheduler=from_scheduler,
+			now=frappe.flags.in_test
+		)
+
+	return True
+
+def send_statements(document_name, customers, ageing=None, from_scheduler=False):
+	"""
+		Renders and mails the statements of a batch of customers.
+		Customers already mailed for the period are skipped, so a failed batch can be sent again.
+	"""
+	doc = frappe.get_doc('Process Statement Of Accounts', document_name)
+	redis = get_redis()
+	sent_key = get_progress_key(doc, 'sent')
+
+	customers = [customer for customer in customers if not redis.sismember(sent_key, customer)]
+	report = get_report_pdf(doc, consolidated=False, customers=customers, ageing=ageing or {}) if customers else None
+
+	for customer, report_pdf in (report or {}).items():
+		attachments = [{
+			'fname': customer + '.pdf',
+			'fcontent': report_pdf
+		}]
+
+		recipients, cc = get_recipients_and_cc(customer, doc)
+		context = get_context(customer, doc)
+		subject = frappe.render_template(doc.subject, context)
+		message = frappe.render_template(doc.body, context)
+
+		frappe.sendmail(
+			recipients=recipients,
+			sender=frappe.session.user,
+			cc=cc,
+			subject=subject,
+			message=message,
+			now=True,
+			reference_doctype='Process Statement Of Accounts',
+			reference_name=document_name,
+			attachments=attachments
+		)
+
+		redis.sadd(sent_key, customer)
+		redis.expire(sent_key, 7 * 24 * 60 * 60)
+
+	# the last batch to finish closes the run
+	if redis.decr(get_progress_key(doc, 'pending')) <= 0:
+		redis.delete(get_progress_key(doc, 'pending'), sent_key)
 
 		if doc.enable_auto_email and from_scheduler:
 			new_to_date = getdate(today())
@@ -297,9 +396,12 @@ def send_emails(document_name, from_scheduler=False):
 			doc.add_comment('Comment', 'Emails sent on: ' + frappe.utils.format_datetime(frappe.utils.now()))
 			doc.db_set('to_date', new_to_date, commit=True)
 			doc.db_set('from_date', new_from_date, commit=True)
-		return True
-	else:
-		return False
+
+def get_redis():
+	return super(RedisWrapper, frappe.cache())
+
+def get_progress_key(doc, name):
+	return frappe.cache().make_key('statement_of_accounts:{0}:{1}:{2}'.format(doc.name, doc.to_date, name))
 
 @frappe.whitelist()
 def send_auto_email():
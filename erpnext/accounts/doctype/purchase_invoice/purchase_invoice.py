@@ -21,6 +21,9 @@ from erpnext.accounts.doctype.sales_invoice.sales_invoice import (
 from erpnext.accounts.doctype.tax_withholding_category.tax_withholding_category import (
 	get_party_tax_withholding_details,
 )
+from erpnext.accounts.doctype.tax_withholding_checkpoint.tax_withholding_checkpoint import (
+	update_tax_withholding_checkpoints,
+)
 from erpnext.accounts.general_ledger import (
 	get_round_off_account_and_cost_center,
 	make_gl_entries,
@@ -437,6 +440,7 @@ class PurchaseInvoice(BuyingController):
 
 		# this sequence because outstanding may get -negative
 		self.make_gl_entries()
+		update_tax_withholding_checkpoints(self)
 
 		if self.update_stock == 1:
 			self.repost_future_sle_and_gle()
@@ -1091,6 +1095,7 @@ class PurchaseInvoice(BuyingController):
 			self.set_consumed_qty_in_po()
 
 		self.make_gl_entries_on_cancel()
+		update_tax_withholding_checkpoints(self, cancel=True)
 
 		if self.update_stock == 1:
 			self.repost_future_sle_and_gle()
@@ -40,7 +40,7 @@ from erpnext.assets.doctype.asset.depreciation import (
 from erpnext.controllers.accounts_controller import validate_account_head
 from erpnext.controllers.selling_controller import SellingController
 from erpnext.projects.doctype.timesheet.timesheet import get_projectwise_timesheet_data
-from erpnext.setup.doctype.company.company import update_company_current_month_sales
+from erpnext.setup.doctype.company.company import update_company_sales_history
 from erpnext.stock.doctype.batch.batch import set_batch_nos
 from erpnext.stock.doctype.delivery_note.delivery_note import update_billed_amount_based_on_so
 from erpnext.stock.doctype.serial_no.serial_no import (
@@ -259,7 +259,7 @@ class SalesInvoice(SellingController):
 		self.update_time_sheet(self.name)
 
 		if frappe.db.get_single_value('Selling Settings', 'sales_update_frequency') == "Each Transaction":
-			update_company_current_month_sales(self.company)
+			update_company_sales_history(self.company, self.posting_date, self.base_grand_total)
 			self.update_project()
 		update_linked_doc(self.doctype, self.name, self.inter_company_invoice_reference)
 
@@ -349,7 +349,7 @@ class SalesInvoice(SellingController):
 		frappe.db.set(self, 'status', 'Cancelled')
 
 		if frappe.db.get_single_value('Selling Settings', 'sales_update_frequency') == "Each Transaction":
-			update_company_current_month_sales(self.company)
+			update_company_sales_history(self.company, self.posting_date, -1 * flt(self.base_grand_total))
 			self.update_project()
 		if not self.is_return and not self.is_consolidated and self.loyalty_program:
 			self.delete_loyalty_point_entry()
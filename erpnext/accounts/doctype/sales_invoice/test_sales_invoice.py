@@ -2547,6 +2547,30 @@ class TestSalesInvoice(unittest.TestCase):
 
 		frappe.db.set_value('Accounts Settings', None, 'over_billing_allowance', over_billing_allowance)
 
+	def test_over_billing_across_invoices_with_item_allowance(self):
+		from erpnext.stock.doctype.delivery_note.test_delivery_note import create_delivery_note
+
+		over_billing_allowance = frappe.db.get_single_value('Accounts Settings', 'over_billing_allowance')
+		frappe.db.set_value('Accounts Settings', None, 'over_billing_allowance', 0)
+
+		dn = create_delivery_note(qty=5, rate=100)
+
+		si = make_sales_invoice(dn.name)
+		si.items[0].qty = 4
+		si.submit()
+
+		# 200 billed against the 100 left
+		si = make_sales_invoice(dn.name)
+		si.items[0].qty = 2
+		self.assertRaises(frappe.ValidationError, si.insert)
+
+		# 100% allowance on the item allows it
+		frappe.db.set_value('Item', dn.items[0].item_code, 'over_billing_allowance', 100)
+		si.insert()
+
+		frappe.db.set_value('Item', dn.items[0].item_code, 'over_billing_allowance', 0)
+		frappe.db.set_value('Accounts Settings', None, 'over_billing_allowance', over_billing_allowance)
+
 	def test_multi_currency_deferred_revenue_via_journal_entry(self):
 		deferred_account = create_account(account_name="Deferred Revenue",
 			parent_account="Current Liabilities - _TC", company="_Test Company")
@@ -24,6 +24,10 @@ from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 )
 from erpnext.accounts.doctype.subscription_plan.subscription_plan import get_plan_rate
 from erpnext.accounts.party import get_party_account_currency
+from erpnext.accounts.utils import get_cached, local_cache
+from erpnext.controllers.accounts_controller import get_taxes_and_charges
+
+SUBSCRIPTION_CHUNK_SIZE = 100
 
 
 class Subscription(Document):
@@ -274,6 +278,61 @@ class Subscription(Document):
 		self.validate_end_date()
 		self.validate_to_follow_calendar_months()
 		self.cost_center = erpnext.get_default_cost_center(self.get('company'))
+		self.set_next_action_date()
+
+	def set_next_action_date(self):
+		"""
+		Sets the first date on which `process` can change the `Subscription`. Only
+		subscriptions whose next action date has come are processed by `process_all`.
+		"""
+		self.next_action_date = self.get_next_action_date()
+
+	def get_next_action_date(self):
+		if self.status == 'Cancelled':
+			return None
+
+		# completed subscriptions only change when their last invoice falls due unpaid
+		if self.status == 'Completed':
+			current_invoice = self.get_current_invoice()
+			if current_invoice and not self.is_paid(current_invoice):
+				return add_days(current_invoice.due_date, 1)
+
+			return None
+
+		# past due and unpaid subscriptions change when their invoices are paid
+		if self.status not in ('Active', 'Trialling'):
+			return nowdate()
+
+		dates = []
+		if self.trial_period_end and self.is_new_subscription():
+			dates.append(add_days(self.trial_period_end, 1))
+
+		if self.status == 'Active':
+			posting_date = due_date = None
+			if self.invoices:
+				doctype = 'Sales Invoice' if self.party_type == 'Customer' else 'Purchase Invoice'
+				posting_date, due_date = frappe.db.get_value(doctype, self.invoices[-1].invoice,
+					['posting_date', 'due_date']) or (None, None)
+
+			if due_date:
+				dates.append(add_days(due_date, 1))
+
+			if self.current_invoice_end:
+				dates.append(add_days(self.current_invoice_end, 1))
+
+				is_current_invoice_generated = posting_date and \
+					getdate(self.current_invoice_start) <= getdate(posting_date) <= getdate(self.current_invoice_end)
+
+				if not is_current_invoice_generated:
+					if self.generate_invoice_at_period_start:
+						dates.append(self.current_invoice_start)
+					elif getdate(self.current_invoice_start) == getdate(self.current_invoice_end):
+						dates.append(self.current_invoice_end)
+
+			if self.end_date:
+				dates.append(add_days(self.end_date, 1))
+
+		return min(getdate(date) for date in dates) if dates else nowdate()
 
 	def validate_trial_period(self):
 		"""
@@ -385,7 +444,10 @@ class Subscription(Document):
 
 		if tax_template:
 			invoice.taxes_and_charges = tax_template
-			invoice.set_taxes()
+			tax_master_doctype = invoice.meta.get_field('taxes_and_charges').options
+			taxes = get_cached(('taxes', tax_master_doctype, tax_template),
+				get_taxes_and_charges, tax_master_doctype, tax_template)
+			invoice.extend('taxes', [tax.copy() for tax in taxes or []])
 
 		# Due date
 		if self.days_until_due:
@@ -429,14 +491,19 @@ class Subscription(Document):
 		"""
 		Returns the `Item`s linked to `Subscription Plan`
 		"""
+		prorate_factor = 1
 		if prorate:
 			prorate_factor = get_prorata_factor(self.current_invoice_end, self.current_invoice_start,
 				self.generate_invoice_at_period_start)
 
 		items = []
 		party = self.party
+		# plan rates only depend on the party through its customer group
+		customer_group = frappe.db.get_value('Customer', party, 'customer_group')
+		accounting_dimensions = get_accounting_dimensions()
+
 		for plan in plans:
-			plan_doc = frappe.get_doc('Subscription Plan', plan.plan)
+			plan_doc = frappe.get_cached_doc('Subscription Plan', plan.plan)
 
 			item_code = plan_doc.item
 
@@ -445,14 +512,13 @@ class Subscription(Document):
 			else:
 				deferred_field = 'enable_deferred_expense'
 
-			deferred = frappe.db.get_value('Item', item_code, deferred_field)
+			deferred = frappe.get_cached_value('Item', item_code, deferred_field)
 
-			if not prorate:
-				item = {'item_code': item_code, 'qty': plan.qty, 'rate': get_plan_rate(plan.plan, plan.qty, party,
-					self.current_invoice_start, self.current_invoice_end), 'cost_center': plan_doc.cost_center}
-			else:
-				item = {'item_code': item_code, 'qty': plan.qty, 'rate': get_plan_rate(plan.plan, plan.qty, party,
-					self.current_invoice_start, self.current_invoice_end, prorate_factor), 'cost_center': plan_doc.cost_center}
+			rate = get_cached(('plan_rate', plan.plan, plan.qty, customer_group, self.current_invoice_start,
+				self.current_invoice_end, prorate_factor), get_plan_rate, plan.plan, plan.qty, party,
+				self.current_invoice_start, self.current_invoice_end, prorate_factor)
+
+			item = {'item_code': item_code, 'qty': plan.qty, 'rate': rate, 'cost_center': plan_doc.cost_center}
 
 			if deferred:
 				item.update({
@@ -461,8 +527,6 @@ class Subscription(Document):
 					'service_end_date': self.current_invoice_end
 				})
 
-			accounting_dimensions = get_accounting_dimensions()
-
 			for dimension in accounting_dimensions:
 				if plan_doc.get(dimension):
 					item.update({
@@ -656,34 +720,60 @@ def get_prorata_factor(period_end, period_start, is_prepaid):
 
 def process_all():
 	"""
-	Task to updates the status of all `Subscription` apart from those that are cancelled
+	Task to update the status of the `Subscription`s that are due, in chunks
+	processed by background jobs
 	"""
-	subscriptions = get_all_subscriptions()
-	for subscription in subscriptions:
-		process(subscription)
+	subscriptions = [d.name for d in get_all_subscriptions()]
+
+	for i in range(0, len(subscriptions), SUBSCRIPTION_CHUNK_SIZE):
+		frappe.enqueue('erpnext.accounts.doctype.subscription.subscription.process_subscriptions',
+			queue='long', now=frappe.flags.in_test, subscriptions=subscriptions[i:i + SUBSCRIPTION_CHUNK_SIZE])
 
 
 def get_all_subscriptions():
 	"""
-	Returns all `Subscription` documents
+	Returns all `Subscription` documents apart from those that are cancelled
+	and those whose next action date has not come or is not set
 	"""
-	return frappe.db.get_all('Subscription', {'status': ('!=','Cancelled')})
+	return frappe.db.get_all('Subscription', filters={'status': ('!=','Cancelled'),
+		'next_action_date': ('<=', nowdate())})
 
 
-def process(data):
+def process_subscriptions(subscriptions):
+	"""
+	Processes a chunk of `Subscription`s and commits them together. Plan rates and
+	tax templates are shared by the invoices of the chunk.
+	"""
+	with local_cache():
+		for name in subscriptions:
+			process({'name': name}, commit=False)
+
+	frappe.db.commit()
+
+
+def process(data, commit=True):
 	"""
 	Checks a `Subscription` and updates it status as necessary
 	"""
 	if data:
+		if not commit:
+			frappe.db.savepoint('process_subscription')
+
 		try:
 			subscription = frappe.get_doc('Subscription', data['name'])
 			subscription.process()
-			frappe.db.commit()
+			if commit:
+				frappe.db.commit()
 		except frappe.ValidationError:
-			frappe.db.rollback()
-			frappe.db.begin()
+			if commit:
+				frappe.db.rollback()
+				frappe.db.begin()
+			else:
+				frappe.db.rollback(save_point='process_subscription')
+
 			frappe.log_error(frappe.get_traceback())
-			frappe.db.commit()
+			if commit:
+				frappe.db.commit()
 
 
 @frappe.whitelist()
@@ -11,10 +11,14 @@ from frappe.utils.data import (
 	date_diff,
 	flt,
 	get_date_str,
+	getdate,
 	nowdate,
 )
 
-from erpnext.accounts.doctype.subscription.subscription import get_prorata_factor
+from erpnext.accounts.doctype.subscription.subscription import (
+	get_all_subscriptions,
+	get_prorata_factor,
+)
 
 test_dependencies = ("UOM", "Item Group", "Item")
 
@@ -128,6 +132,56 @@ class TestSubscription(unittest.TestCase):
 
 		subscription.delete()
 
+	def test_only_due_subscriptions_are_processed(self):
+		subscription = frappe.new_doc('Subscription')
+		subscription.party_type = 'Customer'
+		subscription.party = '_Test Customer'
+		subscription.append('plans', {'plan': '_Test Plan Name', 'qty': 1})
+		subscription.save()
+
+		# nothing to do until the end of the billing period
+		self.assertEqual(get_date_str(subscription.next_action_date), add_months(nowdate(), 1))
+		self.assertNotIn(subscription.name, [d.name for d in get_all_subscriptions()])
+
+		past_subscription = frappe.new_doc('Subscription')
+		past_subscription.party_type = 'Customer'
+		past_subscription.party = '_Test Customer'
+		past_subscription.start_date = '2018-01-01'
+		past_subscription.append('plans', {'plan': '_Test Plan Name', 'qty': 1})
+		past_subscription.save()
+
+		self.assertIn(past_subscription.name, [d.name for d in get_all_subscriptions()])
+
+		subscription.delete()
+		past_subscription.delete()
+
+	def test_next_action_date_of_completed_subscription(self):
+		subscription = frappe.new_doc('Subscription')
+		subscription.party_type = 'Customer'
+		subscription.party = '_Test Customer'
+		subscription.append('plans', {'plan': '_Test Plan Name', 'qty': 1})
+		subscription.start_date = '2018-01-01'
+		subscription.insert()
+		subscription.process()	# generate first invoice
+
+		# completed with an unpaid invoice, due once the invoice is past its due date
+		current_invoice = subscription.get_current_invoice()
+		subscription.status = 'Completed'
+		subscription.save()
+
+		self.assertEqual(getdate(subscription.next_action_date), getdate(add_days(current_invoice.due_date, 1)))
+		self.assertIn(subscription.name, [d.name for d in get_all_subscriptions()])
+
+		# completed with nothing outstanding, never due again
+		current_invoice.db_set('outstanding_amount', 0)
+		current_invoice.db_set('status', 'Paid')
+		subscription.save()
+
+		self.assertIsNone(subscription.next_action_date)
+		self.assertNotIn(subscription.name, [d.name for d in get_all_subscriptions()])
+
+		subscription.delete()
+
 	def test_create_subscription_trial_with_wrong_dates(self):
 		subscription = frappe.new_doc('Subscription')
 		subscription.party_type = 'Customer'
@@ -5,7 +5,13 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import cint, getdate
+from frappe.query_builder.functions import Sum
+from frappe.utils import cint, flt, getdate
+
+from erpnext.accounts.doctype.tax_withholding_checkpoint.tax_withholding_checkpoint import (
+	get_purchase_invoice_totals,
+	is_checkpoint_period,
+)
 
 
 class TaxWithholdingCategory(Document):
@@ -193,7 +199,9 @@ def get_lower_deduction_certificate(tax_details, pan_no):
 		return frappe.get_doc('Lower Deduction Certificate', ldc_name)
 
 def get_tax_amount(party_type, parties, inv, tax_details, posting_date, pan_no=None):
-	vouchers = get_invoice_vouchers(parties, tax_details, inv.company, party_type=party_type)
+	# invoices are read through a subquery, the party may have too many to list
+	invoices = get_invoice_query(parties, tax_details, inv.company, party_type=party_type)
+	vouchers = get_journal_entry_vouchers(parties, tax_details, party_type=party_type)
 	advance_vouchers = get_advance_vouchers(parties, company=inv.company, from_date=tax_details.from_date,
 		to_date=tax_details.to_date, party_type=party_type)
 	taxable_vouchers = vouchers + advance_vouchers
@@ -202,9 +210,7 @@ def get_tax_amount(party_type, parties, inv, tax_details, posting_date, pan_no=N
 	if inv.doctype == 'Purchase Invoice':
 		tax_deducted_on_advances = get_taxes_deducted_on_advances_allocated(inv, tax_details)
 
-	tax_deducted = 0
-	if taxable_vouchers:
-		tax_deducted = get_deducted_tax(taxable_vouchers, tax_details)
+	tax_deducted = get_deducted_tax(taxable_vouchers, tax_details, invoices)
 
 	tax_amount = 0
 	if party_type == 'Supplier':
@@ -225,32 +231,36 @@ def get_tax_amount(party_type, parties, inv, tax_details, posting_date, pan_no=N
 		else:
 			#  if no TCS has been charged in FY,
 			# then chargeable value is "prev invoices + advances" value which cross the threshold
-			tax_amount = get_tcs_amount(parties, inv, tax_details, vouchers, advance_vouchers)
+			tax_amount = get_tcs_amount(parties, inv, tax_details, vouchers, advance_vouchers, invoices)
 
 	if cint(tax_details.round_off_tax_amount):
 		tax_amount = round(tax_amount)
 
 	return tax_amount, tax_deducted, tax_deducted_on_advances
 
-def get_invoice_vouchers(parties, tax_details, company, party_type='Supplier'):
-	dr_or_cr = 'credit' if party_type == 'Supplier' else 'debit'
+def get_invoice_query(parties, tax_details, company, party_type='Supplier'):
+	"""Returns the query for the names of the party's invoices considered for tax withholding"""
 	doctype = 'Purchase Invoice' if party_type == 'Supplier' else 'Sales Invoice'
-
-	filters = {
-		'company': company,
-		frappe.scrub(party_type): ['in', parties],
-		'posting_date': ['between', (tax_details.from_date, tax_details.to_date)],
-		'is_opening': 'No',
-		'docstatus': 1
-	}
+	invoice = frappe.qb.DocType(doctype)
+
+	query = frappe.qb.from_(invoice).select(invoice.name).where(
+		(invoice.company == company)
+		& (invoice[frappe.scrub(party_type)].isin(parties))
+		& (invoice.posting_date.between(tax_details.from_date, tax_details.to_date))
+		& (invoice.is_opening == 'No')
+		& (invoice.docstatus == 1)
+	)
 
 	if not tax_details.get('consider_party_ledger_amount') and doctype != "Sales Invoice":
-		filters.update({
-			'apply_tds': 1,
-			'tax_withholding_category': tax_details.get('tax_withholding_category')
-		})
+		query = query.where(
+			(invoice.apply_tds == 1)
+			& (invoice.tax_withholding_category == tax_details.get('tax_withholding_category'))
+		)
+
+	return query
 
-	invoices = frappe.get_all(doctype, filters=filters, pluck="name") or [""]
+def get_journal_entry_vouchers(parties, tax_details, party_type='Supplier'):
+	dr_or_cr = 'credit' if party_type == 'Supplier' else 'debit'
 
 	journal_entries = frappe.db.sql("""
 		SELECT j.name
@@ -266,7 +276,29 @@ def get_invoice_vouchers(parties, tax_details, company, party_type='Supplier'):
 	if journal_entries:
 		journal_entries = journal_entries[0]
 
-	return invoices + journal_entries
+	return journal_entries or [""]
+
+def get_invoice_totals(parties, tax_details, company):
+	"""Returns the net and grand total of the supplier's invoices considered for tax withholding"""
+	tax_withholding_category = None
+	if not cint(tax_details.consider_party_ledger_amount):
+		tax_withholding_category = tax_details.tax_withholding_category
+
+	if is_checkpoint_period(tax_details.from_date, tax_details.to_date):
+		return get_purchase_invoice_totals(parties, tax_details.from_date, tax_details.to_date,
+			company=company, tax_withholding_category=tax_withholding_category, is_opening=0)
+
+	invoice = frappe.qb.DocType('Purchase Invoice')
+	totals = frappe.qb.from_(invoice).select(
+		Sum(invoice.net_total).as_('net_total'), Sum(invoice.grand_total).as_('grand_total')
+	).where(
+		invoice.name.isin(get_invoice_query(parties, tax_details, company))
+	).run(as_dict=True)
+
+	return frappe._dict({
+		'net_total': flt(totals[0].net_total) if totals else 0.0,
+		'grand_total': flt(totals[0].grand_total) if totals else 0.0
+	})
 
 def get_advance_vouchers(parties, company=None, from_date=None, to_date=None, party_type='Supplier'):
 	# for advance vouchers, debit and credit is reversed
@@ -311,35 +343,29 @@ def get_taxes_deducted_on_advances_allocated(inv, tax_details):
 	return tax_info
 
 
-def get_deducted_tax(taxable_vouchers, tax_details):
+def get_deducted_tax(taxable_vouchers, tax_details, invoices=None):
 	# check if TDS / TCS account is already charged on taxable vouchers
-	filters = {
-		'is_cancelled': 0,
-		'credit': ['>', 0],
-		'posting_date': ['between', (tax_details.from_date, tax_details.to_date)],
-		'account': tax_details.account_head,
-		'voucher_no': ['in', taxable_vouchers],
-	}
-	field = "credit"
+	gle = frappe.qb.DocType('GL Entry')
+	query = frappe.qb.from_(gle).select(Sum(gle.credit)).where(
+		(gle.is_cancelled == 0)
+		& (gle.credit > 0)
+		& (gle.posting_date.between(tax_details.from_date, tax_details.to_date))
+		& (gle.account == tax_details.account_head)
+	)
+
+	tax_deducted = flt(query.where(gle.voucher_no.isin(taxable_vouchers)).run()[0][0])
+	if invoices is not None:
+		tax_deducted += flt(query.where(gle.voucher_no.isin(invoices)).run()[0][0])
 
-	entries = frappe.db.get_all('GL Entry', filters, pluck=field)
-	return sum(entries)
+	return tax_deducted
 
 def get_tds_amount(ldc, parties, inv, tax_details, tax_deducted, vouchers):
 	tds_amount = 0
-	invoice_filters = {
-		'name': ('in', vouchers),
-		'docstatus': 1,
-		'apply_tds': 1
-	}
-
-	field = 'sum(net_total)'
+	invoice_totals = get_invoice_totals(parties, tax_details, inv.company)
 
+	supp_credit_amt = invoice_totals.net_total
 	if cint(tax_details.consider_party_ledger_amount):
-		invoice_filters.pop('apply_tds', None)
-		field = 'sum(grand_total)'
-
-	supp_credit_amt = frappe.db.get_value('Purchase Invoice', invoice_filters, field) or 0.0
+		supp_credit_amt = invoice_totals.grand_total
 
 	supp_jv_credit_amt = frappe.db.get_value('Journal Entry Account', {
 		'parent': ('in', vouchers), 'docstatus': 1,
@@ -359,7 +385,7 @@ def get_tds_amount(ldc, parties, inv, tax_details, tax_deducted, vouchers):
 		if (cumulative_threshold and supp_credit_amt >= cumulative_threshold) and cint(tax_details.tax_on_excess_amount):
 			# Get net total again as TDS is calculated on net total
 			# Grand is used to just check for threshold breach
-			net_total = frappe.db.get_value('Purchase Invoice', invoice_filters, 'sum(net_total)') or 0.0
+			net_total = invoice_totals.net_total
 			net_total += inv.net_total
 			supp_credit_amt = net_total - cumulative_threshold
 
@@ -374,16 +400,20 @@ def get_tds_amount(ldc, parties, inv, tax_details, tax_deducted, vouchers):
 
 	return tds_amount
 
-def get_tcs_amount(parties, inv, tax_details, vouchers, adv_vouchers):
+def get_tcs_amount(parties, inv, tax_details, vouchers, adv_vouchers, invoices=None):
 	tcs_amount = 0
 
 	# sum of debit entries made from sales invoices
-	invoiced_amt = frappe.db.get_value('GL Entry', {
-		'is_cancelled': 0,
-		'party': ['in', parties],
-		'company': inv.company,
-		'voucher_no': ['in', vouchers],
-	}, 'sum(debit)') or 0.0
+	gle = frappe.qb.DocType('GL Entry')
+	query = frappe.qb.from_(gle).select(Sum(gle.debit)).where(
+		(gle.is_cancelled == 0)
+		& (gle.party.isin(parties))
+		& (gle.company == inv.company)
+	)
+
+	invoiced_amt = flt(query.where(gle.voucher_no.isin(vouchers)).run()[0][0])
+	if invoices is not None:
+		invoiced_amt += flt(query.where(gle.voucher_no.isin(invoices)).run()[0][0])
 
 	# sum of credit entries made from PE / JV with unset 'against voucher'
 	advance_amt = frappe.db.get_value('GL Entry', {
@@ -394,14 +424,14 @@ def get_tcs_amount(parties, inv, tax_details, vouchers, adv_vouchers):
 	}, 'sum(credit)') or 0.0
 
 	# sum of credit entries made from sales invoice
-	credit_note_amt = sum(frappe.db.get_all('GL Entry', {
+	credit_note_amt = frappe.db.get_value('GL Entry', {
 		'is_cancelled': 0,
 		'credit': ['>', 0],
 		'party': ['in', parties],
 		'posting_date': ['between', (tax_details.from_date, tax_details.to_date)],
 		'company': inv.company,
 		'voucher_type': 'Sales Invoice',
-	}, pluck='credit'))
+	}, 'sum(credit)') or 0.0
 
 	cumulative_threshold = tax_details.get('cumulative_threshold', 0)
 
@@ -438,6 +468,8 @@ def get_tds_amount_from_ldc(ldc, parties, pan_no, tax_details, posting_date, net
 	return tds_amount
 
 def get_debit_note_amount(suppliers, from_date, to_date, company=None):
+	if is_checkpoint_period(from_date, to_date):
+		return abs(get_purchase_invoice_totals(suppliers, from_date, to_date, company=company, is_return=1).net_total)
 
 	filters = {
 		'supplier': ['in', suppliers],
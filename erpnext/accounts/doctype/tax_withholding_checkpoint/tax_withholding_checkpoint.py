@@ -0,0 +1,135 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, get_first_day, get_last_day, getdate, now
+
+TOTAL_FIELDS = ("net_total", "grand_total")
+
+
+class TaxWithholdingCheckpoint(Document):
+	"""
+		Net and grand total of the Purchase Invoices of a supplier in a month.
+		Maintained on submit and cancel of the invoices so that the cumulative
+		tax withholding threshold can be checked without reading all invoices.
+	"""
+	pass
+
+
+def update_tax_withholding_checkpoints(invoice, cancel=False):
+	"""Add the totals of the Purchase Invoice to its checkpoint, or remove them on cancel"""
+	key = (invoice.company, invoice.supplier,
+		invoice.tax_withholding_category if cint(invoice.apply_tds) else "",
+		cint(invoice.is_return), 1 if invoice.is_opening == "Yes" else 0,
+		get_first_day(invoice.posting_date))
+
+	totals = {fieldname: (-1 if cancel else 1) * flt(invoice.get(fieldname)) for fieldname in TOTAL_FIELDS}
+	update_tax_withholding_checkpoint(key, totals)
+
+
+def update_tax_withholding_checkpoint(key, totals):
+	company, supplier, tax_withholding_category, is_return, is_opening, period_start_date = key
+
+	name = frappe.db.sql("""
+		select name from `tabTax Withholding Checkpoint`
+		where supplier = %s and ifnull(tax_withholding_category, '') = %s and is_return = %s
+		and is_opening = %s and period_start_date = %s and company = %s
+		limit 1 for update""", (supplier, tax_withholding_category or "", is_return, is_opening, period_start_date, company))
+
+	if name:
+		frappe.db.sql("""
+			update `tabTax Withholding Checkpoint`
+			set net_total = net_total + %(net_total)s, grand_total = grand_total + %(grand_total)s,
+				modified = %(modified)s
+			where name = %(name)s""", dict(totals, name=name[0][0], modified=now()))
+	else:
+		make_tax_withholding_checkpoint(key, totals)
+
+
+def make_tax_withholding_checkpoint(key, totals):
+	company, supplier, tax_withholding_category, is_return, is_opening, period_start_date = key
+
+	checkpoint = frappe.new_doc("Tax Withholding Checkpoint")
+	checkpoint.update({
+		"company": company,
+		"supplier": supplier,
+		"tax_withholding_category": tax_withholding_category or None,
+		"is_return": is_return,
+		"is_opening": is_opening,
+		"period_start_date": period_start_date
+	})
+	checkpoint.update(totals)
+	checkpoint.owner = frappe.session.user
+	checkpoint.set_new_name()
+	checkpoint.db_insert()
+
+
+def is_checkpoint_period(from_date, to_date):
+	"""Checkpoints can only be used for periods made of whole months"""
+	from_date, to_date = getdate(from_date), getdate(to_date)
+	return from_date == get_first_day(from_date) and to_date == get_last_day(to_date)
+
+
+def get_purchase_invoice_totals(suppliers, from_date, to_date, company=None, tax_withholding_category=None,
+	is_return=None, is_opening=None):
+	"""
+		Returns the net and grand total of the submitted Purchase Invoices of the suppliers
+		from the checkpoints, `from_date` and `to_date` must be the first and last day of a month
+	"""
+	conditions = []
+	if company:
+		conditions.append("company = %(company)s")
+	if tax_withholding_category:
+		conditions.append("tax_withholding_category = %(tax_withholding_category)s")
+	if is_return is not None:
+		conditions.append("is_return = %(is_return)s")
+	if is_opening is not None:
+		conditions.append("is_opening = %(is_opening)s")
+
+	totals = frappe.db.sql("""
+		select sum(net_total) as net_total, sum(grand_total) as grand_total
+		from `tabTax Withholding Checkpoint`
+		where supplier in %(suppliers)s and period_start_date between %(from_date)s and %(to_date)s
+		{0}
+	""".format("".join(" and " + d for d in conditions)), {
+		"suppliers": tuple(suppliers),
+		"from_date": from_date,
+		"to_date": to_date,
+		"company": company,
+		"tax_withholding_category": tax_withholding_category,
+		"is_return": cint(is_return),
+		"is_opening": cint(is_opening)
+	}, as_dict=1)
+
+	return frappe._dict({fieldname: flt(totals[0][fieldname]) if totals else 0.0 for fieldname in TOTAL_FIELDS})
+
+
+def rebuild_tax_withholding_checkpoints(company=None):
+	"""Recreate the checkpoints from the submitted Purchase Invoices"""
+	conditions = ""
+	if company:
+		conditions = " and company = %(company)s"
+
+	frappe.db.sql("delete from `tabTax Withholding Checkpoint` where 1=1 {0}".format(conditions),
+		{"company": company})
+
+	invoices = frappe.db.sql("""
+		select company, supplier, if(apply_tds = 1, ifnull(tax_withholding_category, ''), '') as tax_withholding_category,
+			is_return, if(is_opening = 'Yes', 1, 0) as is_opening,
+			year(posting_date) as year, month(posting_date) as month,
+			sum(net_total) as net_total, sum(grand_total) as grand_total
+		from `tabPurchase Invoice`
+		where docstatus = 1 {0}
+		group by company, supplier, if(apply_tds = 1, ifnull(tax_withholding_category, ''), ''),
+			is_return, if(is_opening = 'Yes', 1, 0), year(posting_date), month(posting_date)
+	""".format(conditions), {"company": company}, as_dict=1)
+
+	for d in invoices:
+		key = (d.company, d.supplier, d.tax_withholding_category, cint(d.is_return), cint(d.is_opening),
+			getdate("{0}-{1:02d}-01".format(d.year, d.month)))
+		make_tax_withholding_checkpoint(key, {fieldname: flt(d[fieldname]) for fieldname in TOTAL_FIELDS})
+
+
+def on_doctype_update():
+	frappe.db.add_index("Tax Withholding Checkpoint", ["supplier", "period_start_date"])
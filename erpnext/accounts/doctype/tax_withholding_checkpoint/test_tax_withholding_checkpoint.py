@@ -0,0 +1,39 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+from frappe.utils import get_first_day, get_last_day, nowdate
+
+from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
+from erpnext.accounts.doctype.tax_withholding_checkpoint.tax_withholding_checkpoint import (
+	get_purchase_invoice_totals,
+	rebuild_tax_withholding_checkpoints,
+)
+
+
+class TestTaxWithholdingCheckpoint(unittest.TestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_totals(self, **kwargs):
+		return get_purchase_invoice_totals(["_Test Supplier"], get_first_day(nowdate()), get_last_day(nowdate()),
+			company="_Test Company", **kwargs)
+
+	def test_checkpoints_on_submit_and_cancel(self):
+		totals, return_totals = self.get_totals(), self.get_totals(is_return=1)
+
+		pi = make_purchase_invoice(qty=2, rate=500)
+		return_pi = make_purchase_invoice(qty=-1, rate=500, is_return=1, return_against=pi.name)
+
+		self.assertEqual(self.get_totals().net_total, totals.net_total + 500)
+		self.assertEqual(self.get_totals(is_return=1).net_total, return_totals.net_total - 500)
+
+		return_pi.cancel()
+		self.assertEqual(self.get_totals().net_total, totals.net_total + 1000)
+		self.assertEqual(self.get_totals(is_return=1).net_total, return_totals.net_total)
+
+		# rebuilt checkpoints match the ones maintained with the invoices
+		rebuild_tax_withholding_checkpoints("_Test Company")
+		self.assertEqual(self.get_totals().net_total, totals.net_total + 1000)
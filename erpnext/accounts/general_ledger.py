@@ -10,10 +10,16 @@ from frappe.model.meta import get_field_precision
 from frappe.utils import cint, cstr, flt, formatdate, getdate, now
 
 import erpnext
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	update_balance_checkpoints,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 )
-from erpnext.accounts.doctype.budget.budget import validate_expense_against_budget
+from erpnext.accounts.doctype.budget.budget import (
+	validate_expense_against_budget,
+	validate_expenses_against_budget,
+)
 
 
 class ClosedAccountingPeriod(frappe.ValidationError): pass
@@ -207,10 +213,17 @@ def save_entries(gl_map, adv_adj, update_outstanding, from_repost=False):
 	if gl_map:
 		check_freezing_date(gl_map[0]["posting_date"], adv_adj)
 
+	gl_entries = []
 	for entry in gl_map:
-		make_entry(entry, adv_adj, update_outstanding, from_repost)
+		gl_entries.append(make_entry(entry, adv_adj, update_outstanding, from_repost, validate_budget=False))
+
+	update_balance_checkpoints(gl_entries)
+
+	# after all entries are posted, so that the voucher's own lines are in the actual expense
+	if not from_repost:
+		validate_expenses_against_budget(gl_map)
 
-def make_entry(args, adv_adj, update_outstanding, from_repost=False):
+def make_entry(args, adv_adj, update_outstanding, from_repost=False, validate_budget=True):
 	gle = frappe.new_doc("GL Entry")
 	gle.update(args)
 	gle.flags.ignore_permissions = 1
@@ -219,9 +232,11 @@ def make_entry(args, adv_adj, update_outstanding, from_repost=False):
 	gle.flags.update_outstanding = update_outstanding or 'Yes'
 	gle.submit()
 
-	if not from_repost:
+	if validate_budget and not from_repost:
 		validate_expense_against_budget(args)
 
+	return gle
+
 def validate_cwip_accounts(gl_map):
 	"""Validate that CWIP account are not used in Journal Entry"""
 	if gl_map and gl_map[0].voucher_type != "Journal Entry":
@@ -312,10 +327,11 @@ def get_round_off_account_and_cost_center(company):
 	return round_off_account, round_off_cost_center
 
 def make_reverse_gl_entries(gl_entries=None, voucher_type=None, voucher_no=None,
-	adv_adj=False, update_outstanding="Yes"):
+	adv_adj=False, update_outstanding="Yes", voucher_detail_no=None):
 	"""
 		Get original gl entries of the voucher
-		and make reverse gl entries by swapping debit and credit
+		and make reverse gl entries by swapping debit and credit.
+		With `voucher_detail_no`, only the entries of that row of the voucher are cancelled
 	"""
 
 	if not gl_entries:
@@ -335,7 +351,8 @@ def make_reverse_gl_entries(gl_entries=None, voucher_type=None, voucher_no=None,
 	if gl_entries:
 		validate_accounting_period(gl_entries)
 		check_freezing_date(gl_entries[0]["posting_date"], adv_adj)
-		set_as_cancel(gl_entries[0]['voucher_type'], gl_entries[0]['voucher_no'])
+		set_as_cancel(gl_entries[0]['voucher_type'], gl_entries[0]['voucher_no'], voucher_detail_no)
+		update_balance_checkpoints(gl_entries, cancel=True)
 
 		for entry in gl_entries:
 			new_gle = copy.deepcopy(entry)
@@ -374,11 +391,15 @@ def check_freezing_date(posting_date, adv_adj=False):
 					and (frozen_accounts_modifier not in frappe.get_roles() or frappe.session.user == 'Administrator'):
 				frappe.throw(_("You are not authorized to add or update entries before {0}").format(formatdate(acc_frozen_upto)))
 
-def set_as_cancel(voucher_type, voucher_no):
+def set_as_cancel(voucher_type, voucher_no, voucher_detail_no=None):
 	"""
-		Set is_cancelled=1 in all original gl entries for the voucher
+		Set is_cancelled=1 in all original gl entries for the voucher (or the voucher row)
 	"""
+	condition = ""
+	if voucher_detail_no:
+		condition = " and voucher_detail_no = %s" % frappe.db.escape(voucher_detail_no)
+
 	frappe.db.sql("""UPDATE `tabGL Entry` SET is_cancelled = 1,
 		modified=%s, modified_by=%s
-		where voucher_type=%s and voucher_no=%s and is_cancelled = 0""",
+		where voucher_type=%s and voucher_no=%s and is_cancelled = 0 {0}""".format(condition), #nosec
 		(now(), frappe.session.user, voucher_type, voucher_no))
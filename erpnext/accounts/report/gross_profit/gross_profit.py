@@ -156,6 +156,7 @@ class GrossProfitGenerator(object):
 		self.load_stock_ledger_entries()
 		self.load_product_bundle()
 		self.load_non_stock_items()
+		self.load_purchase_rates()
 		self.get_returned_invoice_items()
 		self.process()
 
@@ -303,23 +304,18 @@ class GrossProfitGenerator(object):
 			return flt(row.qty) * item_rate
 
 		else:
-			my_sle = self.sle.get((item_code, row.warehouse))
-			if (row.update_stock or row.dn_detail) and my_sle:
+			if (row.update_stock or row.dn_detail) and (item_code, row.warehouse) in self.sle_bins:
 				parenttype, parent = row.parenttype, row.parent
 				if row.dn_detail:
 					parenttype, parent = "Delivery Note", row.delivery_note
 
-				for i, sle in enumerate(my_sle):
-					# find the stock valution rate from stock ledger entry
-					if sle.voucher_type == parenttype and parent == sle.voucher_no and \
-						sle.voucher_detail_no == row.item_row:
-							previous_stock_value = len(my_sle) > i+1 and \
-								flt(my_sle[i+1].stock_value) or 0.0
-
-							if previous_stock_value:
-								return (previous_stock_value - flt(sle.stock_value)) * flt(row.qty) / abs(flt(sle.qty))
-							else:
-								return flt(row.qty) * self.get_average_buying_rate(row, item_code)
+				# find the stock valution rate from stock ledger entry
+				sle = self.sle.get((parenttype, parent, row.item_row, item_code, row.warehouse))
+				if sle:
+					if sle.previous_stock_value:
+						return (sle.previous_stock_value - flt(sle.stock_value)) * flt(row.qty) / abs(flt(sle.qty))
+					else:
+						return flt(row.qty) * self.get_average_buying_rate(row, item_code)
 			else:
 				return flt(row.qty) * self.get_average_buying_rate(row, item_code)
 
@@ -341,39 +337,38 @@ class GrossProfitGenerator(object):
 		return self.average_buying_rate[item_code]
 
 	def get_last_purchase_rate(self, item_code, row):
-		purchase_invoice = frappe.qb.DocType("Purchase Invoice")
-		purchase_invoice_item = frappe.qb.DocType("Purchase Invoice Item")
-
-		query = (frappe.qb.from_(purchase_invoice_item)
-			.inner_join(
-				purchase_invoice
-			).on(
-				purchase_invoice.name == purchase_invoice_item.parent
-			).select(
-				purchase_invoice_item.base_rate / purchase_invoice_item.conversion_factor
-			).where(
-				purchase_invoice.docstatus == 1
-			).where(
-				purchase_invoice.posting_date <= self.filters.to_date
-			).where(
-				purchase_invoice_item.item_code == item_code
-			))
-
-		if row.project:
-			query.where(
-				purchase_invoice_item.project == row.project
-			)
-
-		if row.cost_center:
-			query.where(
-				purchase_invoice_item.cost_center == row.cost_center
-			)
-
-		query.orderby(purchase_invoice.posting_date, order=frappe.qb.desc)
-		query.limit(1)
-		last_purchase_rate = query.run()
-
-		return flt(last_purchase_rate[0][0]) if last_purchase_rate else 0
+		key = (item_code, row.project, row.cost_center)
+		if key not in self.last_purchase_rate:
+			self.last_purchase_rate[key] = 0
+			for d in self.purchase_rates.get(item_code, []):
+				if (not row.project or d.project == row.project) \
+					and (not row.cost_center or d.cost_center == row.cost_center):
+					self.last_purchase_rate[key] = flt(d.rate)
+					break
+
+		return self.last_purchase_rate[key]
+
+	def load_purchase_rates(self):
+		"""Loads the purchase rates of the non stock items sold, latest first"""
+		self.last_purchase_rate = {}
+		self.purchase_rates = {}
+
+		item_codes = list(set(row.item_code for row in self.si_list if row.item_code in self.non_stock_items)
+			| set(d.item_code for bundles in self.product_bundles.values() for items in bundles.values()
+				for packed_items in items.values() for d in packed_items if d.item_code in self.non_stock_items))
+
+		if not item_codes:
+			return
+
+		for d in frappe.db.sql("""
+			select pi_item.item_code, pi_item.project, pi_item.cost_center,
+				pi_item.base_rate / pi_item.conversion_factor as rate
+			from `tabPurchase Invoice` pi inner join `tabPurchase Invoice Item` pi_item
+				on pi.name = pi_item.parent
+			where pi.docstatus = 1 and pi.posting_date <= %(to_date)s and pi_item.item_code in %(item_codes)s
+			order by pi.posting_date desc, pi.posting_time desc""",
+			{"to_date": self.filters.to_date, "item_codes": item_codes}, as_dict=1):
+			self.purchase_rates.setdefault(d.item_code, []).append(d)
 
 	def load_invoice_items(self):
 		conditions = ""
@@ -428,30 +423,58 @@ class GrossProfitGenerator(object):
 			Turns list of Sales Invoice Items to a tree of Sales Invoices with their Items as children.
 		"""
 
-		parents = []
+		self.load_bundle_items()
+		invoice_totals = self.get_invoice_totals()
+
+		parents = set()
+		grouped = []
 
 		for row in self.si_list:
 			if row.parent not in parents:
-				parents.append(row.parent)
+				parents.add(row.parent)
+				grouped.append(self.get_invoice_row(row, invoice_totals.get(row.parent)))
 
-		parents_index = 0
-		for index, row in enumerate(self.si_list):
-			if parents_index < len(parents) and row.parent == parents[parents_index]:
-				invoice = self.get_invoice_row(row)
-				self.si_list.insert(index, invoice)
-				parents_index += 1
+			row.indent = 1.0
+			row.parent_invoice = row.parent
+			row.invoice_or_item = row.item_code
+			grouped.append(row)
 
-			else:
-				# skipping the bundle items rows
-				if not row.indent:
-					row.indent = 1.0
-					row.parent_invoice = row.parent
-					row.invoice_or_item = row.item_code
+			if row.item_code in self.bundle_items:
+				grouped.extend(self.get_bundle_item_row(row, item) for item in self.bundle_items[row.item_code])
+
+		self.si_list = grouped
+
+	def get_invoice_totals(self):
+		invoice_totals = {}
+		invoices = list(set(row.parent for row in self.si_list))
+
+		for i in range(0, len(invoices), 1000):
+			invoice_totals.update(frappe.get_all("Sales Invoice", filters={"name": ["in", invoices[i:i + 1000]]},
+				fields=["name", "base_net_total"], as_list=1))
 
-					if frappe.db.exists('Product Bundle', row.item_code):
-						self.add_bundle_items(row, index)
+		return invoice_totals
 
-	def get_invoice_row(self, row):
+	def load_bundle_items(self):
+		"""Loads the items of the product bundles sold, with their details"""
+		self.bundle_items = {}
+		self.bundle_item_details = {}
+
+		item_codes = list(set(row.item_code for row in self.si_list))
+		if not item_codes:
+			return
+
+		for d in frappe.db.sql("""
+			select parent, item_code, qty from `tabProduct Bundle Item`
+			where parent in %s order by parent, idx""", [item_codes], as_dict=1):
+			self.bundle_items.setdefault(d.parent, []).append(d)
+
+		bundle_item_codes = list(set(d.item_code for items in self.bundle_items.values() for d in items))
+		if bundle_item_codes:
+			self.bundle_item_details = {d.name: d for d in frappe.get_all("Item",
+				filters={"name": ["in", bundle_item_codes]},
+				fields=["name", "item_name", "description", "item_group", "brand"])}
+
+	def get_invoice_row(self, row, base_net_total=None):
 		return frappe._dict({
 			'parent_invoice': "",
 			'indent': 0.0,
@@ -475,27 +498,11 @@ class GrossProfitGenerator(object):
 			'item_row': None,
 			'is_return': row.is_return,
 			'cost_center': row.cost_center,
-			'base_net_amount': frappe.db.get_value('Sales Invoice', row.parent, 'base_net_total')
+			'base_net_amount': base_net_total
 		})
 
-	def add_bundle_items(self, product_bundle, index):
-		bundle_items = self.get_bundle_items(product_bundle)
-
-		for i, item in enumerate(bundle_items):
-			bundle_item = self.get_bundle_item_row(product_bundle, item)
-			self.si_list.insert((index+i+1), bundle_item)
-
-	def get_bundle_items(self, product_bundle):
-		return frappe.get_all(
-			'Product Bundle Item',
-			filters = {
-				'parent': product_bundle.item_code
-			},
-			fields = ['item_code', 'qty']
-		)
-
 	def get_bundle_item_row(self, product_bundle, item):
-		item_name, description, item_group, brand = self.get_bundle_item_details(item.item_code)
+		item_details = self.bundle_item_details.get(item.item_code) or frappe._dict()
 
 		return frappe._dict({
 			'parent_invoice': product_bundle.item_code,
@@ -508,11 +515,11 @@ class GrossProfitGenerator(object):
 			'customer': product_bundle.customer,
 			'customer_group': product_bundle.customer_group,
 			'item_code': item.item_code,
-			'item_name': item_name,
-			'description': description,
+			'item_name': item_details.item_name,
+			'description': item_details.description,
 			'warehouse': product_bundle.warehouse,
-			'item_group': item_group,
-			'brand': brand,
+			'item_group': item_details.item_group,
+			'brand': item_details.brand,
 			'dn_detail': product_bundle.dn_detail,
 			'delivery_note': product_bundle.delivery_note,
 			'qty': (flt(product_bundle.qty) * flt(item.qty)),
@@ -521,37 +528,53 @@ class GrossProfitGenerator(object):
 			'cost_center': product_bundle.cost_center
 		})
 
-	def get_bundle_item_details(self, item_code):
-		return frappe.db.get_value(
-			'Item',
-			item_code,
-			['item_name', 'description', 'item_group', 'brand']
-		)
-
 	def load_stock_ledger_entries(self):
+		"""
+			Loads the entries of the sold items by (voucher_type, voucher_no, voucher_detail_no, item_code, warehouse)
+			with the stock value before them
+		"""
 		res = frappe.db.sql("""select item_code, voucher_type, voucher_no,
 				voucher_detail_no, stock_value, warehouse, actual_qty as qty
 			from `tabStock Ledger Entry`
 			where company=%(company)s and is_cancelled = 0
 			order by
-				item_code desc, warehouse desc, posting_date desc,
-				posting_time desc, creation desc""", self.filters, as_dict=True)
+				item_code, warehouse, posting_date, posting_time, creation""", self.filters, as_dict=True)
+
 		self.sle = {}
+		self.sle_bins = set()
+		previous_sle = None
+
 		for r in res:
-			if (r.item_code, r.warehouse) not in self.sle:
-				self.sle[(r.item_code, r.warehouse)] = []
+			item_warehouse = (r.item_code, r.warehouse)
+			self.sle_bins.add(item_warehouse)
+
+			r.previous_stock_value = flt(previous_sle.stock_value) \
+				if previous_sle and (previous_sle.item_code, previous_sle.warehouse) == item_warehouse else 0.0
+			previous_sle = r
 
-			self.sle[(r.item_code, r.warehouse)].append(r)
+			if r.voucher_type in ("Sales Invoice", "Delivery Note"):
+				# the latest entry of the row, as when searched from the latest
+				self.sle[(r.voucher_type, r.voucher_no, r.voucher_detail_no) + item_warehouse] = r
 
 	def load_product_bundle(self):
 		self.product_bundles = {}
 
-		for d in frappe.db.sql("""select parenttype, parent, parent_item,
-			item_code, warehouse, -1*qty as total_qty, parent_detail_docname
-			from `tabPacked Item` where docstatus=1""", as_dict=True):
-			self.product_bundles.setdefault(d.parenttype, frappe._dict()).setdefault(d.parent,
-				frappe._dict()).setdefault(d.parent_item, []).append(d)
+		# only the packed items of the invoices and delivery notes in the report
+		vouchers = set((row.parenttype, row.parent) for row in self.si_list if row.update_stock and row.parent) \
+			| set(("Delivery Note", row.delivery_note) for row in self.si_list if row.dn_detail)
+		voucher_nos = list(set(voucher_no for voucher_type, voucher_no in vouchers))
+
+		for i in range(0, len(voucher_nos), 1000):
+			for d in frappe.db.sql("""select parenttype, parent, parent_item,
+				item_code, warehouse, -1*qty as total_qty, parent_detail_docname
+				from `tabPacked Item` where docstatus=1 and parent in %s""",
+				[voucher_nos[i:i + 1000]], as_dict=True):
+				if (d.parenttype, d.parent) not in vouchers:
+					continue
+
+				self.product_bundles.setdefault(d.parenttype, frappe._dict()).setdefault(d.parent,
+					frappe._dict()).setdefault(d.parent_item, []).append(d)
 
 	def load_non_stock_items(self):
-		self.non_stock_items = frappe.db.sql_list("""select name from tabItem
-			where is_stock_item=0""")
+		self.non_stock_items = set(frappe.db.sql_list("""select name from tabItem
+			where is_stock_item=0"""))
@@ -1,9 +1,17 @@
 import unittest
 
+import frappe
 from frappe.test_runner import make_test_objects
+from frappe.utils import add_days, nowdate
 
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
 from erpnext.accounts.party import get_party_shipping_address
-from erpnext.accounts.utils import get_future_stock_vouchers, get_voucherwise_gl_entries
+from erpnext.accounts.utils import (
+	get_future_stock_vouchers,
+	get_invoice_list_for_outstanding,
+	get_outstanding_invoices,
+	get_voucherwise_gl_entries,
+)
 from erpnext.stock.doctype.purchase_receipt.test_purchase_receipt import make_purchase_receipt
 
 
@@ -46,6 +54,29 @@ class TestUtils(unittest.TestCase):
 			voucher_type_and_no in gl_entries, msg="get_voucherwise_gl_entries not returning expected GLes",
 		)
 
+	def test_outstanding_invoices_are_paged_by_due_date(self):
+		later_due = create_sales_invoice(posting_date=add_days(nowdate(), -10), do_not_save=1)
+		later_due.due_date = add_days(nowdate(), 30)
+		later_due.insert()
+		later_due.submit()
+
+		# posted later, but due on the posting date
+		earlier_due = create_sales_invoice(posting_date=add_days(nowdate(), -5))
+
+		condition = " and voucher_no in ({0})".format(
+			", ".join(frappe.db.escape(d.name) for d in (later_due, earlier_due)))
+
+		first_page = get_invoice_list_for_outstanding("Customer", "_Test Customer", "Debtors - _TC",
+			"debit_in_account_currency - credit_in_account_currency", condition=condition, page_length=1)
+		self.assertEqual([d.voucher_no for d in first_page], [earlier_due.name])
+
+		outstanding_invoices = get_outstanding_invoices("Customer", "_Test Customer", "Debtors - _TC",
+			condition=condition, limit=1)
+		self.assertEqual([d.voucher_no for d in outstanding_invoices], [earlier_due.name])
+
+		earlier_due.cancel()
+		later_due.cancel()
+
 
 ADDRESS_RECORDS = [
 	{
@@ -2,18 +2,32 @@
 # License: GNU General Public License v3. See license.txt
 
 
+from contextlib import contextmanager
 from json import loads
 
 import frappe
 import frappe.defaults
 from frappe import _, throw
 from frappe.model.meta import get_field_precision
-from frappe.utils import cint, cstr, flt, formatdate, get_number_format_info, getdate, now, nowdate
+from frappe.utils import (
+	cint,
+	cstr,
+	flt,
+	formatdate,
+	get_last_day,
+	get_number_format_info,
+	getdate,
+	now,
+	nowdate,
+)
 
 import erpnext
 
 # imported to enable erpnext.accounts.utils.get_account_currency
 from erpnext.accounts.doctype.account.account import get_account_currency  # noqa
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	get_checkpoint_periods,
+)
 from erpnext.stock import get_warehouse_account_map
 from erpnext.stock.utils import get_stock_value_on
 
@@ -129,6 +143,9 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 
 
 	cond = ["is_cancelled=0"]
+	# filters that also apply to the balance checkpoints
+	filters = []
+	to_date = date
 	if date:
 		cond.append("posting_date <= %s" % frappe.db.escape(cstr(date)))
 	else:
@@ -179,7 +196,7 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 				% year_start_date)
 		# different filter for group and ledger - improved performance
 		if acc.is_group:
-			cond.append("""exists (
+			filters.append("""exists (
 				select name from `tabAccount` ac where ac.name = gle.account
 				and ac.lft >= %s and ac.rgt <= %s
 			)""" % (acc.lft, acc.rgt))
@@ -189,28 +206,64 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 			if acc.account_currency == frappe.get_cached_value('Company',  acc.company,  "default_currency"):
 				in_account_currency = False
 		else:
-			cond.append("""gle.account = %s """ % (frappe.db.escape(account, percent=False), ))
+			filters.append("""gle.account = %s """ % (frappe.db.escape(account, percent=False), ))
 
 	if party_type and party:
-		cond.append("""gle.party_type = %s and gle.party = %s """ %
+		filters.append("""gle.party_type = %s and gle.party = %s """ %
 			(frappe.db.escape(party_type), frappe.db.escape(party, percent=False)))
 
 	if company:
-		cond.append("""gle.company = %s """ % (frappe.db.escape(company, percent=False)))
+		filters.append("""gle.company = %s """ % (frappe.db.escape(company, percent=False)))
 
 	if account or (party_type and party):
 		if in_account_currency:
 			select_field = "sum(debit_in_account_currency) - sum(credit_in_account_currency)"
 		else:
 			select_field = "sum(debit) - sum(credit)"
-		bal = frappe.db.sql("""
+
+		bal = 0.0
+		# checkpoints are not maintained per cost center
+		if not (cost_center and report_type == 'Profit and Loss'):
+			from_period, to_period = get_checkpoint_periods(to_date,
+				year_start_date if report_type == 'Profit and Loss' else None)
+
+			if not (from_period and to_period and from_period > to_period):
+				bal, gl_cond = get_checkpoint_balance(select_field, filters, from_period, to_period)
+				if not gl_cond:
+					return flt(bal)
+
+				# only the entries outside the checkpoint periods are read from the ledger
+				cond.append(gl_cond)
+
+		bal += flt(frappe.db.sql("""
 			SELECT {0}
 			FROM `tabGL Entry` gle
-			WHERE {1}""".format(select_field, " and ".join(cond)))[0][0]
+			WHERE {1}""".format(select_field, " and ".join(cond + filters)))[0][0])
 
-		# if bal is None, return 0
 		return flt(bal)
 
+def get_checkpoint_balance(select_field, filters, from_period=None, to_period=None):
+	"""
+		Returns the balance of the checkpoints between the periods and the
+		condition for the GL Entries that are not covered by them
+	"""
+	period_cond, gl_cond = [], []
+	if from_period:
+		period_cond.append("gle.period_start_date >= %s" % frappe.db.escape(cstr(from_period)))
+		gl_cond.append("posting_date < %s" % frappe.db.escape(cstr(from_period)))
+
+	if to_period:
+		period_cond.append("gle.period_start_date <= %s" % frappe.db.escape(cstr(to_period)))
+		gl_cond.append("posting_date > %s" % frappe.db.escape(cstr(get_last_day(to_period))))
+
+	# checkpoints carry the same account, party and company columns as the GL Entry
+	bal = frappe.db.sql("""
+		SELECT {0}
+		FROM `tabAccount Balance Checkpoint` gle
+		WHERE {1}""".format(select_field, " and ".join(filters + period_cond) or "1=1"))[0][0]
+
+	return flt(bal), gl_cond and "({0})".format(" or ".join(gl_cond))
+
 def get_count_on(account, fieldname, date):
 	cond = ["is_cancelled=0"]
 	if date:
@@ -344,6 +397,8 @@ def reconcile_against_document(args):
 	"""
 		Cancel PE or JV, Update against document, split if required and resubmit
 	"""
+	from erpnext.accounts.doctype.gl_entry.gl_entry import update_outstanding_amt
+
 	# To optimize making GL Entry for PE or JV with multiple references
 	reconciled_entries = {}
 	for row in args:
@@ -352,33 +407,44 @@ def reconcile_against_document(args):
 
 		reconciled_entries[(row.voucher_type, row.voucher_no)].append(row)
 
-	for key, entries in reconciled_entries.items():
-		voucher_type = key[0]
-		voucher_no = key[1]
+	# Outstanding of the invoices is recomputed once per invoice after all the
+	# vouchers are reposted, instead of once for every GL Entry posted
+	frappe.flags.pending_outstanding_updates = set()
 
-		# cancel advance entry
-		doc = frappe.get_doc(voucher_type, voucher_no)
-		frappe.flags.ignore_party_validation = True
-		doc.make_gl_entries(cancel=1, adv_adj=1)
-
-		for entry in entries:
-			check_if_advance_entry_modified(entry)
-			validate_allocated_amount(entry)
-
-			# update ref in advance entry
-			if voucher_type == "Journal Entry":
-				update_reference_in_journal_entry(entry, doc, do_not_save=True)
-			else:
-				update_reference_in_payment_entry(entry, doc, do_not_save=True)
-
-		doc.save(ignore_permissions=True)
-		# re-submit advance entry
-		doc = frappe.get_doc(entry.voucher_type, entry.voucher_no)
-		doc.make_gl_entries(cancel = 0, adv_adj =1)
-		frappe.flags.ignore_party_validation = False
-
-		if entry.voucher_type in ('Payment Entry', 'Journal Entry'):
-			doc.update_expense_claim()
+	try:
+		for key, entries in reconciled_entries.items():
+			voucher_type = key[0]
+			voucher_no = key[1]
+
+			# cancel advance entry
+			doc = frappe.get_doc(voucher_type, voucher_no)
+			frappe.flags.ignore_party_validation = True
+			doc.make_gl_entries(cancel=1, adv_adj=1)
+
+			for entry in entries:
+				check_if_advance_entry_modified(entry)
+				validate_allocated_amount(entry)
+
+				# update ref in advance entry
+				if voucher_type == "Journal Entry":
+					update_reference_in_journal_entry(entry, doc, do_not_save=True)
+				else:
+					update_reference_in_payment_entry(entry, doc, do_not_save=True)
+
+			doc.save(ignore_permissions=True)
+			# re-submit advance entry
+			doc = frappe.get_doc(entry.voucher_type, entry.voucher_no)
+			doc.make_gl_entries(cancel = 0, adv_adj =1)
+			frappe.flags.ignore_party_validation = False
+
+			if entry.voucher_type in ('Payment Entry', 'Journal Entry'):
+				doc.update_expense_claim()
+	finally:
+		pending_outstanding_updates = frappe.flags.pending_outstanding_updates
+		frappe.flags.pending_outstanding_updates = None
+
+	for outstanding_args in sorted(pending_outstanding_updates, key=lambda d: tuple(cstr(v) for v in d)):
+		update_outstanding_amt(*outstanding_args)
 
 def check_if_advance_entry_modified(args):
 	"""
@@ -602,6 +668,28 @@ def fix_total_debit_credit():
 				(dr_or_cr, dr_or_cr, '%s', '%s', '%s', dr_or_cr),
 				(d.diff, d.voucher_type, d.voucher_no))
 
+@contextmanager
+def local_cache():
+	"""Caches the values looked up with `get_cached` till the end of the block"""
+	previous_cache = getattr(frappe.local, 'accounts_cache', None)
+	frappe.local.accounts_cache = {}
+
+	try:
+		yield
+	finally:
+		frappe.local.accounts_cache = previous_cache
+
+def get_cached(key, method, *args):
+	"""Returns the value of `method` from the innermost `local_cache` block, if any"""
+	cache = getattr(frappe.local, 'accounts_cache', None)
+	if cache is None:
+		return method(*args)
+
+	if key not in cache:
+		cache[key] = method(*args)
+
+	return cache[key]
+
 def get_currency_precision():
 	precision = cint(frappe.db.get_default("currency_precision"))
 	if not precision:
@@ -655,7 +743,12 @@ def get_held_invoices(party_type, party):
 	return held_invoices
 
 
-def get_outstanding_invoices(party_type, party, account, condition=None, filters=None):
+def get_outstanding_invoices(party_type, party, account, condition=None, filters=None, limit=None):
+	"""
+		Returns outstanding invoices of the party against the given account.
+		If `limit` is set, invoices are read page by page in due date order, the order of the
+		result, and only the payments against the invoices of each page are aggregated.
+	"""
 	outstanding_invoices = []
 	precision = frappe.get_precision("Sales Invoice", "outstanding_amount") or 2
 
@@ -675,7 +768,56 @@ def get_outstanding_invoices(party_type, party, account, condition=None, filters
 
 	held_invoices = get_held_invoices(party_type, party)
 
-	invoice_list = frappe.db.sql("""
+	page_length = max(cint(limit) * 2, 500) if limit else 0
+	start = 0
+
+	while True:
+		invoice_list = get_invoice_list_for_outstanding(party_type, party, account, dr_or_cr,
+			condition=condition, start=start, page_length=page_length)
+
+		pe_map = get_payment_amount_against_invoices(party_type, party, account, payment_dr_or_cr,
+			invoices=invoice_list if page_length else None)
+
+		for d in invoice_list:
+			payment_amount = pe_map.get((d.voucher_type, d.voucher_no), 0)
+			outstanding_amount = flt(d.invoice_amount - payment_amount, precision)
+			if outstanding_amount > 0.5 / (10**precision):
+				if (filters and filters.get("outstanding_amt_greater_than") and
+					not (outstanding_amount >= filters.get("outstanding_amt_greater_than") and
+					outstanding_amount <= filters.get("outstanding_amt_less_than"))):
+					continue
+
+				if not d.voucher_type == "Purchase Invoice" or d.voucher_no not in held_invoices:
+					outstanding_invoices.append(
+						frappe._dict({
+							'voucher_no': d.voucher_no,
+							'voucher_type': d.voucher_type,
+							'posting_date': d.posting_date,
+							'invoice_amount': flt(d.invoice_amount),
+							'payment_amount': payment_amount,
+							'outstanding_amount': outstanding_amount,
+							'due_date': d.due_date,
+							'currency': d.currency
+						})
+					)
+
+		if (not page_length or len(invoice_list) < page_length
+			or len(outstanding_invoices) >= cint(limit)):
+			break
+
+		start += page_length
+
+	outstanding_invoices = sorted(outstanding_invoices, key=lambda k: k['due_date'] or getdate(nowdate()))
+
+	if limit:
+		outstanding_invoices = outstanding_invoices[:cint(limit)]
+
+	return outstanding_invoices
+
+
+def get_invoice_list_for_outstanding(party_type, party, account, dr_or_cr, condition=None,
+	start=0, page_length=0):
+	return frappe.db.sql("""
 		select
 			voucher_no, voucher_type, posting_date, due_date,
 			ifnull(sum({dr_or_cr}), 0) as invoice_amount,
@@ -691,15 +833,31 @@ def get_outstanding_invoices(party_type, party, account, condition=None, filters
 					and (against_voucher = '' or against_voucher is null))
 				or (voucher_type not in ('Journal Entry', 'Payment Entry')))
 		group by voucher_type, voucher_no
-		order by posting_date, name""".format(
+		order by ifnull(due_date, %(today)s), posting_date, voucher_type, voucher_no
+		{limit_cond}""".format(
 			dr_or_cr=dr_or_cr,
-			condition=condition or ""
+			condition=condition or "",
+			limit_cond="limit {0}, {1}".format(cint(start), cint(page_length)) if page_length else ""
 		), {
 			"party_type": party_type,
 			"party": party,
 			"account": account,
+			"today": nowdate()
 		}, as_dict=True)
 
+
+def get_payment_amount_against_invoices(party_type, party, account, payment_dr_or_cr, invoices=None):
+	"""
+		Returns a map of (against_voucher_type, against_voucher) and the amount paid against it.
+		If `invoices` is passed, only the payments against those vouchers are aggregated.
+	"""
+	if invoices is not None and not invoices:
+		return frappe._dict()
+
+	invoice_condition = ""
+	if invoices:
+		invoice_condition = "and against_voucher in %(invoices)s"
+
 	payment_entries = frappe.db.sql("""
 		select against_voucher_type, against_voucher,
 			ifnull(sum({payment_dr_or_cr}), 0) as payment_amount
@@ -709,42 +867,20 @@ def get_outstanding_invoices(party_type, party, account, condition=None, filters
 			and {payment_dr_or_cr} > 0
 			and against_voucher is not null and against_voucher != ''
 			and is_cancelled=0
+			{invoice_condition}
 		group by against_voucher_type, against_voucher
-	""".format(payment_dr_or_cr=payment_dr_or_cr), {
+	""".format(payment_dr_or_cr=payment_dr_or_cr, invoice_condition=invoice_condition), {
 		"party_type": party_type,
 		"party": party,
-		"account": account
+		"account": account,
+		"invoices": tuple(set(d.voucher_no for d in invoices or []))
 	}, as_dict=True)
 
 	pe_map = frappe._dict()
 	for d in payment_entries:
 		pe_map.setdefault((d.against_voucher_type, d.against_voucher), d.payment_amount)
 
-	for d in invoice_list:
-		payment_amount = pe_map.get((d.voucher_type, d.voucher_no), 0)
-		outstanding_amount = flt(d.invoice_amount - payment_amount, precision)
-		if outstanding_amount > 0.5 / (10**precision):
-			if (filters and filters.get("outstanding_amt_greater_than") and
-				not (outstanding_amount >= filters.get("outstanding_amt_greater_than") and
-				outstanding_amount <= filters.get("outstanding_amt_less_than"))):
-				continue
-
-			if not d.voucher_type == "Purchase Invoice" or d.voucher_no not in held_invoices:
-				outstanding_invoices.append(
-					frappe._dict({
-						'voucher_no': d.voucher_no,
-						'voucher_type': d.voucher_type,
-						'posting_date': d.posting_date,
-						'invoice_amount': flt(d.invoice_amount),
-						'payment_amount': payment_amount,
-						'outstanding_amount': outstanding_amount,
-						'due_date': d.due_date,
-						'currency': d.currency
-					})
-				)
-
-	outstanding_invoices = sorted(outstanding_invoices, key=lambda k: k['due_date'] or getdate(nowdate()))
-	return outstanding_invoices
+	return pe_map
 
 
 def get_account_name(account_type=None, root_type=None, is_group=None, account_currency=None, company=None):
@@ -923,7 +1059,12 @@ def update_gl_entries_after(posting_date, posting_time, for_warehouses=None, for
 
 
 def repost_gle_for_stock_vouchers(stock_vouchers, posting_date, company=None, warehouse_account=None):
+	from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+		remove_voucher_from_balance_checkpoints,
+	)
+
 	def _delete_gl_entries(voucher_type, voucher_no):
+		remove_voucher_from_balance_checkpoints(voucher_type, voucher_no)
 		frappe.db.sql("""delete from `tabGL Entry`
 			where voucher_type=%s and voucher_no=%s""", (voucher_type, voucher_no))
 
@@ -2,9 +2,32 @@
 # GPL v3 License. See license.txt
 
 import click
+from frappe.commands import get_site, pass_context
 
 
 def call_command(cmd, context):
 	return click.Context(cmd, obj=context).forward(cmd)
 
-commands = []
+@click.command('rebuild-tax-withholding-checkpoints')
+@click.option('--company', help='Rebuild the checkpoints of this company only')
+@pass_context
+def rebuild_tax_withholding_checkpoints(context, company=None):
+	"Recreate the Tax Withholding Checkpoints from the submitted Purchase Invoices"
+	import frappe
+
+	from erpnext.accounts.doctype.tax_withholding_checkpoint.tax_withholding_checkpoint import (
+		rebuild_tax_withholding_checkpoints,
+	)
+
+	site = get_site(context)
+	try:
+		frappe.init(site=site)
+		frappe.connect()
+		rebuild_tax_withholding_checkpoints(company)
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+commands = [
+	rebuild_tax_withholding_checkpoints
+]
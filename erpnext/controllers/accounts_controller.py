@@ -23,6 +23,9 @@ from frappe.utils import (
 )
 
 import erpnext
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	remove_voucher_from_balance_checkpoints,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 )
@@ -178,6 +181,7 @@ class AccountsController(TransactionBase):
 	def on_trash(self):
 		# delete sl and gl entries on deletion of transaction
 		if frappe.db.get_single_value('Accounts Settings', 'delete_linked_ledger_entries'):
+			remove_voucher_from_balance_checkpoints(self.doctype, self.name)
 			frappe.db.sql("delete from `tabGL Entry` where voucher_type=%s and voucher_no=%s", (self.doctype, self.name))
 			frappe.db.sql("delete from `tabStock Ledger Entry` where voucher_type=%s and voucher_no=%s", (self.doctype, self.name))
 
@@ -965,36 +969,37 @@ class AccountsController(TransactionBase):
 
 
 	def validate_multiple_billing(self, ref_dt, item_ref_dn, based_on, parentfield):
-		from erpnext.controllers.status_updater import get_allowance_for
+		from erpnext.controllers.status_updater import get_over_billing_allowance_for
 
-		item_allowance = {}
-		global_qty_allowance, global_amount_allowance = None, None
+		items = [item for item in self.get("items") if item.get(item_ref_dn)]
+		if not items:
+			return
 
 		role_allowed_to_over_bill = frappe.db.get_single_value('Accounts Settings', 'role_allowed_to_over_bill')
 		user_roles = frappe.get_roles()
 
-		total_overbilled_amt = 0.0
+		ref_amounts = self.get_reference_amounts(ref_dt, items, item_ref_dn, based_on)
+		billed_amounts = self.get_billed_amount_for_items(items, item_ref_dn, based_on)
+		item_allowance = get_over_billing_allowance_for(list(set(item.item_code for item in items)))
 
-		for item in self.get("items"):
-			if not item.get(item_ref_dn):
-				continue
+		total_overbilled_amt = 0.0
 
-			ref_amt = flt(frappe.db.get_value(ref_dt + " Item",
-				item.get(item_ref_dn), based_on), self.precision(based_on, item))
+		for item in items:
+			ref_amt = flt(ref_amounts.get(item.get(item_ref_dn)), self.precision(based_on, item))
 			if not ref_amt:
 				frappe.msgprint(
 					_("System will not check overbilling since amount for Item {0} in {1} is zero")
 						.format(item.item_code, ref_dt), title=_("Warning"), indicator="orange")
 				continue
 
-			already_billed = self.get_billed_amount_for_item(item, item_ref_dn, based_on)
+			# billed against the reference, leaving out this row
+			already_billed = sum(amount for row_name, amount in billed_amounts.get(item.get(item_ref_dn), [])
+				if row_name != item.name)
 
 			total_billed_amt = flt(flt(already_billed) + flt(item.get(based_on)),
 				self.precision(based_on, item))
 
-			allowance, item_allowance, global_qty_allowance, global_amount_allowance = \
-				get_allowance_for(item.item_code, item_allowance, global_qty_allowance, global_amount_allowance, "amount")
-
+			allowance = item_allowance.get(item.item_code)
 			max_allowed_amt = flt(ref_amt * (100 + allowance) / 100)
 
 			if total_billed_amt < 0 and max_allowed_amt < 0:
@@ -1015,42 +1020,39 @@ class AccountsController(TransactionBase):
 			frappe.msgprint(_("Overbilling of {} ignored because you have {} role.")
 					.format(total_overbilled_amt, role_allowed_to_over_bill), indicator="orange", alert=True)
 
-	def get_billed_amount_for_item(self, item, item_ref_dn, based_on):
+	def get_reference_amounts(self, ref_dt, items, item_ref_dn, based_on):
+		"""Returns {reference row: `based_on` amount} of the referenced document rows"""
+		ref_names = list(set(item.get(item_ref_dn) for item in items))
+
+		return frappe._dict(frappe.db.sql("""
+			select name, `{0}` from `tab{1} Item`
+			where name in ({2})""".format(based_on, ref_dt, ", ".join(["%s"] * len(ref_names))),
+			tuple(ref_names)))
+
+	def get_billed_amount_for_items(self, items, item_ref_dn, based_on):
 		'''
-			Returns Sum of Amount of
+			Returns {reference row: [(row name, amount)]} of the
 			Sales/Purchase Invoice Items
 			that are linked to `item_ref_dn` (`dn_detail` / `pr_detail`)
-			that are submitted OR not submitted but are under current invoice
+			that are submitted OR not submitted but are under current invoice.
+			Rows of other invoices are summed up with an empty row name.
 		'''
-
-		from frappe.query_builder import Criterion
-		from frappe.query_builder.functions import Sum
-
-		item_doctype = frappe.qb.DocType(item.doctype)
-		based_on_field = frappe.qb.Field(based_on)
-		join_field = frappe.qb.Field(item_ref_dn)
-
-		result = (
-			frappe.qb.from_(item_doctype)
-			.select(Sum(based_on_field))
-			.where(
-				join_field == item.get(item_ref_dn)
-			).where(
-				Criterion.any([ # select all items from other invoices OR current invoices
-					Criterion.all([ # for selecting items from other invoices
-						item_doctype.docstatus == 1,
-						item_doctype.parent != self.name
-					]),
-					Criterion.all([ # for selecting items from current invoice, that are linked to same reference
-						item_doctype.docstatus == 0,
-						item_doctype.parent == self.name,
-						item_doctype.name != item.name
-					])
-				])
-			)
-		).run()
-
-		return result[0][0] if result else 0
+		ref_names = list(set(item.get(item_ref_dn) for item in items))
+
+		billed = frappe.db.sql("""
+			select `{ref_field}`, if(parent = %(parent)s, name, '') as row_name, sum(`{based_on}`)
+			from `tab{doctype}`
+			where `{ref_field}` in %(ref_names)s
+				and ((docstatus = 1 and parent != %(parent)s) or (docstatus = 0 and parent = %(parent)s))
+			group by `{ref_field}`, row_name
+		""".format(ref_field=item_ref_dn, based_on=based_on, doctype=items[0].doctype),
+			{"parent": self.name, "ref_names": ref_names})
+
+		billed_amounts = {}
+		for ref_name, row_name, amount in billed:
+			billed_amounts.setdefault(ref_name, []).append((row_name, flt(amount)))
+
+		return billed_amounts
 
 	def throw_overbill_exception(self, item, max_allowed_amt):
 		frappe.throw(_("Cannot overbill for Item {0} in row {1} more than {2}. To allow over-billing, please set allowance in Accounts Settings")
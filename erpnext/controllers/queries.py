@@ -12,6 +12,7 @@ from frappe.utils import nowdate, unique
 
 import erpnext
 from erpnext.stock.get_item_details import _get_item_tax_template
+from erpnext.utilities.doctype.link_search_term.link_search_term import get_search_index_condition
 
 
 # searches for active employees
@@ -91,12 +92,13 @@ def customer_query(doctype, txt, searchfield, start, page_len, filters):
 	fields = get_fields("Customer", fields)
 
 	searchfields = frappe.get_meta("Customer").get_search_fields()
+	icond = get_search_index_condition("Customer", txt, searchfields)
 	searchfields = " or ".join(field + " like %(txt)s" for field in searchfields)
 
 	return frappe.db.sql("""select {fields} from `tabCustomer`
 		where docstatus < 2
 			and ({scond}) and disabled=0
-			{fcond} {mcond}
+			{icond} {fcond} {mcond}
 		order by
 			if(locate(%(_txt)s, name), locate(%(_txt)s, name), 99999),
 			if(locate(%(_txt)s, customer_name), locate(%(_txt)s, customer_name), 99999),
@@ -105,6 +107,7 @@ def customer_query(doctype, txt, searchfield, start, page_len, filters):
 		limit %(start)s, %(page_len)s""".format(**{
 			"fields": ", ".join(fields),
 			"scond": searchfields,
+			"icond": icond,
 			"mcond": get_match_cond(doctype),
 			"fcond": get_filters_cond(doctype, filters, conditions).replace('%', '%%'),
 		}), {
@@ -133,7 +136,7 @@ def supplier_query(doctype, txt, searchfield, start, page_len, filters):
 			and ({key} like %(txt)s
 			or supplier_name like %(txt)s) and disabled=0
 			and (on_hold = 0 or (on_hold = 1 and CURDATE() > release_date))
-			{mcond}
+			{icond} {mcond}
 		order by
 			if(locate(%(_txt)s, name), locate(%(_txt)s, name), 99999),
 			if(locate(%(_txt)s, supplier_name), locate(%(_txt)s, supplier_name), 99999),
@@ -142,6 +145,7 @@ def supplier_query(doctype, txt, searchfield, start, page_len, filters):
 		limit %(start)s, %(page_len)s """.format(**{
 			'field': ', '.join(fields),
 			'key': searchfield,
+			'icond': get_search_index_condition("Supplier", txt, [searchfield, "supplier_name"]),
 			'mcond':get_match_cond(doctype)
 		}), {
 			'txt': "%%%s%%" % txt,
@@ -225,6 +229,8 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 
 	searchfields = searchfields + [field for field in[searchfield or "name", "item_code", "item_group", "item_name"]
 		if not field in searchfields]
+	# on large catalogues, only the items found by the search index are matched
+	index_cond = get_search_index_condition("Item", txt, searchfields, "tabItem.name")
 	searchfields = " or ".join([field + " like %(txt)s" for field in searchfields])
 
 	if filters and isinstance(filters, dict):
@@ -254,6 +260,11 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 			filters.pop('supplier', None)
 
 
+	barcode_cond = "tabItem.item_code IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)"
+	if index_cond:
+		# only check the barcodes of the items found
+		barcode_cond = "exists(select 1 from `tabItem Barcode` where parent = tabItem.name and barcode LIKE %(txt)s)"
+
 	description_cond = ''
 	if frappe.db.count('Item', cache=True) < 50000:
 		# scan description only if items are less than 50000
@@ -268,9 +279,9 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 			and tabItem.disabled=0
 			and tabItem.has_variants=0
 			and (tabItem.end_of_life > %(today)s or ifnull(tabItem.end_of_life, '0000-00-00')='0000-00-00')
-			and ({scond} or tabItem.item_code IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)
+			and ({scond} or {barcode_cond}
 				{description_cond})
-			{fcond} {mcond}
+			{index_cond} {fcond} {mcond}
 		order by
 			if(locate(%(_txt)s, name), locate(%(_txt)s, name), 99999),
 			if(locate(%(_txt)s, item_name), locate(%(_txt)s, item_name), 99999),
@@ -281,6 +292,8 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 			scond=searchfields,
 			fcond=get_filters_cond(doctype, filters, conditions).replace('%', '%%'),
 			mcond=get_match_cond(doctype).replace('%', '%%'),
+			index_cond=index_cond,
+			barcode_cond=barcode_cond,
 			description_cond = description_cond),
 			{
 				"today": nowdate(),
@@ -399,9 +412,9 @@ def get_batch_no(doctype, txt, searchfield, start, page_len, filters):
 		"page_len": page_len
 	}
 
-	having_clause = "having sum(sle.actual_qty) > 0"
+	qty_cond = "and bb.qty > 0"
 	if filters.get("is_return"):
-		having_clause = ""
+		qty_cond = ""
 
 	meta = frappe.get_meta("Batch", cached=True)
 	searchfields = meta.get_search_fields()
@@ -419,30 +432,33 @@ def get_batch_no(doctype, txt, searchfield, start, page_len, filters):
 			search_columns = ", " + ", ".join(searchfields)
 			search_cond = " or " + " or ".join([field + " like %(txt)s" for field in searchfields])
 
-		batch_nos = frappe.db.sql("""select sle.batch_no, round(sum(sle.actual_qty),2), sle.stock_uom,
-				concat('MFG-',batch.manufacturing_date), concat('EXP-',batch.expiry_date)
+		if filters.get("posting_date"):
+			cond = "and (bb.expiry_date is null or bb.expiry_date >= %(posting_date)s)"
+
+		# read from the balances maintained per batch and warehouse, in the order of their index
+		batch_nos = frappe.db.sql("""select bb.batch_no, round(bb.qty, 2), bb.stock_uom,
+				concat('MFG-',batch.manufacturing_date), concat('EXP-',bb.expiry_date)
 				{search_columns}
-			from `tabStock Ledger Entry` sle
-				INNER JOIN `tabBatch` batch on sle.batch_no = batch.name
+			from `tabBatch Balance` bb
+				INNER JOIN `tabBatch` batch on bb.batch_no = batch.name
 			where
 				batch.disabled = 0
-				and sle.is_cancelled = 0
-				and sle.item_code = %(item_code)s
-				and sle.warehouse = %(warehouse)s
-				and (sle.batch_no like %(txt)s
-				or batch.expiry_date like %(txt)s
+				and bb.item_code = %(item_code)s
+				and bb.warehouse = %(warehouse)s
+				and (bb.batch_no like %(txt)s
+				or bb.expiry_date like %(txt)s
 				or batch.manufacturing_date like %(txt)s
 				{search_cond})
 				and batch.docstatus < 2
+				{qty_cond}
 				{cond}
 				{match_conditions}
-			group by batch_no {having_clause}
-			order by batch.expiry_date, sle.batch_no desc
+			order by bb.expiry_date, bb.batch_no desc
 			limit %(start)s, %(page_len)s""".format(
 				search_columns = search_columns,
 				cond=cond,
 				match_conditions=get_match_cond(doctype),
-				having_clause = having_clause,
+				qty_cond = qty_cond,
 				search_cond = search_cond
 			), args)
 
@@ -380,7 +380,17 @@ class SellingController(StockController):
 		if self.doctype not in ("Delivery Note", "Sales Invoice"):
 			return
 
+		from erpnext.stock.stock_ledger import get_previous_sles
+
 		items = self.get("items") + (self.get("packed_items") or [])
+		posting_date = self.get('posting_date') or self.get('transaction_date')
+		posting_time = self.get('posting_time') or nowtime()
+
+		previous_sles = {}
+		if not self.get("return_against"):
+			previous_sles = get_previous_sles([(d.item_code, d.warehouse) for d in items
+				if d.item_code and not (self.get("is_return") and d.incoming_rate)], posting_date, posting_time)
+
 		for d in items:
 			if not self.get("return_against"):
 				# Get incoming rate based on original item cost based on valuation method
@@ -390,8 +400,8 @@ class SellingController(StockController):
 					d.incoming_rate = get_incoming_rate({
 						"item_code": d.item_code,
 						"warehouse": d.warehouse,
-						"posting_date": self.get('posting_date') or self.get('transaction_date'),
-						"posting_time": self.get('posting_time') or nowtime(),
+						"posting_date": posting_date,
+						"posting_time": posting_time,
 						"qty": qty if cint(self.get("is_return")) else (-1 * qty),
 						"serial_no": d.get('serial_no'),
 						"batch_no": d.get("batch_no"),
@@ -399,7 +409,7 @@ class SellingController(StockController):
 						"voucher_type": self.doctype,
 						"voucher_no": self.name,
 						"allow_zero_valuation": d.get("allow_zero_valuation")
-					}, raise_error_if_no_rate=False)
+					}, raise_error_if_no_rate=False, previous_sle=previous_sles.get((d.item_code, d.warehouse)) or {})
 
 				# For internal transfers use incoming rate as the valuation rate
 				if self.is_internal_transfer():
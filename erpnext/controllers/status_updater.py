@@ -5,7 +5,7 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import comma_or, flt, getdate, now, nowdate
+from frappe.utils import comma_or, cstr, flt, getdate, now, nowdate
 
 
 class OverAllowanceError(frappe.ValidationError): pass
@@ -271,43 +271,48 @@ class StatusUpdater(Document):
 				self._update_percent_field_in_targets(args, update_modified)
 
 	def _update_children(self, args, update_modified):
-		"""Update quantities or amount in child table"""
+		"""Update quantities or amount in child table, for all the rows of the document at once"""
+		detail_ids = set()
 		for d in self.get_all_children():
-			if d.doctype != args['source_dt']:
-				continue
+			if d.doctype == args['source_dt'] and d.get(args['join_field']):
+				detail_ids.add(d.get(args['join_field']))
+
+		self._update_modified(args, update_modified)
 
-			self._update_modified(args, update_modified)
+		if not detail_ids:
+			return
 
-			# updates qty in the child table
-			args['detail_id'] = d.get(args['join_field'])
+		detail_ids = sorted(detail_ids)
+		args['detail_ids'] = ", ".join(frappe.db.escape(d) for d in detail_ids)
 
-			args['second_source_condition'] = ""
-			if args.get('second_source_dt') and args.get('second_source_field') \
-					and args.get('second_join_field'):
-				if not args.get("second_source_extra_cond"):
-					args["second_source_extra_cond"] = ""
+		if not args.get("extra_cond"): args["extra_cond"] = ""
 
-				args['second_source_condition'] = frappe.db.sql(""" select ifnull((select sum(%(second_source_field)s)
-					from `tab%(second_source_dt)s`
-					where `%(second_join_field)s`="%(detail_id)s"
-					and (`tab%(second_source_dt)s`.docstatus=1)
-					%(second_source_extra_cond)s), 0) """ % args)[0][0]
+		source_dt_values = frappe._dict(frappe.db.sql("""
+			select `%(join_field)s`, ifnull(sum(%(source_field)s), 0)
+			from `tab%(source_dt)s` where `%(join_field)s` in (%(detail_ids)s)
+			and (docstatus=1 %(cond)s) %(extra_cond)s
+			group by `%(join_field)s`
+		""" % args))
 
-			if args['detail_id']:
-				if not args.get("extra_cond"): args["extra_cond"] = ""
+		if args.get('second_source_dt') and args.get('second_source_field') \
+				and args.get('second_join_field'):
+			if not args.get("second_source_extra_cond"):
+				args["second_source_extra_cond"] = ""
 
-				args["source_dt_value"] = frappe.db.sql("""
-						(select ifnull(sum(%(source_field)s), 0)
-							from `tab%(source_dt)s` where `%(join_field)s`="%(detail_id)s"
-							and (docstatus=1 %(cond)s) %(extra_cond)s)
-				""" % args)[0][0] or 0.0
+			for detail_id, value in frappe.db.sql(""" select `%(second_join_field)s`, ifnull(sum(%(second_source_field)s), 0)
+				from `tab%(second_source_dt)s`
+				where `%(second_join_field)s` in (%(detail_ids)s)
+				and (`tab%(second_source_dt)s`.docstatus=1)
+				%(second_source_extra_cond)s
+				group by `%(second_join_field)s` """ % args):
+				source_dt_values[detail_id] = flt(source_dt_values.get(detail_id)) + flt(value)
 
-				if args['second_source_condition']:
-					args["source_dt_value"] += flt(args['second_source_condition'])
+		args['source_dt_values'] = " ".join("when {0} then {1}".format(frappe.db.escape(d),
+			flt(source_dt_values.get(d))) for d in detail_ids)
 
-				frappe.db.sql("""update `tab%(target_dt)s`
-					set %(target_field)s = %(source_dt_value)s %(update_modified)s
-					where name='%(detail_id)s'""" % args)
+		frappe.db.sql("""update `tab%(target_dt)s`
+			set %(target_field)s = (case name %(source_dt_values)s end) %(update_modified)s
+			where name in (%(detail_ids)s)""" % args)
 
 	def _update_percent_field_in_targets(self, args, update_modified=True):
 		"""Update percent field in parent transaction"""
@@ -320,25 +325,28 @@ class StatusUpdater(Document):
 			distinct_transactions = set(d.get(args['percent_join_field'])
 				for d in self.get_all_children(args['source_dt']))
 
-			for name in distinct_transactions:
-				if name:
-					args['name'] = name
-					self._update_percent_field(args, update_modified)
+			names = sorted(name for name in distinct_transactions if name)
+			if names:
+				self._update_percent_field(args, update_modified, names=names)
 
-	def _update_percent_field(self, args, update_modified=True):
-		"""Update percent field in parent transaction"""
+	def _update_percent_field(self, args, update_modified=True, names=None):
+		"""Update percent field in parent transaction(s), `names` or `args['name']`"""
+		if not names:
+			names = [args['name']]
 
 		self._update_modified(args, update_modified)
 
 		if args.get('target_parent_field'):
-			frappe.db.sql("""update `tab%(target_parent_dt)s`
+			args['names'] = ", ".join(frappe.db.escape(cstr(name)) for name in names)
+
+			frappe.db.sql("""update `tab%(target_parent_dt)s` target_parent
 				set %(target_parent_field)s = round(
 					ifnull((select
 						ifnull(sum(if(abs(%(target_ref_field)s) > abs(%(target_field)s), abs(%(target_field)s), abs(%(target_ref_field)s))), 0)
 						/ sum(abs(%(target_ref_field)s)) * 100
-					from `tab%(target_dt)s` where parent="%(name)s" having sum(abs(%(target_ref_field)s)) > 0), 0), 6)
+					from `tab%(target_dt)s` where parent=target_parent.name having sum(abs(%(target_ref_field)s)) > 0), 0), 6)
 					%(update_modified)s
-				where name='%(name)s'""" % args)
+				where target_parent.name in (%(names)s)""" % args)
 
 			# update field
 			if args.get('status_field'):
@@ -346,12 +354,13 @@ class StatusUpdater(Document):
 					set %(status_field)s = if(%(target_parent_field)s<0.001,
 						'Not %(keyword)s', if(%(target_parent_field)s>=99.999999,
 						'Fully %(keyword)s', 'Partly %(keyword)s'))
-					where name='%(name)s'""" % args)
+					where name in (%(names)s)""" % args)
 
 			if update_modified:
-				target = frappe.get_doc(args["target_parent_dt"], args["name"])
-				target.set_status(update=True)
-				target.notify_update()
+				for name in names:
+					target = frappe.get_doc(args["target_parent_dt"], name)
+					target.set_status(update=True)
+					target.notify_update()
 
 	def _update_modified(self, args, update_modified):
 		if not update_modified:
@@ -445,3 +454,19 @@ def get_allowance_for(item_code, item_allowance=None, global_qty_allowance=None,
 		item_allowance.setdefault(item_code, frappe._dict()).setdefault("amount", over_billing_allowance)
 
 	return allowance, item_allowance, global_qty_allowance, global_amount_allowance
+
+def get_over_billing_allowance_for(item_codes):
+	"""
+		Returns {item_code: over billing allowance} for the items, the global allowance if not set
+	"""
+	global_amount_allowance = None
+	item_allowance = dict(frappe.get_all("Item", filters={"name": ["in", item_codes]},
+		fields=["name", "over_billing_allowance"], as_list=1)) if item_codes else {}
+
+	for item_code in item_codes:
+		if not item_allowance.get(item_code):
+			if global_amount_allowance is None:
+				global_amount_allowance = flt(frappe.db.get_single_value('Accounts Settings', 'over_billing_allowance'))
+			item_allowance[item_code] = global_amount_allowance
+
+	return item_allowance
@@ -4,6 +4,7 @@ from functools import partial
 import frappe
 
 from erpnext.controllers import queries
+from erpnext.utilities.doctype.link_search_term import link_search_term
 
 
 def add_default_params(func, doctype):
@@ -62,6 +63,40 @@ class TestQueries(unittest.TestCase):
 		query(txt="", filters={"supplier": None})
 		query(txt="", filters={"supplier": ""})
 
+	def test_item_query_with_search_index(self):
+		query = add_default_params(queries.item_query, "Item")
+
+		link_search_term.rebuild_search_index("Item")
+		min_records = link_search_term.MIN_RECORDS_FOR_INDEX
+		link_search_term.MIN_RECORDS_FOR_INDEX = 0
+		try:
+			self.assertTrue(link_search_term.use_search_index("Item", "Home Desktop"))
+			self.assertGreaterEqual(len(query(txt="Home Desktop")), 3)
+			self.assertEqual(len(query(txt="Home Desktop 200")), 1)
+			self.assert_nested_in("_Test Item Home Desktop 200", query(txt="desktop 200"))
+
+			# texts without trigrams are searched by the scan
+			self.assertFalse(link_search_term.use_search_index("Item", "De"))
+		finally:
+			link_search_term.MIN_RECORDS_FOR_INDEX = min_records
+
+	def test_search_index_after_item_group_rename(self):
+		from erpnext.stock.doctype.item.test_item import make_item
+
+		if not frappe.db.exists("Item Group", "_Test Search Index Group"):
+			frappe.get_doc({"doctype": "Item Group", "item_group_name": "_Test Search Index Group",
+				"parent_item_group": "All Item Groups"}).insert()
+		make_item("_Test Search Index Item", {"item_group": "_Test Search Index Group"})
+		link_search_term.rebuild_search_index("Item")
+
+		frappe.rename_doc("Item Group", "_Test Search Index Group", "_Test Renamed Index Group")
+		try:
+			terms = frappe.get_all("Link Search Term", pluck="term",
+				filters={"reference_doctype": "Item", "reference_name": "_Test Search Index Item"})
+			self.assertIn("ren", terms)
+		finally:
+			frappe.rename_doc("Item Group", "_Test Renamed Index Group", "_Test Search Index Group")
+
 	def test_bom_qury(self):
 		query = add_default_params(queries.bom, "BOM")
 
@@ -125,7 +125,10 @@ class ECommerceSettings(Document):
 
 			# if search index fields get changed
 			if not (new_fields == old_fields):
-				create_website_items_index()
+				if is_search_module_loaded():
+					create_website_items_index()
+				else:
+					frappe.enqueue("erpnext.e_commerce.redisearch_utils.reindex_all_web_items", queue="long")
 
 def validate_cart_settings(doc=None, method=None):
 	frappe.get_doc("E Commerce Settings", "E Commerce Settings").run_method("validate")
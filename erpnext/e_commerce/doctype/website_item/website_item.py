@@ -11,6 +11,7 @@ from frappe.website.doctype.website_slideshow.website_slideshow import get_slide
 from frappe.website.website_generator import WebsiteGenerator
 
 from erpnext.e_commerce.doctype.item_review.item_review import get_item_reviews
+from erpnext.e_commerce.product_data_engine.filters import clear_product_filters_cache
 from erpnext.e_commerce.redisearch_utils import (
 	delete_item_from_index,
 	insert_item_to_index,
@@ -78,6 +79,7 @@ class WebsiteItem(WebsiteGenerator):
 	def on_trash(self):
 		super(WebsiteItem, self).on_trash()
 		delete_item_from_index(self)
+		clear_product_filters_cache()
 		self.publish_unpublish_desk_item(publish=False)
 
 	def validate_duplicate_website_item(self):
@@ -391,6 +393,8 @@ def on_doctype_update():
 
 	frappe.db.add_index("Website Item", ["item_group"])
 	frappe.db.add_index("Website Item", ["brand"])
+	# product listing orders published items by ranking
+	frappe.db.add_index("Website Item", ["published", "ranking"])
 
 def check_if_user_is_customer(user=None):
 	from frappe.contacts.doctype.contact.contact import get_contact_name
@@ -0,0 +1,183 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""
+Inverted index of Website Items kept in Redis sorted sets, used for product search
+when the RediSearch module is not loaded.
+
+Every word of the searchable fields maps to a sorted set of the items containing it,
+scored by ranking. Words of the name fields are also indexed by their prefixes
+for autocomplete. A search intersects the sets of the words in the query.
+"""
+
+import re
+
+import frappe
+from frappe.utils import cint, cstr, strip_html_tags
+from frappe.utils.redis_wrapper import RedisWrapper
+
+from erpnext.e_commerce.redisearch_utils import (
+	create_web_item_map,
+	get_cache_key,
+	get_fields_indexed,
+	make_key,
+)
+
+LOCAL_INDEX_PREFIX = 'website_items_local_index'
+# fields matched as the user types, other fields match whole words
+PREFIX_INDEXED_FIELDS = ('web_item_name', 'item_name', 'item_code', 'brand', 'item_group')
+NON_TEXT_FIELDS = ('name', 'route', 'thumbnail', 'ranking', 'website_image')
+MIN_PREFIX_LENGTH = 2
+MAX_TERM_LENGTH = 20
+REINDEX_BATCH_SIZE = 1000
+
+def get_redis():
+	"Redis client without the key handling of RedisWrapper, keys are made with `make_key`."
+	return super(RedisWrapper, frappe.cache())
+
+def get_term_key(term):
+	return make_key(f"{LOCAL_INDEX_PREFIX}:term:{term}")
+
+def get_item_keys_key(name):
+	"Set of the term keys an item is added to, to remove it from them."
+	return make_key(f"{LOCAL_INDEX_PREFIX}:item:{frappe.scrub(name)}")
+
+def get_built_key():
+	return make_key(f"{LOCAL_INDEX_PREFIX}:built")
+
+def get_terms(text):
+	return set(term[:MAX_TERM_LENGTH] for term in re.findall(r"\w+", strip_html_tags(cstr(text)).lower()))
+
+def get_indexed_text_fields():
+	fields = set(get_fields_indexed()).union(PREFIX_INDEXED_FIELDS)
+	return [field for field in fields if field not in NON_TEXT_FIELDS]
+
+def get_item_term_scores(web_item, fields):
+	"""Returns {term: score} for the item, name fields score higher than the others"""
+	term_scores = {}
+	ranking = cint(web_item.get('ranking')) * 10
+
+	for field in fields:
+		weight = 2 if field in PREFIX_INDEXED_FIELDS else 1
+
+		for term in get_terms(web_item.get(field)):
+			terms = [term]
+			if field in PREFIX_INDEXED_FIELDS:
+				terms = [term[:i] for i in range(MIN_PREFIX_LENGTH, len(term) + 1)] or [term]
+
+			for t in terms:
+				term_scores[t] = max(term_scores.get(t, 0), ranking + weight)
+
+	return term_scores
+
+def is_local_index_built():
+	return bool(get_redis().exists(get_built_key()))
+
+def insert_item_to_local_index(website_item_doc, fields=None, pipe=None):
+	execute = not pipe
+	pipe = pipe or frappe.cache().pipeline()
+
+	delete_item_from_local_index(website_item_doc, pipe=pipe)
+
+	if website_item_doc.get('published'):
+		fields = fields or get_indexed_text_fields()
+		term_scores = get_item_term_scores(website_item_doc, fields)
+		term_keys = [get_term_key(term) for term in term_scores]
+
+		for term, score in term_scores.items():
+			pipe.zadd(get_term_key(term), {website_item_doc.name: score})
+
+		if term_keys:
+			pipe.sadd(get_item_keys_key(website_item_doc.name), *term_keys)
+
+		# same item hash as the redisearch index, for results
+		item_key = make_key(get_cache_key(website_item_doc.name))
+		for k, v in create_web_item_map(website_item_doc).items():
+			pipe.hset(item_key, k, cstr(v))
+
+	if execute:
+		pipe.execute()
+
+def delete_item_from_local_index(website_item_doc, pipe=None):
+	item_keys_key = get_item_keys_key(website_item_doc.name)
+	term_keys = get_redis().smembers(item_keys_key)
+
+	execute = not pipe
+	pipe = pipe or frappe.cache().pipeline()
+
+	for key in term_keys:
+		pipe.zrem(key, website_item_doc.name)
+
+	pipe.delete(item_keys_key)
+	pipe.delete(make_key(get_cache_key(website_item_doc.name)))
+
+	if execute:
+		pipe.execute()
+
+def reindex_all_web_items_locally():
+	"""Rebuild the local index of all published Website Items"""
+	cache, redis = frappe.cache(), get_redis()
+
+	pipe = cache.pipeline()
+	for key in redis.scan_iter(match=make_key(f"{LOCAL_INDEX_PREFIX}:*"), count=REINDEX_BATCH_SIZE):
+		pipe.delete(key)
+	pipe.execute()
+
+	fields = get_indexed_text_fields()
+	all_fields = list(set(fields + get_fields_indexed() + ['published']))
+
+	start = 0
+	while True:
+		items = frappe.get_all(
+			'Website Item',
+			fields=all_fields,
+			filters={"published": 1},
+			order_by="name",
+			limit_start=start,
+			limit_page_length=REINDEX_BATCH_SIZE
+		)
+
+		pipe = cache.pipeline()
+		for item in items:
+			insert_item_to_local_index(item, fields=fields, pipe=pipe)
+		pipe.execute()
+
+		if len(items) < REINDEX_BATCH_SIZE:
+			break
+		start += REINDEX_BATCH_SIZE
+
+	redis.set(get_built_key(), 1)
+
+def search_local_index(query, limit=10):
+	"""Returns names of the Website Items matching all words of the query, best ranked first"""
+	term_keys = [get_term_key(term) for term in get_terms(query)]
+	if not term_keys:
+		return []
+
+	if len(term_keys) == 1:
+		names = get_redis().zrevrange(term_keys[0], 0, limit - 1)
+	else:
+		result_key = make_key(f"{LOCAL_INDEX_PREFIX}:query:{frappe.generate_hash(length=10)}")
+
+		pipe = frappe.cache().pipeline()
+		pipe.zinterstore(result_key, term_keys, aggregate="MAX")
+		pipe.zrevrange(result_key, 0, limit - 1)
+		pipe.delete(result_key)
+		names = pipe.execute()[1]
+
+	return [frappe.safe_decode(name) for name in names]
+
+def get_local_search_results(query, limit=10):
+	"""Returns the indexed fields of the Website Items matching the query"""
+	names = search_local_index(query, limit)
+
+	pipe = frappe.cache().pipeline()
+	for name in names:
+		pipe.hgetall(make_key(get_cache_key(name)))
+
+	results = []
+	for item in pipe.execute():
+		if item:
+			results.append(frappe._dict({frappe.safe_decode(k): frappe.safe_decode(v) for k, v in item.items()}))
+
+	return results
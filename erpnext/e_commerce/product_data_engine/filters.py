@@ -1,7 +1,9 @@
 # Copyright (c) 2021, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
+import hashlib
+
 import frappe
-from frappe.utils import floor
+from frappe.utils import cstr, floor
 
 
 class ProductFiltersBuilder:
@@ -14,8 +16,6 @@ class ProductFiltersBuilder:
 		self.item_group = item_group
 
 	def get_field_filters(self):
-		from erpnext.setup.doctype.item_group.item_group import get_child_groups_for_website
-
 		if not self.item_group and not self.doc.enable_field_filters:
 			return
 
@@ -26,10 +26,37 @@ class ProductFiltersBuilder:
 		item_meta = frappe.get_meta('Item', cached=True)
 		fields = [item_meta.get_field(field) for field in filter_fields if item_meta.has_field(field)]
 
+		# values used in published items are read from all the items, cache them
+		item_values_map = get_cached_filters(
+			["field_values", self.item_group] + [df.fieldname for df in fields],
+			lambda: self.get_item_values_map(fields))
+
 		for df in fields:
-			item_filters, item_or_filters = {"published_in_website": 1}, []
 			link_doctype_values = self.get_filtered_link_doctype_records(df)
 
+			if df.fieldtype == "Link":
+				values = list(set(item_values_map.get(df.fieldname) or []) & link_doctype_values) # intersection of both
+			else:
+				# table multiselect
+				values = list(link_doctype_values)
+
+			# Remove None
+			if None in values:
+				values.remove(None)
+
+			if values:
+				filter_data.append([df, values])
+
+		return filter_data
+
+	def get_item_values_map(self, fields):
+		"""Returns values of the link fields set in published items"""
+		from erpnext.setup.doctype.item_group.item_group import get_child_groups_for_website
+
+		item_values_map = {}
+		for df in fields:
+			item_filters, item_or_filters = {"published_in_website": 1}, []
+
 			if df.fieldtype == "Link":
 				if self.item_group:
 					include_child = frappe.db.get_value("Item Group", self.item_group, "include_descendants")
@@ -47,7 +74,7 @@ class ProductFiltersBuilder:
 						])
 
 				# Get link field values attached to published items
-				item_values = frappe.get_all(
+				item_values_map[df.fieldname] = frappe.get_all(
 					"Item",
 					fields=[df.fieldname],
 					filters=item_filters,
@@ -56,19 +83,7 @@ class ProductFiltersBuilder:
 					pluck=df.fieldname
 				)
 
-				values = list(set(item_values) & link_doctype_values) # intersection of both
-			else:
-				# table multiselect
-				values = list(link_doctype_values)
-
-			# Remove None
-			if None in values:
-				values.remove(None)
-
-			if values:
-				filter_data.append([df, values])
-
-		return filter_data
+		return item_values_map
 
 	def get_filtered_link_doctype_records(self, field):
 		"""
@@ -109,6 +124,10 @@ class ProductFiltersBuilder:
 		if not attributes:
 			return []
 
+		return get_cached_filters(["attribute_filters"] + attributes,
+			lambda: self.get_attribute_values(attributes))
+
+	def get_attribute_values(self, attributes):
 		result = frappe.get_all(
 			"Item Variant Attribute",
 			filters={
@@ -147,3 +166,23 @@ class ProductFiltersBuilder:
 			discount_filters.append([discount, label])
 
 		return discount_filters
+
+
+def get_cached_filters(key, build_filters):
+	"""Filters are the same for every visitor, build them once until items change.
+	The last modified Item, Website Item and Item Group are a part of the key, so changes invalidate it."""
+	last_modified = [frappe.db.sql("select max(modified) from `tab{0}`".format(doctype))[0][0]
+		for doctype in ("Item", "Website Item", "Item Group")]
+	key = "product_filters:" + hashlib.sha1(
+		"|".join(cstr(d) for d in key + last_modified).encode()).hexdigest()
+
+	filters = frappe.cache().get_value(key)
+	if filters is None:
+		filters = build_filters()
+		frappe.cache().set_value(key, filters, expires_in_sec=60 * 60)
+
+	return filters
+
+def clear_product_filters_cache():
+	"""Deleted records do not change the last modified dates in the key, clear all the cached filters"""
+	frappe.cache().delete_keys("product_filters:")
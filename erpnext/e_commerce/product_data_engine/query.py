@@ -5,9 +5,14 @@ import frappe
 from frappe.utils import flt
 
 from erpnext.e_commerce.doctype.item_review.item_review import get_customer
+from erpnext.e_commerce.local_search_index import is_local_index_built, search_local_index
+from erpnext.e_commerce.redisearch_utils import is_search_module_loaded
 from erpnext.e_commerce.shopping_cart.product_info import get_product_info_for_website
 from erpnext.utilities.product import get_non_stock_item_status
 
+# best ranked matches of a search term that are listed
+MAX_SEARCH_MATCHES = 1000
+
 
 class ProductQuery:
 	"""Query engine for product listing
@@ -25,6 +30,7 @@ class ProductQuery:
 
 		self.or_filters = []
 		self.filters = [["published", "=", 1]]
+		self.cart_items, self.discount_list = [], []
 		self.fields = [
 			"web_item_name", "name", "item_name", "item_code", "website_image",
 			"variant_of", "has_variants", "item_group", "image", "web_long_description",
@@ -44,7 +50,8 @@ class ProductQuery:
 		"""
 		# track if discounts included in field filters
 		self.filter_with_discount = bool(fields.get("discount"))
-		result, discount_list, website_item_groups, cart_items, count = [], [], [], [], 0
+		self.field_filters = fields
+		result, discount_list, count = [], [], 0
 
 		if fields:
 			self.build_fields_filters(fields)
@@ -55,6 +62,9 @@ class ProductQuery:
 		if self.settings.hide_variants:
 			self.filters.append(["variant_of", "is", "not set"])
 
+		if self.settings.enabled:
+			self.cart_items = self.get_cart_items()
+
 		# query results
 		if attributes:
 			result, count = self.query_items_with_attributes(attributes, start)
@@ -64,17 +74,16 @@ class ProductQuery:
 		# sort combined results by ranking
 		result = sorted(result, key=lambda x: x.get("ranking"), reverse=True)
 
-		if self.settings.enabled:
-			cart_items = self.get_cart_items()
-
-		result, discount_list = self.add_display_details(result, discount_list, cart_items)
+		if self.filter_with_discount:
+			# details are added while filtering by discount
+			discount_list = self.discount_list
+		else:
+			result, discount_list = self.add_display_details(result, discount_list, self.cart_items)
 
 		discounts = []
 		if discount_list:
 			discounts = [min(discount_list), max(discount_list)]
 
-		result = self.filter_results_by_discount(fields, result)
-
 		return {
 			"items": result,
 			"items_count": count,
@@ -83,34 +92,47 @@ class ProductQuery:
 
 	def query_items(self, start=0):
 		"""Build a query to fetch Website Items based on field filters."""
-		# MySQL does not support offset without limit,
-		# frappe does not accept two parameters for limit
-		# https://dev.mysql.com/doc/refman/8.0/en/select.html#id4651989
-		count_items = frappe.db.get_all(
-			"Website Item",
-			filters=self.filters,
-			or_filters=self.or_filters,
-			limit_page_length=184467440737095516,
-			limit_start=start, # get all items from this offset for total count ahead
-			order_by="ranking desc")
-		count = len(count_items)
-
-		# If discounts included, return all rows.
-		# Slice after filtering rows with discount (See `filter_results_by_discount`).
-		# Slicing before hand will miss discounted items on the 3rd or 4th page.
-		# Discounts are fetched on computing Pricing Rules so we cannot query them directly.
-		page_length = 184467440737095516 if self.filter_with_discount else self.page_length
-
-		items = frappe.db.get_all(
+		if self.filter_with_discount:
+			return self.query_discounted_items(start=start)
+
+		# Fetch one item more than the page, the count is only used to know if there is a next page.
+		# Counting all the items ahead of the offset is slow on large catalogs.
+		items = self.get_website_items(start, self.page_length + 1)
+
+		return items[:self.page_length], len(items)
+
+	def query_discounted_items(self, start=0):
+		"""Fetch a page of Website Items within the discount filter.
+
+		Discounts are fetched on computing Pricing Rules so we cannot query them directly.
+		Items are read in batches by ranking and filtered until the page (and one more item) is found,
+		so that discounted items on the 3rd or 4th page are not missed.
+		"""
+		batch_size = self.page_length * 5
+		items, offset = [], 0
+
+		while len(items) <= start + self.page_length:
+			batch = self.get_website_items(offset, batch_size)
+			offset += batch_size
+
+			batch, self.discount_list = self.add_display_details(batch, self.discount_list, self.cart_items)
+			items.extend(self.filter_results_by_discount(self.field_filters, batch))
+
+			if len(batch) < batch_size:
+				break
+
+		items = items[start:]
+		return items[:self.page_length], len(items)
+
+	def get_website_items(self, start, page_length):
+		return frappe.db.get_all(
 			"Website Item",
 			fields=self.fields,
 			filters=self.filters,
 			or_filters=self.or_filters,
 			limit_page_length=page_length,
 			limit_start=start,
-			order_by="ranking desc")
-
-		return items, count
+			order_by="ranking desc, name desc")
 
 	def query_items_with_attributes(self, attributes, start=0):
 		"""Build a query to fetch Website Items based on field & attribute filters."""
@@ -190,6 +212,12 @@ class ProductQuery:
 		Args:
 			search_term (str): Search candidate
 		"""
+		if not is_search_module_loaded() and is_local_index_built():
+			# match against the local search index instead of scanning with like
+			names = search_local_index(search_term, limit=MAX_SEARCH_MATCHES)
+			self.filters.append(["name", "in", names or [""]])
+			return
+
 		# Default fields to search from
 		default_fields = {'item_code', 'item_name', 'web_long_description', 'item_group'}
 
@@ -287,9 +315,4 @@ class ProductQuery:
 			discount_percent = frappe.utils.flt(fields["discount"][0])
 			result = [row for row in result if row.get("discount_percent") and row.discount_percent <= discount_percent]
 
-		if self.filter_with_discount:
-			# no limit was added to results while querying
-			# slice results manually
-			result[:self.page_length]
-
 		return result
@@ -327,6 +327,31 @@ class TestProductDataEngine(unittest.TestCase):
 			"hide_variants": 0
 		})
 
+	def test_product_search_with_local_index(self):
+		"Test if the local search index matches words and name prefixes by ranking."
+		from erpnext.e_commerce.local_search_index import (
+			get_built_key,
+			get_redis,
+			reindex_all_web_items_locally,
+			search_local_index,
+		)
+
+		def item_codes(names):
+			return [frappe.db.get_value("Website Item", name, "item_code") for name in names]
+
+		reindex_all_web_items_locally()
+
+		try:
+			self.assertEqual(item_codes(search_local_index("Test 13I Laptop")), ["Test 13I Laptop"])
+			self.assertEqual(item_codes(search_local_index("lapt", limit=2)), ["Test 17I Laptop", "Test 16I Laptop"])
+			self.assertEqual(search_local_index("no such product"), [])
+
+			engine = ProductQuery()
+			result = engine.query(attributes={}, fields={}, search_term="laptop 12i", start=0, item_group=None)
+			self.assertEqual([item.get("item_code") for item in result.get("items")], ["Test 12I Laptop"])
+		finally:
+			get_redis().delete(get_built_key())
+
 def create_variant_web_item():
 	"Create Variant and Template Website Items."
 	from erpnext.controllers.item_variant import create_variant
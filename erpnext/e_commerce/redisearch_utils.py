@@ -41,6 +41,19 @@ def if_redisearch_loaded(function):
 
 	return wrapper
 
+def with_local_index_fallback(local_function):
+	"""Decorator to run `local_function` (dotted path) instead when Redisearch is not loaded,
+		to keep the local search index of `local_search_index` updated."""
+	def decorator(function):
+		def wrapper(*args, **kwargs):
+			if is_search_module_loaded():
+				return function(*args, **kwargs)
+			return frappe.get_attr(local_function)(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
 def make_key(key):
 	return "{0}|{1}".format(frappe.conf.db_name, key).encode('utf-8')
 
@@ -85,7 +98,7 @@ def to_search_field(field):
 
 	return TextField(field)
 
-@if_redisearch_loaded
+@with_local_index_fallback("erpnext.e_commerce.local_search_index.insert_item_to_local_index")
 def insert_item_to_index(website_item_doc):
 	# Insert item to index
 	key = get_cache_key(website_item_doc.name)
@@ -111,13 +124,13 @@ def create_web_item_map(website_item_doc):
 
 	return web_item
 
-@if_redisearch_loaded
+@with_local_index_fallback("erpnext.e_commerce.local_search_index.insert_item_to_local_index")
 def update_index_for_item(website_item_doc):
 	# Reinsert to Cache
 	insert_item_to_index(website_item_doc)
 	define_autocomplete_dictionary()
 
-@if_redisearch_loaded
+@with_local_index_fallback("erpnext.e_commerce.local_search_index.delete_item_from_local_index")
 def delete_item_from_index(website_item_doc):
 	cache = frappe.cache()
 	key = get_cache_key(website_item_doc.name)
@@ -172,7 +185,7 @@ def define_autocomplete_dictionary():
 
 	return True
 
-@if_redisearch_loaded
+@with_local_index_fallback("erpnext.e_commerce.local_search_index.reindex_all_web_items_locally")
 def reindex_all_web_items():
 	items = frappe.get_all(
 		'Website Item',
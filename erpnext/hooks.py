@@ -305,6 +305,14 @@ doc_events = {
 	},
 	"Integration Request": {
 		"validate": "erpnext.accounts.doctype.payment_request.payment_request.validate_payment"
+	},
+	("Item", "Customer", "Supplier"): {
+		"on_update": "erpnext.utilities.doctype.link_search_term.link_search_term.update_search_index",
+		"on_trash": "erpnext.utilities.doctype.link_search_term.link_search_term.delete_from_search_index",
+		"after_rename": "erpnext.utilities.doctype.link_search_term.link_search_term.rename_in_search_index"
+	},
+	("Item Group", "Customer Group", "Supplier Group", "Territory"): {
+		"after_rename": "erpnext.utilities.doctype.link_search_term.link_search_term.reindex_linked_records"
 	}
 }
 
@@ -339,7 +347,8 @@ scheduler_events = {
 	],
 	"hourly_long": [
 		"erpnext.stock.doctype.repost_item_valuation.repost_item_valuation.repost_entries",
-		"erpnext.bulk_transaction.doctype.bulk_transaction_log.bulk_transaction_log.retry_failing_transaction"
+		"erpnext.bulk_transaction.doctype.bulk_transaction_log.bulk_transaction_log.retry_failing_transaction",
+		"erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint.fold_balance_checkpoints"
 	],
 	"daily": [
 		"erpnext.stock.reorder_item.reorder_item",
@@ -12,6 +12,7 @@ from erpnext.hr.doctype.employee_onboarding.employee_onboarding import (
 )
 from erpnext.hr.doctype.job_offer.test_job_offer import create_job_offer
 from erpnext.payroll.doctype.salary_slip.test_salary_slip import make_holiday_list
+from erpnext.projects.doctype.project.project import update_queued_projects
 
 
 class TestEmployeeOnboarding(unittest.TestCase):
@@ -50,6 +51,7 @@ class TestEmployeeOnboarding(unittest.TestCase):
 			task = frappe.get_doc('Task', task.name)
 			task.status = 'Completed'
 			task.save()
+		update_queued_projects()
 
 		# boarding status
 		onboarding.reload()
@@ -11,6 +11,7 @@ from erpnext.accounts.doctype.sales_invoice.sales_invoice import get_bank_cash_a
 from erpnext.accounts.general_ledger import make_gl_entries
 from erpnext.controllers.accounts_controller import AccountsController
 from erpnext.hr.utils import set_employee_name, share_doc_with_approver, validate_active_employee
+from erpnext.projects.doctype.project.project import queue_project_update
 
 
 class InvalidExpenseApproverError(frappe.ValidationError): pass
@@ -100,7 +101,7 @@ class ExpenseClaim(AccountsController):
 		if self.task:
 			self.update_task()
 		elif self.project:
-			frappe.get_doc("Project", self.project).update_project()
+			queue_project_update(self.project)
 
 	def make_gl_entries(self, cancel=False):
 		if flt(self.total_sanctioned_amount) > 0:
@@ -6,9 +6,17 @@ import frappe
 from frappe import _
 from frappe.utils import add_days, cint, date_diff, flt, get_datetime, getdate, nowdate
 
-from erpnext.accounts.general_ledger import make_gl_entries
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	update_balance_checkpoints,
+)
+from erpnext.accounts.general_ledger import make_entry, make_gl_entries, make_reverse_gl_entries
 from erpnext.controllers.accounts_controller import AccountsController
 
+ACCRUAL_FIELDS = ["loan", "company", "is_term_loan", "applicant_type", "applicant", "interest_income_account",
+	"loan_account", "pending_principal_amount", "interest_amount", "total_pending_interest_amount",
+	"penalty_amount", "posting_date", "last_accrual_date", "process_loan_interest_accrual",
+	"repayment_schedule_name", "payable_principal_amount", "accrual_type"]
+
 
 class LoanInterestAccrual(AccountsController):
 	def validate(self):
@@ -31,16 +39,54 @@ class LoanInterestAccrual(AccountsController):
 		if self.repayment_schedule_name:
 			self.update_is_accrued()
 
-		self.make_gl_entries(cancel=1)
+		if self.get_process_gl_entries():
+			self.cancel_process_gl_entries()
+		else:
+			self.make_gl_entries(cancel=1)
+
 		self.ignore_linked_doctypes = ['GL Entry']
 
+	def get_process_gl_entries(self):
+		"""GL entries of the accrual posted under its process, see `make_process_gl_entries`"""
+		if not self.process_loan_interest_accrual:
+			return []
+
+		return frappe.get_all("GL Entry", fields=["*"], filters={
+			"voucher_type": "Process Loan Interest Accrual",
+			"voucher_no": self.process_loan_interest_accrual,
+			"voucher_detail_no": self.name,
+			"is_cancelled": 0
+		})
+
+	def cancel_process_gl_entries(self):
+		"""Cancels the loan account entry of the accrual and takes its share out of the process income entry"""
+		make_reverse_gl_entries(self.get_process_gl_entries(), voucher_detail_no=self.name)
+
+		if not self.interest_amount:
+			return
+
+		income_entry = make_entry(self.get_gl_dict({
+			"account": self.interest_income_account,
+			"against": self.loan_account,
+			"debit": self.interest_amount,
+			"debit_in_account_currency": self.interest_amount,
+			"voucher_type": "Process Loan Interest Accrual",
+			"voucher_no": self.process_loan_interest_accrual,
+			"voucher_detail_no": self.name,
+			"remarks": _("On cancellation of {0}").format(self.name),
+			"cost_center": frappe.get_cached_value('Loan', self.loan, 'cost_center'),
+			"posting_date": self.posting_date
+		}), adv_adj=False, update_outstanding="Yes", validate_budget=False)
+
+		update_balance_checkpoints([income_entry])
+
 	def update_is_accrued(self):
 		frappe.db.set_value('Repayment Schedule', self.repayment_schedule_name, 'is_accrued', 0)
 
 	def make_gl_entries(self, cancel=0, adv_adj=0):
 		gle_map = []
 
-		cost_center = frappe.db.get_value('Loan', self.loan, 'cost_center')
+		cost_center = frappe.get_cached_value('Loan', self.loan, 'cost_center')
 
 		if self.interest_amount:
 			gle_map.append(
@@ -82,13 +128,17 @@ class LoanInterestAccrual(AccountsController):
 # For Eg: If Loan disbursement date is '01-09-2019' and disbursed amount is 1000000 and
 # rate of interest is 13.5 then first loan interest accural will be on '01-10-2019'
 # which means interest will be accrued for 30 days which should be equal to 11095.89
-def calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_interest, accrual_type):
+def calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_interest, accrual_type,
+	last_accrual_date=None):
 	from erpnext.loan_management.doctype.loan_repayment.loan_repayment import (
 		calculate_amounts,
 		get_pending_principal_amount,
 	)
 
-	no_of_days = get_no_of_days_for_interest_accural(loan, posting_date)
+	if not last_accrual_date:
+		last_accrual_date = get_last_accrual_date(loan.name)
+
+	no_of_days = get_no_of_days_for_interest_accural(loan, posting_date, last_accrual_date=last_accrual_date)
 	precision = cint(frappe.db.get_default("currency_precision")) or 2
 
 	if no_of_days <= 0:
@@ -99,6 +149,10 @@ def calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_i
 	interest_per_day = get_per_day_interest(pending_principal_amount, loan.rate_of_interest, posting_date)
 	payable_interest = interest_per_day * no_of_days
 
+	# skip the pending amount computation for loans with nothing to accrue
+	if flt(payable_interest, precision) <= 0.0:
+		return
+
 	pending_amounts = calculate_amounts(loan.name, posting_date, payment_type='Loan Closure')
 
 	args = frappe._dict({
@@ -113,11 +167,11 @@ def calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_i
 		'penalty_amount': pending_amounts['penalty_amount'],
 		'process_loan_interest': process_loan_interest,
 		'posting_date': posting_date,
+		'last_accrual_date': last_accrual_date,
 		'accrual_type': accrual_type
 	})
 
-	if flt(payable_interest, precision) > 0.0:
-		make_loan_interest_accrual_entry(args)
+	return get_loan_interest_accrual(args, loan)
 
 def make_accrual_interest_entry_for_demand_loans(posting_date, process_loan_interest, open_loans=None, loan_type=None, accrual_type="Regular"):
 	query_filters = {
@@ -134,11 +188,21 @@ def make_accrual_interest_entry_for_demand_loans(posting_date, process_loan_inte
 		open_loans = frappe.get_all("Loan",
 			fields=["name", "total_payment", "total_amount_paid", "loan_account", "interest_income_account", "loan_amount",
 				"is_term_loan", "status", "disbursement_date", "disbursed_amount", "applicant_type", "applicant",
-				"rate_of_interest", "total_interest_payable", "written_off_amount", "total_principal_paid", "repayment_start_date"],
+				"rate_of_interest", "total_interest_payable", "written_off_amount", "total_principal_paid", "repayment_start_date",
+				"company", "loan_type", "cost_center"],
 			filters=query_filters)
 
+	last_accrual_dates = get_last_accrual_dates(open_loans)
+	accruals = []
+
 	for loan in open_loans:
-		calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_interest, accrual_type)
+		accrual = calculate_accrual_amount_for_demand_loans(loan, posting_date, process_loan_interest, accrual_type,
+			last_accrual_date=last_accrual_dates.get(loan.name))
+
+		if accrual:
+			accruals.append(accrual)
+
+	make_loan_interest_accruals(accruals, process_loan_interest)
 
 def make_accrual_interest_entry_for_term_loans(posting_date, process_loan_interest, term_loan=None, loan_type=None, accrual_type="Regular"):
 	curr_date = posting_date or add_days(nowdate(), 1)
@@ -146,6 +210,8 @@ def make_accrual_interest_entry_for_term_loans(posting_date, process_loan_intere
 	term_loans = get_term_loans(curr_date, term_loan, loan_type)
 
 	accrued_entries = []
+	accruals = []
+	last_accrual_dates = get_last_accrual_dates(term_loans)
 
 	for loan in term_loans:
 		accrued_entries.append(loan.payment_entry)
@@ -160,10 +226,16 @@ def make_accrual_interest_entry_for_term_loans(posting_date, process_loan_intere
 			'process_loan_interest': process_loan_interest,
 			'repayment_schedule_name': loan.payment_entry,
 			'posting_date': posting_date,
+			'last_accrual_date': last_accrual_dates.get(loan.name),
 			'accrual_type': accrual_type
 		})
 
-		make_loan_interest_accrual_entry(args)
+		accruals.append(get_loan_interest_accrual(args, loan))
+
+		# next schedule of the same loan is accrued after this one
+		last_accrual_dates[loan.name] = add_days(posting_date or nowdate(), 1)
+
+	make_loan_interest_accruals(accruals, process_loan_interest)
 
 	if accrued_entries:
 		frappe.db.sql("""UPDATE `tabRepayment Schedule`
@@ -179,7 +251,7 @@ def get_term_loans(date, term_loan=None, loan_type=None):
 	if loan_type:
 		condition += ' AND l.loan_type = %s' % frappe.db.escape(loan_type)
 
-	term_loans = frappe.db.sql("""SELECT l.name, l.total_payment, l.total_amount_paid, l.loan_account,
+	term_loans = frappe.db.sql("""SELECT l.name, l.company, l.loan_type, l.cost_center, l.total_payment, l.total_amount_paid, l.loan_account,
 			l.interest_income_account, l.is_term_loan, l.disbursement_date, l.applicant_type, l.applicant,
 			l.rate_of_interest, l.total_interest_payable, l.repayment_start_date, rs.name as payment_entry,
 			rs.payment_date, rs.principal_amount, rs.interest_amount, rs.is_accrued , rs.balance_loan_amount
@@ -194,11 +266,13 @@ def get_term_loans(date, term_loan=None, loan_type=None):
 
 	return term_loans
 
-def make_loan_interest_accrual_entry(args):
+def get_loan_interest_accrual(args, loan):
 	precision = cint(frappe.db.get_default("currency_precision")) or 2
 
 	loan_interest_accrual = frappe.new_doc("Loan Interest Accrual")
 	loan_interest_accrual.loan = args.loan
+	loan_interest_accrual.company = loan.company
+	loan_interest_accrual.is_term_loan = loan.is_term_loan
 	loan_interest_accrual.applicant_type = args.applicant_type
 	loan_interest_accrual.applicant = args.applicant
 	loan_interest_accrual.interest_income_account = args.interest_income_account
@@ -208,17 +282,97 @@ def make_loan_interest_accrual_entry(args):
 	loan_interest_accrual.total_pending_interest_amount = flt(args.total_pending_interest_amount, precision)
 	loan_interest_accrual.penalty_amount = flt(args.penalty_amount, precision)
 	loan_interest_accrual.posting_date = args.posting_date or nowdate()
+	loan_interest_accrual.last_accrual_date = args.last_accrual_date
 	loan_interest_accrual.process_loan_interest_accrual = args.process_loan_interest
 	loan_interest_accrual.repayment_schedule_name = args.repayment_schedule_name
-	loan_interest_accrual.payable_principal_amount = args.payable_principal
+	loan_interest_accrual.payable_principal_amount = flt(args.payable_principal, precision)
 	loan_interest_accrual.accrual_type = args.accrual_type
 
-	loan_interest_accrual.save()
-	loan_interest_accrual.submit()
+	# not a document field, used to group the accrued interest in GL
+	loan_interest_accrual.loan_type = loan.loan_type
+	loan_interest_accrual.cost_center = loan.cost_center
+
+	return loan_interest_accrual
 
+def make_loan_interest_accruals(accruals, process_loan_interest):
+	"""Inserts the accruals of a process as submitted rows in bulk and books their GL entries together"""
+	if not accruals:
+		return
 
-def get_no_of_days_for_interest_accural(loan, posting_date):
-	last_interest_accrual_date = get_last_accrual_date(loan.name)
+	fields = ["name", "owner", "creation", "modified", "modified_by", "docstatus"] + ACCRUAL_FIELDS
+	values = []
+	now = frappe.utils.now()
+
+	for accrual in accruals:
+		accrual.set_new_name()
+		accrual.docstatus = 1
+		values.append([accrual.name, frappe.session.user, now, now, frappe.session.user, 1]
+			+ [accrual.get(fieldname) for fieldname in ACCRUAL_FIELDS])
+
+	frappe.db.bulk_insert("Loan Interest Accrual", fields=fields, values=values)
+
+	make_process_gl_entries(accruals, process_loan_interest)
+
+def make_process_gl_entries(accruals, process_loan_interest):
+	"""
+		Posts the GL entries of all the accruals of a process under the process voucher.
+		The loan account is debited per accrual as it is tracked against the applicant and loan,
+		with the accrual as voucher detail. The interest income is credited once per loan type,
+		account and cost center.
+	"""
+	gl_entries = {}
+	income_entries = {}
+
+	for accrual in accruals:
+		if not accrual.interest_amount:
+			continue
+
+		gle_map = gl_entries.setdefault(accrual.company, [])
+		gle_map.append(
+			accrual.get_gl_dict({
+				"account": accrual.loan_account,
+				"party_type": accrual.applicant_type,
+				"party": accrual.applicant,
+				"against": accrual.interest_income_account,
+				"debit": accrual.interest_amount,
+				"debit_in_account_currency": accrual.interest_amount,
+				"against_voucher_type": "Loan",
+				"against_voucher": accrual.loan,
+				"voucher_type": "Process Loan Interest Accrual",
+				"voucher_no": process_loan_interest,
+				"voucher_detail_no": accrual.name,
+				"remarks": _("Interest accrued from {0} to {1} against loan: {2}").format(
+					accrual.last_accrual_date, accrual.posting_date, accrual.loan),
+				"cost_center": accrual.cost_center,
+				"posting_date": accrual.posting_date
+			})
+		)
+
+		key = (accrual.company, accrual.loan_type, accrual.interest_income_account, accrual.cost_center,
+			accrual.posting_date)
+
+		if key not in income_entries:
+			income_entries[key] = accrual.get_gl_dict({
+				"account": accrual.interest_income_account,
+				"against": accrual.loan_account,
+				"credit": 0.0,
+				"credit_in_account_currency": 0.0,
+				"voucher_type": "Process Loan Interest Accrual",
+				"voucher_no": process_loan_interest,
+				"remarks": _("Interest accrued on loans of type {0}").format(accrual.loan_type),
+				"cost_center": accrual.cost_center,
+				"posting_date": accrual.posting_date
+			})
+			gle_map.append(income_entries[key])
+
+		income_entries[key].credit += accrual.interest_amount
+		income_entries[key].credit_in_account_currency += accrual.interest_amount
+
+	for gle_map in gl_entries.values():
+		make_gl_entries(gle_map, merge_entries=False)
+
+def get_no_of_days_for_interest_accural(loan, posting_date, last_accrual_date=None):
+	last_interest_accrual_date = last_accrual_date or get_last_accrual_date(loan.name)
 
 	no_of_days = date_diff(posting_date or nowdate(), last_interest_accrual_date) + 1
 
@@ -234,6 +388,27 @@ def get_last_accrual_date(loan):
 	else:
 		return frappe.db.get_value('Loan', loan, 'disbursement_date')
 
+def get_last_accrual_dates(loans):
+	"""Returns a map of loan and its last accrual date, fetched for all the loans at once"""
+	if not loans:
+		return {}
+
+	loan_names = list(set(d.name for d in loans))
+	last_accrual_dates = {}
+
+	for loan, last_posting_date in frappe.db.sql(""" SELECT loan, MAX(posting_date)
+		FROM `tabLoan Interest Accrual`
+		WHERE loan in %s and docstatus = 1
+		GROUP BY loan""", (loan_names,)):
+		# interest for last interest accrual date is already booked, so add 1 day
+		last_accrual_dates[loan] = add_days(last_posting_date, 1)
+
+	for loan in loans:
+		if loan.name not in last_accrual_dates:
+			last_accrual_dates[loan.name] = loan.disbursement_date
+
+	return last_accrual_dates
+
 def days_in_year(year):
 	days = 365
 
@@ -4,8 +4,9 @@
 import unittest
 
 import frappe
-from frappe.utils import add_to_date, date_diff, flt, get_datetime, get_first_day, nowdate
+from frappe.utils import add_to_date, date_diff, flt, get_datetime, get_first_day, getdate, nowdate
 
+from erpnext.accounts.utils import get_balance_on
 from erpnext.loan_management.doctype.loan.test_loan import (
 	create_demand_loan,
 	create_loan_accounts,
@@ -67,6 +68,7 @@ class TestLoanInterestAccrual(unittest.TestCase):
 		loan_interest_accural = frappe.get_doc("Loan Interest Accrual", {'loan': loan.name})
 
 		self.assertEqual(flt(loan_interest_accural.interest_amount, 0), flt(accrued_interest_amount, 0))
+		self.assertEqual(getdate(loan_interest_accural.last_accrual_date), getdate(first_date))
 
 	def test_accumulated_amounts(self):
 		pledge = [{
@@ -105,3 +107,71 @@ class TestLoanInterestAccrual(unittest.TestCase):
 		loan_interest_accrual = frappe.get_doc("Loan Interest Accrual", {'loan': loan.name,
 			'process_loan_interest_accrual': process})
 		self.assertEqual(flt(loan_interest_accrual.total_pending_interest_amount, 0), total_pending_interest_amount)
+
+	def test_accrual_gl_entries_for_multiple_loans(self):
+		pledge = [{
+			"loan_security": "Test Security 1",
+			"qty": 4000.00
+		}]
+
+		first_date = '2019-10-01'
+		last_date = '2019-10-30'
+		loans = []
+
+		for i in range(2):
+			loan_application = create_loan_application('_Test Company', self.applicant, 'Demand Loan', pledge)
+			create_pledge(loan_application)
+			loan = create_demand_loan(self.applicant, "Demand Loan", loan_application,
+				posting_date=get_first_day(nowdate()))
+			loan.submit()
+			make_loan_disbursement_entry(loan.name, loan.loan_amount, disbursement_date=first_date)
+			loans.append(loan.name)
+
+		process = process_loan_interest_accrual_for_demand_loans(posting_date=last_date)
+
+		accruals = frappe.get_all("Loan Interest Accrual", fields=["name", "interest_amount"],
+			filters={"process_loan_interest_accrual": process, "loan": ("in", loans), "docstatus": 1})
+		self.assertEqual(len(accruals), 2)
+
+		gl_entries = frappe.get_all("GL Entry", fields=["account", "voucher_detail_no", "debit", "credit"],
+			filters={"voucher_type": "Process Loan Interest Accrual", "voucher_no": process, "is_cancelled": 0})
+
+		debit_entries = {d.voucher_detail_no: d.debit for d in gl_entries if d.account == 'Loan Account - _TC'}
+		for accrual in accruals:
+			self.assertEqual(flt(debit_entries.get(accrual.name)), flt(accrual.interest_amount))
+
+		income_entries = [d for d in gl_entries if d.account == 'Interest Income Account - _TC']
+		self.assertEqual(len(income_entries), 1)
+		self.assertEqual(flt(income_entries[0].credit), flt(sum(d.debit for d in gl_entries)))
+
+	def test_cancel_accrual_posted_by_process(self):
+		pledge = [{
+			"loan_security": "Test Security 1",
+			"qty": 4000.00
+		}]
+
+		loan_application = create_loan_application('_Test Company', self.applicant, 'Demand Loan', pledge)
+		create_pledge(loan_application)
+		loan = create_demand_loan(self.applicant, "Demand Loan", loan_application,
+			posting_date=get_first_day(nowdate()))
+		loan.submit()
+
+		make_loan_disbursement_entry(loan.name, loan.loan_amount, disbursement_date='2019-10-01')
+
+		def get_balances():
+			return (get_balance_on('Loan Account - _TC', party_type='Customer', party=self.applicant),
+				get_balance_on('Interest Income Account - _TC'),
+				flt(frappe.db.sql("""select sum(debit) - sum(credit) from `tabGL Entry`
+					where account = 'Loan Account - _TC' and is_cancelled = 0""")[0][0]))
+
+		process = process_loan_interest_accrual_for_demand_loans(posting_date='2019-10-30')
+		accrual = frappe.get_doc("Loan Interest Accrual", {'loan': loan.name,
+			'process_loan_interest_accrual': process})
+		balances = get_balances()
+
+		accrual.cancel()
+
+		# only the accrual is taken out, in the ledger and the balance checkpoints alike
+		amount = flt(accrual.interest_amount)
+		for before, after, change in zip(balances, get_balances(), (-amount, amount, -amount)):
+			self.assertEqual(flt(after, 2), flt(before + change, 2))
@@ -0,0 +1,11 @@
+import frappe
+
+from erpnext.utilities.doctype.link_search_term.link_search_term import INDEXED_FIELDS
+
+
+def execute():
+	frappe.reload_doc("utilities", "doctype", "link_search_term")
+
+	for doctype in INDEXED_FIELDS:
+		frappe.enqueue("erpnext.utilities.doctype.link_search_term.link_search_term.rebuild_search_index",
+			queue="long", timeout=7200, doctype=doctype)
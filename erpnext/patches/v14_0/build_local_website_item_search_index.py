@@ -0,0 +1,10 @@
+import frappe
+
+from erpnext.e_commerce.redisearch_utils import is_search_module_loaded
+
+
+def execute():
+	if is_search_module_loaded() or not frappe.db.count("Website Item", {"published": 1}):
+		return
+
+	frappe.enqueue("erpnext.e_commerce.local_search_index.reindex_all_web_items_locally", queue="long")
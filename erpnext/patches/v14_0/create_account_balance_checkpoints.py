@@ -0,0 +1,12 @@
+import frappe
+
+from erpnext.accounts.doctype.account_balance_checkpoint.account_balance_checkpoint import (
+	rebuild_balance_checkpoints,
+)
+
+
+def execute():
+	frappe.reload_doc("accounts", "doctype", "account_balance_checkpoint")
+
+	for company in frappe.get_all("Company", pluck="name"):
+		rebuild_balance_checkpoints(company)
@@ -0,0 +1,10 @@
+import frappe
+
+from erpnext.stock.doctype.batch_balance.batch_balance import rebuild_batch_balances
+
+
+def execute():
+	frappe.reload_doc("stock", "doctype", "batch_balance")
+
+	for item_code in frappe.get_all("Item", filters={"has_batch_no": 1}, pluck="name"):
+		rebuild_batch_balances(item_code)
@@ -0,0 +1,12 @@
+import frappe
+
+from erpnext.accounts.doctype.tax_withholding_checkpoint.tax_withholding_checkpoint import (
+	rebuild_tax_withholding_checkpoints,
+)
+
+
+def execute():
+	frappe.reload_doc("accounts", "doctype", "tax_withholding_checkpoint")
+
+	for company in frappe.get_all("Company", pluck="name"):
+		rebuild_tax_withholding_checkpoints(company)
@@ -0,0 +1,9 @@
+import frappe
+
+
+def execute():
+	frappe.reload_doc("accounts", "doctype", "subscription")
+
+	for name in frappe.get_all("Subscription", filters={"status": ("!=", "Cancelled")}, pluck="name"):
+		subscription = frappe.get_doc("Subscription", name)
+		subscription.db_set("next_action_date", subscription.get_next_action_date(), update_modified=False)
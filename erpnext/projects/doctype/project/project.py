@@ -7,7 +7,7 @@ from email_reply_parser import EmailReplyParser
 from frappe import _
 from frappe.desk.reportview import get_match_cond
 from frappe.model.document import Document
-from frappe.utils import add_days, flt, get_datetime, get_time, get_url, nowtime, today
+from frappe.utils import add_days, cint, flt, get_datetime, get_time, get_url, now, nowtime, today
 
 from erpnext.controllers.employee_boarding_controller import update_employee_boarding_status
 from erpnext.controllers.queries import get_filters_cond
@@ -15,6 +15,11 @@ from erpnext.education.doctype.student_attendance.student_attendance import get_
 from erpnext.hr.doctype.daily_work_summary.daily_work_summary import get_users_email
 from erpnext.hr.doctype.holiday_list.holiday_list import is_holiday
 
+PROJECT_ROLLUP_CHUNK_SIZE = 500
+# fields of the project computed from its tasks, timesheets, expense claims and transactions
+ROLLUP_FIELDS = ('actual_start_date', 'actual_end_date', 'actual_time', 'total_costing_amount',
+	'total_billable_amount', 'total_expense_claim', 'total_purchase_cost', 'total_sales_amount',
+	'total_billed_amount', 'gross_margin', 'per_gross_margin', 'percent_complete', 'status')
 
 class Project(Document):
 	def get_feed(self):
@@ -132,7 +137,7 @@ class Project(Document):
 				return True
 
 	def update_project(self):
-		'''Called externally by Task'''
+		'''Rolls up the project, see `update_projects` for rolling up many projects'''
 		self.update_percent_complete()
 		update_employee_boarding_status(self)
 		self.update_costing()
@@ -147,35 +152,33 @@ class Project(Document):
 		frappe.db.set_value("Sales Order", {"project": self.name}, "project", "")
 
 	def update_percent_complete(self):
+		if self.percent_complete_method == "Manual":
+			self.set_percent_complete()
+		else:
+			self.set_percent_complete(get_task_progress([self.name]).get(self.name))
+
+	def set_percent_complete(self, task_progress=None):
+		"""Sets the percent complete from the counts and sums of `get_task_progress`"""
 		if self.percent_complete_method == "Manual":
 			if self.status == "Completed":
 				self.percent_complete = 100
 			return
 
-		total = frappe.db.count('Task', dict(project=self.name))
+		task_progress = task_progress or frappe._dict()
+		total = cint(task_progress.total)
 
 		if not total:
 			self.percent_complete = 0
 		else:
 			if (self.percent_complete_method == "Task Completion" and total > 0) or (
 				not self.percent_complete_method and total > 0):
-				completed = frappe.db.sql("""select count(name) from tabTask where
-					project=%s and status in ('Cancelled', 'Completed')""", self.name)[0][0]
-				self.percent_complete = flt(flt(completed) / total * 100, 2)
+				self.percent_complete = flt(flt(task_progress.completed) / total * 100, 2)
 
 			if (self.percent_complete_method == "Task Progress" and total > 0):
-				progress = frappe.db.sql("""select sum(progress) from tabTask where
-					project=%s""", self.name)[0][0]
-				self.percent_complete = flt(flt(progress) / total, 2)
+				self.percent_complete = flt(flt(task_progress.progress) / total, 2)
 
 			if (self.percent_complete_method == "Task Weight" and total > 0):
-				weight_sum = frappe.db.sql("""select sum(task_weight) from tabTask where
-					project=%s""", self.name)[0][0]
-				weighted_progress = frappe.db.sql("""select progress, task_weight from tabTask where
-					project=%s""", self.name, as_dict=1)
-				pct_complete = 0
-				for row in weighted_progress:
-					pct_complete += row["progress"] * frappe.utils.safe_div(row["task_weight"], weight_sum)
+				pct_complete = frappe.utils.safe_div(task_progress.weighted_progress, task_progress.weight_sum)
 				self.percent_complete = flt(flt(pct_complete), 2)
 
 		# don't update status if it is cancelled
@@ -186,30 +189,21 @@ class Project(Document):
 			self.status = "Completed"
 
 	def update_costing(self):
-		from_time_sheet = frappe.db.sql("""select
-			sum(costing_amount) as costing_amount,
-			sum(billing_amount) as billing_amount,
-			min(from_time) as start_date,
-			max(to_time) as end_date,
-			sum(hours) as time
-			from `tabTimesheet Detail` where project = %s and docstatus = 1""", self.name, as_dict=1)[0]
-
-		from_expense_claim = frappe.db.sql("""select
-			sum(total_sanctioned_amount) as total_sanctioned_amount
-			from `tabExpense Claim` where project = %s
-			and docstatus = 1""", self.name, as_dict=1)[0]
-
-		self.actual_start_date = from_time_sheet.start_date
-		self.actual_end_date = from_time_sheet.end_date
-
-		self.total_costing_amount = from_time_sheet.costing_amount
-		self.total_billable_amount = from_time_sheet.billing_amount
-		self.actual_time = from_time_sheet.time
-
-		self.total_expense_claim = from_expense_claim.total_sanctioned_amount
-		self.update_purchase_costing()
-		self.update_sales_amount()
-		self.update_billed_amount()
+		self.set_costing(get_project_costing([self.name])[self.name])
+
+	def set_costing(self, costing):
+		"""Sets the costing and billing totals from `get_project_costing`"""
+		self.actual_start_date = costing.actual_start_date
+		self.actual_end_date = costing.actual_end_date
+
+		self.total_costing_amount = costing.total_costing_amount
+		self.total_billable_amount = costing.total_billable_amount
+		self.actual_time = costing.actual_time
+
+		self.total_expense_claim = costing.total_expense_claim
+		self.total_purchase_cost = costing.total_purchase_cost or 0
+		self.total_sales_amount = costing.total_sales_amount or 0
+		self.total_billed_amount = costing.total_billed_amount or 0
 		self.calculate_gross_margin()
 
 	def calculate_gross_margin(self):
@@ -504,26 +498,125 @@ def update_project_sales_billing():
 		return
 
 	#Else simply fallback to Daily
-	exists_query = '(SELECT 1 from `tab{doctype}` where docstatus = 1 and project = `tabProject`.name)'
-	project_map = {}
-	for project_details in frappe.db.sql('''
-			SELECT name, 1 as order_exists, null as invoice_exists from `tabProject` where
-			exists {order_exists}
-			union
-			SELECT name, null as order_exists, 1 as invoice_exists from `tabProject` where
-			exists {invoice_exists}
-		'''.format(
-			order_exists=exists_query.format(doctype="Sales Order"),
-			invoice_exists=exists_query.format(doctype="Sales Invoice"),
-		), as_dict=True):
-		project = project_map.setdefault(project_details.name, frappe.get_doc('Project', project_details.name))
-		if project_details.order_exists:
-			project.update_sales_amount()
-		if project_details.invoice_exists:
-			project.update_billed_amount()
-
-	for project in project_map.values():
-		project.save()
+	projects = frappe.db.sql_list('''
+		SELECT distinct project from `tabSales Order` where docstatus = 1 and ifnull(project, '') != ''
+		union
+		SELECT distinct project from `tabSales Invoice` where docstatus = 1 and ifnull(project, '') != ''
+	''')
+
+	update_projects(projects)
+
+def get_project_costing(projects):
+	"""Returns the timesheet, expense claim, purchase and sales totals of the projects"""
+	costing = {project: frappe._dict() for project in projects}
+	if not projects:
+		return costing
+
+	queries = [
+		"""select project, sum(costing_amount) as total_costing_amount,
+			sum(billing_amount) as total_billable_amount, min(from_time) as actual_start_date,
+			max(to_time) as actual_end_date, sum(hours) as actual_time
+			from `tabTimesheet Detail` where project in %(projects)s and docstatus = 1 group by project""",
+		"""select project, sum(total_sanctioned_amount) as total_expense_claim
+			from `tabExpense Claim` where project in %(projects)s and docstatus = 1 group by project""",
+		"""select project, sum(base_net_amount) as total_purchase_cost
+			from `tabPurchase Invoice Item` where project in %(projects)s and docstatus = 1 group by project""",
+		"""select project, sum(base_net_total) as total_sales_amount
+			from `tabSales Order` where project in %(projects)s and docstatus = 1 group by project""",
+		"""select project, sum(base_net_total) as total_billed_amount
+			from `tabSales Invoice` where project in %(projects)s and docstatus = 1 group by project"""
+	]
+
+	for query in queries:
+		for d in frappe.db.sql(query, {"projects": tuple(projects)}, as_dict=1):
+			costing[d.pop("project")].update(d)
+
+	return costing
+
+def get_task_progress(projects):
+	"""Returns the task counts and progress of the projects, for `Project.set_percent_complete`"""
+	if not projects:
+		return {}
+
+	return {d.project: d for d in frappe.db.sql("""
+		select project, count(name) as total,
+			sum(if(status in ('Cancelled', 'Completed'), 1, 0)) as completed,
+			sum(progress) as progress, sum(task_weight) as weight_sum,
+			sum(ifnull(progress, 0) * ifnull(task_weight, 0)) as weighted_progress
+		from `tabTask` where project in %(projects)s group by project""",
+		{"projects": tuple(projects)}, as_dict=1)}
+
+def update_projects(projects):
+	"""
+	Rolls up the costing, billing and progress of the projects with grouped queries,
+	and writes them with one update per chunk of projects
+	"""
+	projects = list(set(filter(None, projects)))
+
+	for i in range(0, len(projects), PROJECT_ROLLUP_CHUNK_SIZE):
+		chunk = projects[i:i + PROJECT_ROLLUP_CHUNK_SIZE]
+		costing = get_project_costing(chunk)
+		task_progress = get_task_progress(chunk)
+
+		boarding_projects = set(frappe.get_all("Employee Onboarding", filters={"project": ("in", chunk)},
+			pluck="project") + frappe.get_all("Employee Separation", filters={"project": ("in", chunk)},
+			pluck="project"))
+
+		updated = []
+		for d in frappe.get_all("Project", filters={"name": ("in", chunk)}, fields=["name", "status",
+			"percent_complete_method", "percent_complete", "per_gross_margin", "total_consumed_material_cost"]):
+			project = frappe.get_doc(dict(d, doctype="Project"))
+			project.set_costing(costing[d.name])
+			project.set_percent_complete(task_progress.get(d.name))
+
+			if d.name in boarding_projects:
+				update_employee_boarding_status(project)
+
+			updated.append(project)
+
+		bulk_update_projects(updated)
+
+def bulk_update_projects(projects):
+	if not projects:
+		return
+
+	cases, values = [], []
+	for fieldname in ROLLUP_FIELDS:
+		cases.append("`{0}` = case name {1} end".format(fieldname, " ".join(["when %s then %s"] * len(projects))))
+		for project in projects:
+			values.extend([project.name, project.get(fieldname)])
+
+	values.append(now())
+	values.extend(project.name for project in projects)
+
+	frappe.db.sql("""update `tabProject` set {0}, modified = %s where name in ({1})""".format(
+		", ".join(cases), ", ".join(["%s"] * len(projects))), values)
+
+def queue_project_update(project):
+	"""
+	Rolls up the project before the transaction is committed, once however many of
+	its tasks, timesheets and expense claims are changed in the transaction
+	"""
+	if not project:
+		return
+
+	if frappe.flags.projects_to_update is None:
+		frappe.flags.projects_to_update = set()
+		frappe.db.add_before_commit(update_queued_projects)
+		frappe.local.rollback_observers.append(QueuedProjectUpdates)
+
+	frappe.flags.projects_to_update.add(project)
+
+def update_queued_projects():
+	projects, frappe.flags.projects_to_update = frappe.flags.projects_to_update, None
+	if projects:
+		update_projects(projects)
+
+class QueuedProjectUpdates:
+	@staticmethod
+	def on_rollback():
+		"""Forget the projects of a rolled back transaction, so that the next one queues them afresh"""
+		frappe.flags.projects_to_update = None
 
 @frappe.whitelist()
 def create_kanban_board_if_not_exists(project):
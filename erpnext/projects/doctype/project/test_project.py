@@ -2,10 +2,16 @@
 # License: GNU General Public License v3. See license.txt
 
 import unittest
+from unittest.mock import patch
 
 import frappe
 from frappe.utils import add_days, getdate, nowdate
 
+from erpnext.projects.doctype.project.project import (
+	queue_project_update,
+	update_projects,
+	update_queued_projects,
+)
 from erpnext.projects.doctype.project_template.test_project_template import make_project_template
 from erpnext.projects.doctype.task.test_task import create_task
 from erpnext.selling.doctype.sales_order.sales_order import make_project as make_project_from_so
@@ -112,6 +118,63 @@ class TestProject(unittest.TestCase):
 		so.reload()
 		self.assertFalse(so.project)
 
+	def test_project_rollup(self):
+		project = make_project({"project_name": "Test Project Roll-up", "start_date": nowdate()})
+
+		tasks = []
+		for subject in ("Test Roll-up Task 1", "Test Roll-up Task 2"):
+			tasks.append(frappe.get_doc(dict(
+				doctype="Task",
+				subject=subject,
+				project=project.name,
+				status="Open"
+			)).insert())
+
+		tasks[0].status = "Completed"
+		tasks[0].save()
+		update_queued_projects()
+		self.assertEqual(frappe.db.get_value("Project", project.name, "percent_complete"), 50)
+
+		# tasks completed without triggers are picked up by the set-based roll-up
+		frappe.db.set_value("Task", tasks[1].name, "status", "Completed")
+		update_projects([project.name])
+
+		self.assertEqual(frappe.db.get_value("Project", project.name, ["percent_complete", "status"]),
+			(100, "Completed"))
+
+		for task in tasks:
+			frappe.delete_doc("Task", task.name)
+		frappe.delete_doc("Project", project.name)
+
+	def test_project_rollup_is_queued_once_per_transaction(self):
+		project = make_project({"project_name": "Test Project Queued Roll-up", "start_date": nowdate()})
+		# projects queued by the earlier tests
+		update_queued_projects()
+
+		with patch("erpnext.projects.doctype.project.project.update_projects") as update_projects_mock:
+			for subject in ("Test Queued Roll-up Task 1", "Test Queued Roll-up Task 2"):
+				task = frappe.get_doc(dict(
+					doctype="Task",
+					subject=subject,
+					project=project.name,
+					status="Open"
+				)).insert()
+
+				task.status = "Completed"
+				task.save()
+
+			update_projects_mock.assert_not_called()
+
+			# flushed before commit
+			update_queued_projects()
+			update_projects_mock.assert_called_once_with({project.name})
+
+			queue_project_update(project.name)
+
+			# a rolled back transaction does not leave its projects queued
+			frappe.db.rollback()
+			self.assertIsNone(frappe.flags.projects_to_update)
+
 def get_project(name, template):
 
 	project = frappe.get_doc(dict(
@@ -11,6 +11,7 @@ from frappe.utils import add_to_date, flt, get_datetime, getdate, time_diff_in_h
 
 from erpnext.controllers.queries import get_match_cond
 from erpnext.hr.utils import validate_active_employee
+from erpnext.projects.doctype.project.project import queue_project_update
 from erpnext.setup.utils import get_exchange_rate
 
 
@@ -126,7 +127,7 @@ class Timesheet(Document):
 				tasks.append(data.task)
 
 			elif data.project and data.project not in projects:
-				frappe.get_doc("Project", data.project).update_project()
+				queue_project_update(data.project)
 				projects.append(data.project)
 
 	def validate_dates(self):
@@ -0,0 +1,131 @@
+# Copyright (c) 2021, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+"""
+A local stand-in for the GSP e-invoicing API, to benchmark bulk IRN generation offline.
+
+Start the server:
+
+	python -m erpnext.regional.india.e_invoice.fake_gsp_server --port 8012 --latency 0.3
+
+and point the site to it:
+
+	bench --site {site} set-config einvoice_gsp_url http://localhost:8012
+
+Only authentication, IRN generation and IRN details are implemented.
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+
+SIGNING_KEY = "fake-gsp-server"
+
+
+class FakeGSPRequestHandler(BaseHTTPRequestHandler):
+	# seconds to wait before responding, to simulate network and GSP processing time
+	latency = 0
+	generated_irns = {}
+
+	def do_POST(self):
+		time.sleep(self.latency)
+		path = urlparse(self.path).path
+
+		if path.endswith("/gsp/authenticate"):
+			self.send_json({
+				"token_type": "Bearer",
+				"access_token": hashlib.sha1(str(time.time()).encode()).hexdigest(),
+				"expires_in": 6 * 60 * 60
+			})
+
+		elif path.endswith("/enriched/ei/api/invoice"):
+			length = int(self.headers.get("Content-Length") or 0)
+			einvoice = json.loads(self.rfile.read(length) or "{}")
+			self.send_json(self.generate_irn(einvoice))
+
+		else:
+			self.send_error(404)
+
+	def do_GET(self):
+		time.sleep(self.latency)
+		url = urlparse(self.path)
+
+		if url.path.endswith("/enriched/ei/api/invoice/irn"):
+			irn = parse_qs(url.query).get("irn", [""])[0]
+			if irn in self.generated_irns:
+				self.send_json({"success": True, "result": self.generated_irns[irn]})
+			else:
+				self.send_json({"success": False, "message": "2283 : IRN details cannot be provided"})
+
+		else:
+			self.send_error(404)
+
+	def generate_irn(self, einvoice):
+		doc_no = (einvoice.get("DocDtls") or {}).get("No")
+		if not doc_no:
+			return {"success": False, "message": "3028 : Document number is mandatory"}
+
+		irn = hashlib.sha256("{}-{}".format(einvoice.get("SellerDtls", {}).get("Gstin"), doc_no).encode()).hexdigest()
+		if irn in self.generated_irns:
+			return {
+				"success": False,
+				"message": "2150 : Duplicate IRN",
+				"result": [{"Desc": {"Irn": irn}}]
+			}
+
+		now = datetime.now()
+		result = {
+			"Irn": irn,
+			"AckNo": int(now.timestamp() * 1000),
+			"AckDt": now.strftime("%Y-%m-%d %H:%M:%S"),
+			"SignedInvoice": sign({"data": json.dumps(einvoice)}),
+			"SignedQRCode": sign({"data": json.dumps({"Irn": irn, "DocNo": doc_no})}),
+			"EwbNo": None,
+			"EwbValidTill": None
+		}
+		self.generated_irns[irn] = result
+
+		return {"success": True, "result": result}
+
+	def send_json(self, response):
+		body = json.dumps(response).encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def sign(payload):
+	token = jwt.encode(payload, SIGNING_KEY, algorithm="HS256")
+	# PyJWT < 2 returns bytes
+	return token.decode() if isinstance(token, bytes) else token
+
+
+def run(port=8012, latency=0):
+	FakeGSPRequestHandler.latency = float(latency)
+	server = ThreadingHTTPServer(("localhost", int(port)), FakeGSPRequestHandler)
+
+	print("Fake GSP server listening on http://localhost:{0}".format(port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		server.server_close()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Run a fake GSP e-invoicing server")
+	parser.add_argument("--port", type=int, default=8012)
+	parser.add_argument("--latency", type=float, default=0, help="seconds to wait before each response")
+	args = parser.parse_args()
+
+	run(port=args.port, latency=args.latency)
@@ -8,10 +8,13 @@ import json
 import os
 import re
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import frappe
 import jwt
+import requests
 from frappe import _, bold
 from frappe.core.page.background_jobs.background_jobs import get_info
 from frappe.integrations.utils import make_get_request, make_post_request
@@ -561,6 +564,11 @@ def safe_json_load(json_string):
 		snippet = json_string[start:end]
 		frappe.throw(_("Error in input data. Please check for any special characters near following input: <br> {}").format(snippet))
 
+# invoices are prepared, sent and committed in chunks so that a failed
+# bulk job can be resumed without resending the generated ones
+BULK_IRN_CHUNK_SIZE = 100
+BULK_IRN_REQUEST_WORKERS = 8
+
 class RequestFailed(Exception):
 	pass
 class CancellationNotAllowed(Exception):
@@ -570,13 +578,17 @@ class GSPConnector():
 	def __init__(self, doctype=None, docname=None):
 		self.doctype = doctype
 		self.docname = docname
+		self.request_logs = None
+		self.passwords = {}
 
 		self.set_invoice()
 		self.set_credentials()
 
 		# authenticate url is same for sandbox & live
-		self.authenticate_url = 'https://gsp.adaequare.com/gsp/authenticate?grant_type=token'
-		self.base_url = 'https://gsp.adaequare.com' if not self.e_invoice_settings.sandbox_mode else 'https://gsp.adaequare.com/test'
+		# `einvoice_gsp_url` site config points the connector to another GSP server, eg. fake_gsp_server
+		gsp_url = frappe.conf.einvoice_gsp_url or 'https://gsp.adaequare.com'
+		self.authenticate_url = gsp_url + '/gsp/authenticate?grant_type=token'
+		self.base_url = gsp_url if not self.e_invoice_settings.sandbox_mode else gsp_url + '/test'
 
 		self.cancel_irn_url = self.base_url + '/enriched/ei/api/invoice/cancel'
 		self.irn_details_url = self.base_url + '/enriched/ei/api/invoice/irn'
@@ -629,7 +641,7 @@ class GSPConnector():
 
 	def log_request(self, url, headers, data, res):
 		headers.update({ 'password': self.credentials.password })
-		request_log = frappe.get_doc({
+		request_log = {
 			"doctype": "E Invoice Request Log",
 			"user": frappe.session.user,
 			"reference_invoice": self.invoice.name if self.invoice else None,
@@ -637,8 +649,21 @@ class GSPConnector():
 			"headers": json.dumps(headers, indent=4) if headers else None,
 			"data": json.dumps(data, indent=4) if isinstance(data, dict) else data,
 			"response": json.dumps(res, indent=4) if res else None
-		})
-		request_log.save(ignore_permissions=True)
+		}
+
+		if self.request_logs is not None:
+			# written in one go by flush_request_logs
+			self.request_logs.append(request_log)
+			return
+
+		frappe.get_doc(request_log).save(ignore_permissions=True)
+		frappe.db.commit()
+
+	def flush_request_logs(self):
+		for request_log in self.request_logs or []:
+			frappe.get_doc(request_log).insert(ignore_permissions=True)
+
+		self.request_logs = None
 		frappe.db.commit()
 
 	def get_client_credentials(self):
@@ -665,11 +690,17 @@ class GSPConnector():
 			log_error(res)
 			self.raise_error(True)
 
+	def get_password(self):
+		if self.credentials.name not in self.passwords:
+			self.passwords[self.credentials.name] = self.credentials.get_password()
+
+		return self.passwords[self.credentials.name]
+
 	def get_headers(self):
 		return {
 			'content-type': 'application/json',
 			'user_name': self.credentials.username,
-			'password': self.credentials.get_password(),
+			'password': self.get_password(),
 			'gstin': self.credentials.gstin,
 			'authorization': self.get_auth_token(),
 			'requestid': str(base64.b64encode(os.urandom(18))),
@@ -708,37 +739,43 @@ class GSPConnector():
 		return details
 
 	def generate_irn(self):
-		data = {}
+		data, res = {}, {}
 		try:
 			headers = self.get_headers()
 			einvoice = make_einvoice(self.invoice)
 			data = json.dumps(einvoice, indent=4)
 			res = self.make_request('post', self.generate_irn_url, headers, data)
+			self.set_irn_details(res)
 
-			if res.get('success'):
-				self.set_einvoice_data(res.get('result'))
-
-			elif '2150' in res.get('message'):
-				# IRN already generated but not updated in invoice
-				# Extract the IRN from the response description and fetch irn details
-				irn = res.get('result')[0].get('Desc').get('Irn')
-				irn_details = self.get_irn_details(irn)
-				if irn_details:
-					self.set_einvoice_data(irn_details)
-				else:
-					raise RequestFailed('IRN has already been generated for the invoice but cannot fetch details for the it. \
-						Contact ERPNext support to resolve the issue.')
-
+		except Exception as e:
+			self.handle_irn_failure(e, data, res)
+
+	def set_irn_details(self, res):
+		if res.get('success'):
+			self.set_einvoice_data(res.get('result'))
+
+		elif '2150' in res.get('message'):
+			# IRN already generated but not updated in invoice
+			# Extract the IRN from the response description and fetch irn details
+			irn = res.get('result')[0].get('Desc').get('Irn')
+			irn_details = self.get_irn_details(irn)
+			if irn_details:
+				self.set_einvoice_data(irn_details)
 			else:
-				raise RequestFailed
+				raise RequestFailed('IRN has already been generated for the invoice but cannot fetch details for the it. \
+					Contact ERPNext support to resolve the issue.')
 
-		except RequestFailed:
+		else:
+			raise RequestFailed
+
+	def handle_irn_failure(self, exc, data, res):
+		if isinstance(exc, RequestFailed):
 			errors = self.sanitize_error_message(res.get('message'))
 			self.set_failed_status(errors=errors)
 			self.raise_error(errors=errors)
 
-		except Exception as e:
-			self.set_failed_status(errors=str(e))
+		else:
+			self.set_failed_status(errors=str(exc))
 			log_error(data)
 			self.raise_error(True)
 
@@ -749,21 +786,85 @@ class GSPConnector():
 
 		failed = []
 
+		# invoices generated by an earlier (interrupted) run are not sent again
+		pending_invoices = get_invoices_pending_irn(invoices)
+
+		for i in range(0, len(pending_invoices), BULK_IRN_CHUNK_SIZE):
+			chunk = pending_invoices[i:i + BULK_IRN_CHUNK_SIZE]
+			failed.extend(gsp_connector.generate_irn_for_chunk(chunk))
+
+			frappe.publish_progress((i + len(chunk)) * 100 / len(pending_invoices),
+				title=_("Generating E-Invoices..."))
+
+		return failed
+
+	def generate_irn_for_chunk(self, invoices):
+		failed = []
+		irn_requests = []
+
+		# documents are read and validated before sending the requests
+		# since frappe.local (db connection, cache) cannot be shared across threads
 		for invoice in invoices:
+			data = {}
 			try:
-				gsp_connector.docname = invoice
-				gsp_connector.set_invoice()
-				gsp_connector.set_credentials()
-				gsp_connector.generate_irn()
-
+				self.docname = invoice
+				self.set_invoice()
+				self.set_credentials()
 			except Exception as e:
 				failed.append({
 					'docname': invoice,
 					'message': str(e)
 				})
+				continue
+
+			try:
+				headers = self.get_headers()
+				data = json.dumps(make_einvoice(self.invoice), indent=4)
+
+				irn_requests.append(frappe._dict({
+					'invoice': self.invoice,
+					'credentials': self.credentials,
+					'headers': headers,
+					'data': data
+				}))
+
+			except Exception as e:
+				failed.append(self.get_bulk_irn_failure(e, data))
+
+		responses = make_concurrent_requests('post', self.generate_irn_url, irn_requests)
+
+		self.request_logs = []
+		try:
+			for request, res in zip(irn_requests, responses):
+				self.invoice, self.credentials = request.invoice, request.credentials
+				self.docname = self.invoice.name
+
+				try:
+					if isinstance(res, Exception):
+						raise res
+
+					self.log_request(self.generate_irn_url, request.headers, request.data, res)
+					self.set_irn_details(res)
+					frappe.db.commit()
+
+				except Exception as e:
+					failed.append(self.get_bulk_irn_failure(e, request.data, res))
+		finally:
+			self.flush_request_logs()
 
 		return failed
 
+	def get_bulk_irn_failure(self, exc, data, res=None):
+		try:
+			self.handle_irn_failure(exc, data, res if isinstance(res, dict) else {})
+		except Exception as e:
+			exc = e
+
+		return {
+			'docname': self.docname,
+			'message': str(exc)
+		}
+
 	def get_irn_details(self, irn):
 		headers = self.get_headers()
 
@@ -1028,6 +1129,39 @@ class GSPConnector():
 			errors = ', '.join(errors)
 		return errors
 
+def get_invoices_pending_irn(invoices):
+	generated = frappe.get_all('Sales Invoice', filters={
+		'name': ('in', invoices),
+		'irn': ('is', 'set'),
+		'irn_cancelled': 0
+	}, pluck='name')
+
+	generated = set(generated)
+	return [d for d in invoices if d not in generated]
+
+def make_concurrent_requests(request_type, url, irn_requests):
+	"""Sends the requests from a bounded thread pool and returns the responses (or exceptions) in order.
+	Only the http calls run in the threads, as frappe.local is not shared across threads."""
+	if not irn_requests:
+		return []
+
+	session = threading.local()
+
+	def send(request):
+		if not hasattr(session, 'session'):
+			session.session = requests.Session()
+
+		try:
+			response = session.session.request(request_type, url, headers=request.headers, data=request.data)
+			response.raise_for_status()
+			return response.json()
+		except Exception as e:
+			return e
+
+	max_workers = cint(frappe.conf.einvoice_request_workers) or BULK_IRN_REQUEST_WORKERS
+	with ThreadPoolExecutor(max_workers=min(max_workers, len(irn_requests))) as executor:
+		return list(executor.map(send, irn_requests))
+
 def sanitize_for_json(string):
 	"""Escape JSON specific characters from a string."""
 
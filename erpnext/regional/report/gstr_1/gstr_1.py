@@ -11,6 +11,8 @@ from frappe.utils import flt, formatdate, getdate
 
 from erpnext.regional.india.utils import get_gst_accounts
 
+# invoices are read in chunks to keep the size of the `parent in (...)` queries bounded
+INVOICE_CHUNK_SIZE = 1000
 
 def execute(filters=None):
 	return Gstr1Report(filters).run()
@@ -297,12 +299,16 @@ class Gstr1Report(object):
 		self.item_tax_rate = frappe._dict()
 		self.nil_exempt_non_gst = {}
 
-		items = frappe.db.sql("""
-			select item_code, parent, taxable_value, base_net_amount, item_tax_rate, is_nil_exempt,
-			is_non_gst from `tab%s Item`
-			where parent in (%s)
-		""" % (self.doctype, ', '.join(['%s']*len(self.invoices))), tuple(self.invoices), as_dict=1)
+		for invoices in get_invoice_chunks(self.invoices):
+			items = frappe.db.sql("""
+				select item_code, parent, taxable_value, base_net_amount, item_tax_rate, is_nil_exempt,
+				is_non_gst from `tab%s Item`
+				where parent in (%s)
+			""" % (self.doctype, ', '.join(['%s']*len(invoices))), tuple(invoices), as_dict=1)
 
+			self.set_invoice_items(items)
+
+	def set_invoice_items(self, items):
 		for d in items:
 			self.invoice_items.setdefault(d.parent, {}).setdefault(d.item_code, 0.0)
 			self.invoice_items[d.parent][d.item_code] += d.get('taxable_value', 0) or d.get('base_net_amount', 0)
@@ -327,55 +333,67 @@ class Gstr1Report(object):
 				self.nil_exempt_non_gst[d.parent][2] += d.get('taxable_value', 0)
 
 	def get_items_based_on_tax_rate(self):
-		self.tax_details = frappe.db.sql("""
-			select
-				parent, account_head, item_wise_tax_detail, base_tax_amount_after_discount_amount
-			from `tab%s`
-			where
-				parenttype = %s and docstatus = 1
-				and parent in (%s)
-			order by account_head
-		""" % (self.tax_doctype, '%s', ', '.join(['%s']*len(self.invoices.keys()))),
-			tuple([self.doctype] + list(self.invoices.keys())))
-
 		self.items_based_on_tax_rate = {}
 		self.invoice_cess = frappe._dict()
-		self.cgst_sgst_invoices = []
+		self.cgst_sgst_invoices = set()
+		self.igst_invoices = set()
+
+		cgst_sgst_accounts = set((self.gst_accounts.cgst_account or []) + (self.gst_accounts.sgst_account or []))
+		igst_accounts = set(self.gst_accounts.igst_account or [])
+		cess_accounts = set(self.gst_accounts.cess_account or [])
 
 		unidentified_gst_accounts = []
 		unidentified_gst_accounts_invoice = []
-		for parent, account, item_wise_tax_detail, tax_amount in self.tax_details:
-			if account in self.gst_accounts.cess_account:
-				self.invoice_cess.setdefault(parent, tax_amount)
-			else:
-				if item_wise_tax_detail:
-					try:
-						item_wise_tax_detail = json.loads(item_wise_tax_detail)
-						cgst_or_sgst = False
-						if account in self.gst_accounts.cgst_account \
-							or account in self.gst_accounts.sgst_account:
-							cgst_or_sgst = True
-
-						if not (cgst_or_sgst or account in self.gst_accounts.igst_account):
-							if "gst" in account.lower() and account not in unidentified_gst_accounts:
-								unidentified_gst_accounts.append(account)
-								unidentified_gst_accounts_invoice.append(parent)
-							continue
-
-						for item_code, tax_amounts in item_wise_tax_detail.items():
-							tax_rate = tax_amounts[0]
-							if tax_rate:
-								if cgst_or_sgst:
-									tax_rate *= 2
-									if parent not in self.cgst_sgst_invoices:
-										self.cgst_sgst_invoices.append(parent)
-
-								rate_based_dict = self.items_based_on_tax_rate\
-									.setdefault(parent, {}).setdefault(tax_rate, [])
-								if item_code not in rate_based_dict:
-									rate_based_dict.append(item_code)
-					except ValueError:
-						continue
+
+		for invoices in get_invoice_chunks(self.invoices):
+			tax_details = frappe.db.sql("""
+				select
+					parent, account_head, item_wise_tax_detail, base_tax_amount_after_discount_amount
+				from `tab%s`
+				where
+					parenttype = %s and docstatus = 1
+					and parent in (%s)
+				order by account_head
+			""" % (self.tax_doctype, '%s', ', '.join(['%s']*len(invoices))),
+				tuple([self.doctype] + invoices))
+
+			for parent, account, item_wise_tax_detail, tax_amount in tax_details:
+				if account in igst_accounts:
+					self.igst_invoices.add(parent)
+
+				if account in cess_accounts:
+					self.invoice_cess.setdefault(parent, tax_amount)
+					continue
+
+				if not item_wise_tax_detail:
+					continue
+
+				cgst_or_sgst = account in cgst_sgst_accounts
+
+				# identify the account before parsing the item wise tax detail
+				if not (cgst_or_sgst or account in igst_accounts):
+					if "gst" in account.lower() and account not in unidentified_gst_accounts:
+						unidentified_gst_accounts.append(account)
+						unidentified_gst_accounts_invoice.append(parent)
+					continue
+
+				try:
+					item_wise_tax_detail = json.loads(item_wise_tax_detail)
+				except ValueError:
+					continue
+
+				for item_code, tax_amounts in item_wise_tax_detail.items():
+					tax_rate = tax_amounts[0]
+					if tax_rate:
+						if cgst_or_sgst:
+							tax_rate *= 2
+							self.cgst_sgst_invoices.add(parent)
+
+						rate_based_dict = self.items_based_on_tax_rate\
+							.setdefault(parent, {}).setdefault(tax_rate, [])
+						if item_code not in rate_based_dict:
+							rate_based_dict.append(item_code)
+
 		if unidentified_gst_accounts:
 			frappe.msgprint(_("Following accounts might be selected in GST Settings:")
 				+ "<br>" + "<br>".join(unidentified_gst_accounts), alert=True)
@@ -1146,7 +1164,6 @@ def get_rate_and_tax_details(row, gstin):
 
 	# calculate tax amount added
 	tax = flt((row["taxable_value"]*rate)/100.0, 2)
-	frappe.errprint([tax, tax/2])
 	if row.get("billing_address_gstin") and gstin[0:2] == row["billing_address_gstin"][0:2]:
 		itm_det.update({"camt": flt(tax/2.0, 2), "samt": flt(tax/2.0, 2)})
 	else:
@@ -1154,6 +1171,11 @@ def get_rate_and_tax_details(row, gstin):
 
 	return {"num": int(num), "itm_det": itm_det}
 
+def get_invoice_chunks(invoices, chunk_size=INVOICE_CHUNK_SIZE):
+	invoices = list(invoices)
+	for i in range(0, len(invoices), chunk_size):
+		yield invoices[i:i + chunk_size]
+
 def get_company_gstin_number(company, address=None, all_gstins=False):
 	gstin = ''
 	if address:
@@ -43,7 +43,10 @@ class Gstr2Report(Gstr1Report):
 		"""
 
 	def get_data(self):
-		self.get_igst_invoices()
+		if not self.invoices:
+			return
+
+		# invoices with IGST are collected while reading the tax rows, see `get_items_based_on_tax_rate`
 		for inv, items_based_on_rate in self.items_based_on_tax_rate.items():
 			invoice_details = self.invoices.get(inv)
 			for rate, items in items_based_on_rate.items():
@@ -72,13 +75,6 @@ class Gstr2Report(Gstr1Report):
 
 					self.data.append(row)
 
-	def get_igst_invoices(self):
-		self.igst_invoices = []
-		for d in self.tax_details:
-			is_igst = True if d[1] in self.gst_accounts.igst_account else False
-			if is_igst and d[0] not in self.igst_invoices:
-				self.igst_invoices.append(d[0])
-
 	def get_conditions(self):
 		conditions = ""
 
@@ -0,0 +1,69 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+
+from unittest import TestCase
+
+import frappe
+from frappe.utils import nowdate
+
+from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
+from erpnext.regional.doctype.gstr_3b_report.test_gstr_3b_report import (
+	make_company as setup_company,
+)
+from erpnext.regional.doctype.gstr_3b_report.test_gstr_3b_report import (
+	make_suppliers as setup_suppliers,
+)
+from erpnext.regional.doctype.gstr_3b_report.test_gstr_3b_report import (
+	set_account_heads as setup_gst_settings,
+)
+from erpnext.regional.report.gstr_2.gstr_2 import execute as run_report
+
+
+class TestGSTR2Report(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		setup_company()
+		setup_suppliers()
+		setup_gst_settings()
+
+	@classmethod
+	def tearDownClass(cls):
+		frappe.db.rollback()
+
+	def test_gstr_2_with_igst_invoice(self):
+		pi = make_purchase_invoice(
+			company="_Test Company GST",
+			supplier="_Test Registered Supplier",
+			currency="INR",
+			warehouse="Finished Goods - _GST",
+			cost_center="Main - _GST",
+			expense_account="Cost of Goods Sold - _GST",
+			qty=1,
+			rate=100,
+			do_not_save=1
+		)
+		pi.append("taxes", {
+			"charge_type": "On Net Total",
+			"account_head": "Output Tax IGST - _GST",
+			"cost_center": "Main - _GST",
+			"description": "IGST @ 18.0",
+			"rate": 18
+		})
+		pi.submit()
+
+		columns, data = run_report(filters=frappe._dict({
+			"company": "_Test Company GST",
+			"from_date": nowdate(),
+			"to_date": nowdate(),
+			"type_of_business": "B2B"
+		}))
+
+		fieldnames = [d["fieldname"] for d in columns]
+		rows = [row for row in data if pi.name in row]
+		self.assertEqual(len(rows), 1)
+
+		# the tax of IGST invoices is reported as integrated tax
+		row = rows[0]
+		self.assertEqual(row[fieldnames.index("integrated_tax_paid")], 18)
+		self.assertEqual(row[fieldnames.index("central_tax_paid")], 0)
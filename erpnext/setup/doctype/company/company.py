@@ -10,7 +10,17 @@ from frappe import _
 from frappe.cache_manager import clear_defaults_cache
 from frappe.contacts.address_and_contact import load_address_and_contact
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
-from frappe.utils import cint, formatdate, get_timestamp, today
+from frappe.utils import (
+	add_days,
+	add_years,
+	cint,
+	flt,
+	formatdate,
+	get_first_day,
+	get_last_day,
+	get_timestamp,
+	today,
+)
 from frappe.utils.nestedset import NestedSet
 
 from erpnext.accounts.doctype.account.account import get_account_currency
@@ -431,38 +441,68 @@ def install_country_fixtures(company, country):
 		frappe.throw(_("Failed to setup defaults for country {0}. Please contact support.").format(frappe.bold(country)))
 
 
-def update_company_current_month_sales(company):
-	current_month_year = formatdate(today(), "MM-yyyy")
+def update_company_sales_history(company, posting_date, amount):
+	"""Add the amount of a submitted (or negative of a cancelled) invoice to the company's sales history"""
+	history = frappe.db.get_value("Company", company, "sales_monthly_history", for_update=True)
+	month_to_value_dict = get_sales_monthly_history(history)
 
-	results = frappe.db.sql('''
-		SELECT
-			SUM(base_grand_total) AS total,
-			DATE_FORMAT(`posting_date`, '%m-%Y') AS month_year
-		FROM
-			`tabSales Invoice`
-		WHERE
-			DATE_FORMAT(`posting_date`, '%m-%Y') = '{current_month_year}'
-			AND docstatus = 1
-			AND company = {company}
-		GROUP BY
-			month_year
-	'''.format(current_month_year=current_month_year, company=frappe.db.escape(company)),
-		as_dict = True)
+	if month_to_value_dict is None:
+		# never cached, built from the invoices which include this one
+		update_company_monthly_sales(company)
+		return
 
-	monthly_total = results[0]['total'] if len(results) > 0 else 0
+	month_year = formatdate(posting_date, "MM-yyyy")
+	month_to_value_dict[month_year] = flt(month_to_value_dict.get(month_year)) + flt(amount)
 
-	frappe.db.set_value("Company", company, "total_monthly_sales", monthly_total)
+	set_company_sales_history(company, month_to_value_dict)
 
-def update_company_monthly_sales(company):
-	'''Cache past year monthly sales of every company based on sales invoices'''
-	import json
+def update_company_monthly_sales(company, months=None):
+	"""Cache monthly sales of every company based on sales invoices,
+	only the given months (as dates) are recomputed if the history exists"""
+	month_to_value_dict = None
+	if months:
+		month_to_value_dict = get_sales_monthly_history(
+			frappe.db.get_value("Company", company, "sales_monthly_history", for_update=True))
 
-	from frappe.utils.goal import get_monthly_results
-	filter_str = "company = {0} and status != 'Draft' and docstatus=1".format(frappe.db.escape(company))
-	month_to_value_dict = get_monthly_results("Sales Invoice", "base_grand_total",
-		"posting_date", filter_str, "sum")
+	if month_to_value_dict is None:
+		from frappe.utils.goal import get_monthly_results
 
-	frappe.db.set_value("Company", company, "sales_monthly_history", json.dumps(month_to_value_dict))
+		filter_str = "company = {0} and status != 'Draft' and docstatus=1".format(frappe.db.escape(company))
+		month_to_value_dict = get_monthly_results("Sales Invoice", "base_grand_total",
+			"posting_date", filter_str, "sum")
+	else:
+		for month in months:
+			month_to_value_dict[formatdate(month, "MM-yyyy")] = flt(frappe.db.sql("""
+				select sum(base_grand_total)
+				from `tabSales Invoice`
+				where posting_date between %s and %s
+					and status != 'Draft' and docstatus = 1
+					and company = %s
+			""", (get_first_day(month), get_last_day(month), company))[0][0])
+
+	set_company_sales_history(company, month_to_value_dict)
+
+def set_company_sales_history(company, month_to_value_dict):
+	frappe.db.set_value("Company", company, {
+		"sales_monthly_history": json.dumps(month_to_value_dict),
+		"total_monthly_sales": flt(month_to_value_dict.get(formatdate(today(), "MM-yyyy")))
+	}, update_modified=False)
+
+def get_sales_monthly_history(history):
+	try:
+		return json.loads(history) if history and '{' in history else None
+	except ValueError:
+		return None
+
+def get_months_with_modified_sales(company, since):
+	"""First days of the months of sales invoices modified since the given date"""
+	posting_dates = frappe.db.sql_list("""
+		select distinct posting_date
+		from `tabSales Invoice`
+		where company = %s and modified >= %s
+	""", (company, since))
+
+	return {get_first_day(posting_date) for posting_date in posting_dates}
 
 def update_transactions_annual_history(company, commit=False):
 	transactions_history = get_all_transactions_annual_history(company)
@@ -474,7 +514,12 @@ def update_transactions_annual_history(company, commit=False):
 def cache_companies_monthly_sales_history():
 	companies = [d['name'] for d in frappe.get_list("Company")]
 	for company in companies:
-		update_company_monthly_sales(company)
+		# the job runs daily, a day's overlap covers a delayed run
+		months = get_months_with_modified_sales(company, add_days(today(), -2))
+		# always refresh the current month, so that the monthly total rolls over
+		months.add(get_first_day(today()))
+
+		update_company_monthly_sales(company, months)
 		update_transactions_annual_history(company)
 	frappe.db.commit()
 
@@ -510,51 +555,26 @@ def add_node():
 def get_all_transactions_annual_history(company):
 	out = {}
 
-	items = frappe.db.sql('''
-		select transaction_date, count(*) as count
-
-		from (
-			select name, transaction_date, company
-			from `tabQuotation`
-
-			UNION ALL
-
-			select name, transaction_date, company
-			from `tabSales Order`
-
-			UNION ALL
-
-			select name, posting_date as transaction_date, company
-			from `tabDelivery Note`
-
-			UNION ALL
-
-			select name, posting_date as transaction_date, company
-			from `tabSales Invoice`
-
-			UNION ALL
-
-			select name, creation as transaction_date, company
-			from `tabIssue`
-
-			UNION ALL
-
-			select name, creation as transaction_date, company
-			from `tabProject`
-		) t
-
-		where
-			company=%s
-			and
-			transaction_date > date_sub(curdate(), interval 1 year)
-
-		group by
-			transaction_date
-			''', (company), as_dict=True)
+	# filter and count each doctype on its own, so that their company and date indexes are used
+	queries = []
+	for doctype, date_field in (("Quotation", "transaction_date"), ("Sales Order", "transaction_date"),
+		("Delivery Note", "posting_date"), ("Sales Invoice", "posting_date"),
+		("Issue", "creation"), ("Project", "creation")):
+		queries.append("""
+			select {date_field} as transaction_date, count(*) as count
+			from `tab{doctype}`
+			where company = %(company)s and {date_field} > %(from_date)s
+			group by {date_field}""".format(doctype=doctype, date_field=date_field))
+
+	items = frappe.db.sql("""
+		select transaction_date, sum(count) as count
+		from ({0}) t
+		group by transaction_date
+	""".format(" UNION ALL ".join(queries)), {"company": company, "from_date": add_years(today(), -1)}, as_dict=True)
 
 	for d in items:
 		timestamp = get_timestamp(d["transaction_date"])
-		out.update({ timestamp: d["count"] })
+		out.update({ timestamp: cint(d["count"]) })
 
 	return out
 
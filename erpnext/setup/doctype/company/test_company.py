@@ -6,7 +6,7 @@ import unittest
 
 import frappe
 from frappe import _
-from frappe.utils import random_string
+from frappe.utils import flt, formatdate, random_string, today
 
 from erpnext.accounts.doctype.account.chart_of_accounts.chart_of_accounts import (
 	get_charts_for_country,
@@ -148,6 +148,38 @@ class TestCompany(unittest.TestCase):
 		child_company.save()
 		self.test_basic_tree()
 
+	def test_incremental_sales_history(self):
+		from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+		from erpnext.setup.doctype.company.company import update_company_monthly_sales
+
+		company = "_Test Company"
+		month_year = formatdate(today(), "MM-yyyy")
+		sales_update_frequency = frappe.db.get_single_value("Selling Settings", "sales_update_frequency")
+		frappe.db.set_single_value("Selling Settings", "sales_update_frequency", "Each Transaction")
+
+		try:
+			update_company_monthly_sales(company)
+			history = json.loads(frappe.db.get_value("Company", company, "sales_monthly_history"))
+
+			si = create_sales_invoice(qty=1, rate=1000)
+			incremental_history = json.loads(frappe.db.get_value("Company", company, "sales_monthly_history"))
+			self.assertEqual(flt(incremental_history.get(month_year)),
+				flt(history.get(month_year)) + flt(si.base_grand_total))
+			self.assertEqual(flt(frappe.db.get_value("Company", company, "total_monthly_sales")),
+				flt(incremental_history.get(month_year)))
+
+			# matches the history built from the invoices
+			update_company_monthly_sales(company)
+			history = json.loads(frappe.db.get_value("Company", company, "sales_monthly_history"))
+			self.assertEqual(flt(history.get(month_year)), flt(incremental_history.get(month_year)))
+
+			si.cancel()
+			incremental_history = json.loads(frappe.db.get_value("Company", company, "sales_monthly_history"))
+			self.assertEqual(flt(incremental_history.get(month_year)),
+				flt(history.get(month_year)) - flt(si.base_grand_total))
+		finally:
+			frappe.db.set_single_value("Selling Settings", "sales_update_frequency", sales_update_frequency)
+
 def create_company_communication(doctype, docname):
 	comm = frappe.get_doc({
 			"doctype": "Communication",
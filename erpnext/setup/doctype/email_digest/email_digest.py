@@ -63,13 +63,14 @@ class EmailDigest(Document):
 			where enabled=1""")]
 
 		if self.recipients:
+			# the digest has the same content for every recipient
+			msg = self.get_msg_html()
 			for row in self.recipients:
-				msg_for_this_recipient = self.get_msg_html()
-				if msg_for_this_recipient and row.recipient in valid_users:
+				if msg and row.recipient in valid_users:
 					frappe.sendmail(
 						recipients=row.recipient,
 						subject=_("{0} Digest").format(self.frequency),
-						message=msg_for_this_recipient,
+						message=msg,
 						reference_doctype = self.doctype,
 						reference_name = self.name,
 						unsubscribe_message = _("Unsubscribe from this Email Digest"))
@@ -333,9 +334,10 @@ class EmailDigest(Document):
 		balance = 0.0
 		count = 0
 
-		for account in self.get_root_type_accounts(root_type):
-			balance += get_balance_on(account, date = self.future_to_date)
-			count += get_count_on(account, fieldname, date = self.future_to_date)
+		# group accounts are summed in a single query, instead of one per ledger
+		for account in self.get_roots(root_type):
+			balance += get_cached_balance_on(account, self.future_to_date)
+			count += get_cached_count_on(account, fieldname, self.future_to_date)
 
 		if fieldname == 'income':
 			filters = {
@@ -521,9 +523,9 @@ class EmailDigest(Document):
 		balance = prev_balance = 0.0
 		count = 0
 		for account in accounts:
-			balance += get_balance_on(account, date=self.future_to_date, in_account_currency=False)
-			count += get_count_on(account, fieldname, date=self.future_to_date)
-			prev_balance += get_balance_on(account, date=self.past_to_date, in_account_currency=False)
+			balance += get_cached_balance_on(account, self.future_to_date, in_account_currency=False)
+			count += get_cached_count_on(account, fieldname, self.future_to_date)
+			prev_balance += get_cached_balance_on(account, self.past_to_date, in_account_currency=False)
 
 		if fieldname in ("bank_balance","credit_balance"):
 			label = ""
@@ -786,11 +788,22 @@ class EmailDigest(Document):
 		return purchase_order_list, purchase_order_items_overdue_list
 
 def send():
+	"""Send the digests due today, digests of each company are sent together in a separate job"""
+	digests = {}
+	for ed in frappe.db.sql("""select name, company from `tabEmail Digest`
+			where enabled=1 and docstatus<2""", as_dict=1):
+		digests.setdefault(ed.company, []).append(ed.name)
+
+	for company, names in digests.items():
+		frappe.enqueue("erpnext.setup.doctype.email_digest.email_digest.send_digests", queue="long",
+			timeout=1500, digests=names, now=frappe.flags.in_test)
+
+def send_digests(digests):
+	"""Send digests of a company, balances and counts computed for one are reused by the others"""
 	now_date = now_datetime().date()
 
-	for ed in frappe.db.sql("""select name from `tabEmail Digest`
-			where enabled=1 and docstatus<2""", as_list=1):
-		ed_obj = frappe.get_doc('Email Digest', ed[0])
+	for name in digests:
+		ed_obj = frappe.get_doc('Email Digest', name)
 		if (now_date == ed_obj.get_next_sending()):
 			ed_obj.send()
 
@@ -802,8 +815,8 @@ def get_incomes_expenses_for_period(account, from_date, to_date):
 		"""Get amounts for current and past periods"""
 
 		val = 0.0
-		balance_on_to_date = get_balance_on(account, date = to_date)
-		balance_before_from_date = get_balance_on(account, date = from_date - timedelta(days=1))
+		balance_on_to_date = get_cached_balance_on(account, to_date)
+		balance_before_from_date = get_cached_balance_on(account, from_date - timedelta(days=1))
 
 		fy_start_date = get_fiscal_year(to_date)[1]
 
@@ -812,15 +825,15 @@ def get_incomes_expenses_for_period(account, from_date, to_date):
 		elif from_date > fy_start_date:
 			val = balance_on_to_date - balance_before_from_date
 		else:
-			last_year_closing_balance = get_balance_on(account, date=fy_start_date - timedelta(days=1))
+			last_year_closing_balance = get_cached_balance_on(account, fy_start_date - timedelta(days=1))
 			val = balance_on_to_date + (last_year_closing_balance - balance_before_from_date)
 
 		return val
 
 def get_count_for_period(account, fieldname, from_date, to_date):
 	count = 0.0
-	count_on_to_date = get_count_on(account, fieldname, to_date)
-	count_before_from_date = get_count_on(account, fieldname, from_date - timedelta(days=1))
+	count_on_to_date = get_cached_count_on(account, fieldname, to_date)
+	count_before_from_date = get_cached_count_on(account, fieldname, from_date - timedelta(days=1))
 
 	fy_start_date = get_fiscal_year(to_date)[1]
 	if from_date == fy_start_date:
@@ -828,11 +841,35 @@ def get_count_for_period(account, fieldname, from_date, to_date):
 	elif from_date > fy_start_date:
 		count = count_on_to_date - count_before_from_date
 	else:
-		last_year_closing_count = get_count_on(account, fieldname, fy_start_date - timedelta(days=1))
+		last_year_closing_count = get_cached_count_on(account, fieldname, fy_start_date - timedelta(days=1))
 		count = count_on_to_date + (last_year_closing_count - count_before_from_date)
 
 	return count
 
+def get_digest_cache():
+	"""Balances and counts computed in this job, the previous period of one digest
+	is often the same balance as the start of the current period or another digest's"""
+	if not hasattr(frappe.local, 'email_digest_cache'):
+		frappe.local.email_digest_cache = {}
+
+	return frappe.local.email_digest_cache
+
+def get_cached_balance_on(account, date, in_account_currency=True):
+	cache = get_digest_cache()
+	key = ("balance", account, str(date), in_account_currency)
+	if key not in cache:
+		cache[key] = get_balance_on(account, date=date, in_account_currency=in_account_currency)
+
+	return cache[key]
+
+def get_cached_count_on(account, fieldname, date):
+	cache = get_digest_cache()
+	key = ("count", account, fieldname, str(date))
+	if key not in cache:
+		cache[key] = get_count_on(account, fieldname, date)
+
+	return cache[key]
+
 def get_future_date_for_calendaer_event(frequency):
 	from_date = to_date = today()
 
@@ -134,6 +134,12 @@ class Batch(Document):
 					frappe.bold("Batch Expiry Date")),
 				title=_("Expiry Date Mandatory"))
 
+	def on_update(self):
+		if self.has_value_changed("expiry_date"):
+			from erpnext.stock.doctype.batch_balance.batch_balance import update_batch_expiry_date
+
+			update_batch_expiry_date(self.name, self.expiry_date)
+
 	def get_name_from_naming_series(self):
 		"""
 		Get a name generated for a Batch from the Batch's naming series.
@@ -193,6 +193,28 @@ class TestBatch(FrappeTestCase):
 		current_batch_qty = flt(frappe.db.get_value("Batch", "B100", "batch_qty"))
 		self.assertEqual(current_batch_qty, existing_batch_qty)
 
+	def test_batch_no_query(self):
+		from erpnext.controllers.queries import get_batch_no as get_batch_no_query
+		from erpnext.stock.doctype.batch_balance.batch_balance import rebuild_batch_balances
+
+		self.make_batch_item('ITEM-BATCH-QUERY')
+		self.make_new_batch_and_entry('ITEM-BATCH-QUERY', 'BQ-1', '_Test Warehouse - _TC')
+		stock_entry = self.make_new_batch_and_entry('ITEM-BATCH-QUERY', 'BQ-2', '_Test Warehouse - _TC')
+
+		def get_batches(**filters):
+			filters.update({"item_code": "ITEM-BATCH-QUERY", "warehouse": "_Test Warehouse - _TC"})
+			return {d[0]: d[1] for d in get_batch_no_query("Batch", "", "name", 0, 20, filters)}
+
+		self.assertEqual(get_batches(), {"BQ-1": 90, "BQ-2": 90})
+
+		stock_entry.cancel()
+		self.assertEqual(get_batches(), {"BQ-1": 90})
+		self.assertEqual(get_batches(is_return=1), {"BQ-1": 90, "BQ-2": 0})
+
+		# rebuilt balances match the ones maintained with the stock ledger
+		rebuild_batch_balances("ITEM-BATCH-QUERY")
+		self.assertEqual(get_batches(is_return=1), {"BQ-1": 90, "BQ-2": 0})
+
 	@classmethod
 	def make_new_batch_and_entry(cls, item_name, batch_name, warehouse):
 		'''Make a new stock entry for given target warehouse and batch name of item'''
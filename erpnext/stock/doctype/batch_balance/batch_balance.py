@@ -0,0 +1,89 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+
+class BatchBalance(Document):
+	"""
+		Qty of a batch in a warehouse, the sum of its Stock Ledger Entries.
+		Maintained on submit of the entries so that batches in stock can be
+		listed without aggregating the stock ledger.
+	"""
+	pass
+
+
+def update_batch_balance(sle):
+	"""Add the qty of the Stock Ledger Entry to the balance of its batch and warehouse"""
+	if not sle.batch_no or not flt(sle.actual_qty):
+		return
+
+	# the reversing entries of a cancelled voucher take back the qty of its entries
+	name = frappe.db.sql("""
+		select name from `tabBatch Balance`
+		where batch_no = %s and warehouse = %s
+		limit 1 for update""", (sle.batch_no, sle.warehouse))
+
+	if name:
+		frappe.db.sql("""
+			update `tabBatch Balance` set qty = qty + %s, modified = %s
+			where name = %s""", (flt(sle.actual_qty), now(), name[0][0]))
+	else:
+		make_batch_balance(sle.batch_no, sle.item_code, sle.warehouse, flt(sle.actual_qty), sle.stock_uom,
+			frappe.db.get_value("Batch", sle.batch_no, "expiry_date"))
+
+
+def make_batch_balance(batch_no, item_code, warehouse, qty, stock_uom=None, expiry_date=None):
+	batch_balance = frappe.new_doc("Batch Balance")
+	batch_balance.update({
+		"batch_no": batch_no,
+		"item_code": item_code,
+		"warehouse": warehouse,
+		"qty": qty,
+		"stock_uom": stock_uom,
+		"expiry_date": expiry_date
+	})
+	batch_balance.owner = frappe.session.user
+	batch_balance.set_new_name()
+	batch_balance.db_insert()
+
+
+def get_batch_balance_qty(batch_no):
+	"""Returns the qty of the batch in all warehouses"""
+	return flt(frappe.db.sql("""select sum(qty) from `tabBatch Balance`
+		where batch_no = %s""", batch_no)[0][0])
+
+
+def update_batch_expiry_date(batch_no, expiry_date):
+	frappe.db.sql("""update `tabBatch Balance` set expiry_date = %s
+		where batch_no = %s""", (expiry_date, batch_no))
+
+
+def rebuild_batch_balances(item_code=None):
+	"""Recreate the batch balances from the Stock Ledger Entries"""
+	conditions = ""
+	if item_code:
+		conditions = " and item_code = %(item_code)s"
+
+	frappe.db.sql("delete from `tabBatch Balance` where 1=1 {0}".format(conditions),
+		{"item_code": item_code})
+
+	# cancelled entries are summed with their reversing entries, as on submit
+	balances = frappe.db.sql("""
+		select sle.batch_no, sle.item_code, sle.warehouse, sum(sle.actual_qty) as qty,
+			max(sle.stock_uom) as stock_uom, max(batch.expiry_date) as expiry_date
+		from `tabStock Ledger Entry` sle
+			inner join `tabBatch` batch on sle.batch_no = batch.name
+		where sle.docstatus = 1 {0}
+		group by sle.batch_no, sle.item_code, sle.warehouse
+	""".format(conditions), {"item_code": item_code}, as_dict=1)
+
+	for d in balances:
+		make_batch_balance(d.batch_no, d.item_code, d.warehouse, flt(d.qty), d.stock_uom, d.expiry_date)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Batch Balance", ["item_code", "warehouse", "expiry_date"])
+	frappe.db.add_index("Batch Balance", ["batch_no", "warehouse"])
@@ -32,7 +32,12 @@ from erpnext.stock.get_item_details import (
 	get_default_cost_center,
 	get_reserved_qty_for_so,
 )
-from erpnext.stock.stock_ledger import NegativeStockError, get_previous_sle, get_valuation_rate
+from erpnext.stock.stock_ledger import (
+	NegativeStockError,
+	get_previous_sle,
+	get_previous_sles,
+	get_valuation_rate,
+)
 from erpnext.stock.utils import get_bin, get_incoming_rate
 
 
@@ -435,14 +440,11 @@ class StockEntry(StockController):
 	def set_actual_qty(self):
 		from erpnext.stock.stock_ledger import is_negative_stock_allowed
 
+		previous_sles = self.get_previous_sles()
+
 		for d in self.get('items'):
 			allow_negative_stock = is_negative_stock_allowed(item_code=d.item_code)
-			previous_sle = get_previous_sle({
-				"item_code": d.item_code,
-				"warehouse": d.s_warehouse or d.t_warehouse,
-				"posting_date": self.posting_date,
-				"posting_time": self.posting_time
-			})
+			previous_sle = previous_sles.get((d.item_code, d.s_warehouse or d.t_warehouse)) or {}
 
 			# get actual stock at source warehouse
 			d.actual_qty = previous_sle.get("qty_after_transaction") or 0
@@ -519,11 +521,14 @@ class StockEntry(StockController):
 
 	def set_rate_for_outgoing_items(self, reset_outgoing_rate=True, raise_error_if_no_rate=True):
 		outgoing_items_cost = 0.0
+		previous_sles = self.get_previous_sles(outgoing_items_only=True) if reset_outgoing_rate else {}
+
 		for d in self.get('items'):
 			if d.s_warehouse:
 				if reset_outgoing_rate:
 					args = self.get_args_for_incoming_rate(d)
-					rate = get_incoming_rate(args, raise_error_if_no_rate)
+					rate = get_incoming_rate(args, raise_error_if_no_rate,
+						previous_sle=previous_sles.get((d.item_code, d.s_warehouse)) or {})
 					if rate > 0:
 						d.basic_rate = rate
 
@@ -533,6 +538,13 @@ class StockEntry(StockController):
 
 		return outgoing_items_cost
 
+	def get_previous_sles(self, outgoing_items_only=False):
+		"""Returns the last SLE before posting for every item-warehouse in the entry, fetched together"""
+		item_warehouse_pairs = [(d.item_code, d.s_warehouse or d.t_warehouse)
+			for d in self.get('items') if d.item_code and (d.s_warehouse or not outgoing_items_only)]
+
+		return get_previous_sles(item_warehouse_pairs, self.posting_date, self.posting_time)
+
 	def get_args_for_incoming_rate(self, item):
 		return frappe._dict({
 			"item_code": item.item_code,
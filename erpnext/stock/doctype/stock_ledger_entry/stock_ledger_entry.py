@@ -53,10 +53,13 @@ class StockLedgerEntry(Document):
 
 	def calculate_batch_qty(self):
 		if self.batch_no:
-			batch_qty = frappe.db.get_value("Stock Ledger Entry",
-				{"docstatus": 1, "batch_no": self.batch_no, "is_cancelled": 0},
-				"sum(actual_qty)") or 0
-			frappe.db.set_value("Batch", self.batch_no, "batch_qty", batch_qty)
+			from erpnext.stock.doctype.batch_balance.batch_balance import (
+				get_batch_balance_qty,
+				update_batch_balance,
+			)
+
+			update_batch_balance(self)
+			frappe.db.set_value("Batch", self.batch_no, "batch_qty", get_batch_balance_qty(self.batch_no))
 
 	def validate_mandatory(self):
 		mandatory = ['warehouse','posting_date','voucher_type','voucher_no','company']
@@ -193,13 +193,18 @@ class StockReconciliation(StockController):
 	def update_stock_ledger(self):
 		"""	find difference between current and expected entries
 			and create stock ledger entries based on the difference"""
-		from erpnext.stock.stock_ledger import get_previous_sle
+		from erpnext.stock.stock_ledger import get_previous_sles
 
 		sl_entries = []
 		has_serial_no = False
 		has_batch_no = False
+
+		# last sles of all the rows in one go
+		previous_sles = get_previous_sles([(row.item_code, row.warehouse) for row in self.items],
+			self.posting_date, self.posting_time)
+
 		for row in self.items:
-			item = frappe.get_doc("Item", row.item_code)
+			item = frappe.get_cached_value("Item", row.item_code, ["has_serial_no", "has_batch_no"], as_dict=1)
 			if item.has_batch_no:
 				has_batch_no = True
 
@@ -211,12 +216,7 @@ class StockReconciliation(StockController):
 					frappe.throw(_("Row #{0}: Item {1} is not a Serialized/Batched Item. It cannot have a Serial No/Batch No against it.") \
 						.format(row.idx, frappe.bold(row.item_code)))
 
-				previous_sle = get_previous_sle({
-					"item_code": row.item_code,
-					"warehouse": row.warehouse,
-					"posting_date": self.posting_date,
-					"posting_time": self.posting_time
-				})
+				previous_sle = previous_sles.get((row.item_code, row.warehouse)) or {}
 
 				if previous_sle:
 					if row.qty in ("", None):
@@ -18,7 +18,7 @@ from erpnext.stock.doctype.stock_reconciliation.stock_reconciliation import (
 	get_items,
 )
 from erpnext.stock.doctype.warehouse.test_warehouse import create_warehouse
-from erpnext.stock.stock_ledger import get_previous_sle, update_entries_after
+from erpnext.stock.stock_ledger import get_previous_sle, get_previous_sles, update_entries_after
 from erpnext.stock.utils import get_incoming_rate, get_stock_value_on, get_valuation_method
 
 
@@ -431,6 +431,28 @@ class TestStockReconciliation(FrappeTestCase):
 		self.assertEqual(old_bin_qty + 1, new_bin_qty)
 		frappe.db.rollback()
 
+	def test_get_previous_sles(self):
+		item_code = "Stock-Reco-Previous-SLE-Item"
+		warehouses = ["_Test Warehouse - _TC", "_Test Warehouse 1 - _TC"]
+		create_item(item_code)
+
+		for i, warehouse in enumerate(warehouses):
+			create_stock_reconciliation(item_code=item_code, warehouse=warehouse, qty=10 + i, rate=100,
+				posting_date=add_days(nowdate(), -2))
+			create_stock_reconciliation(item_code=item_code, warehouse=warehouse, qty=20 + i, rate=100,
+				posting_date=add_days(nowdate(), -1))
+
+		posting_date, posting_time = add_days(nowdate(), -1), "23:59:59"
+		previous_sles = get_previous_sles([(item_code, warehouse) for warehouse in warehouses]
+			+ [(item_code, "_Test Warehouse 2 - _TC")], posting_date, posting_time)
+
+		for warehouse in warehouses:
+			previous_sle = get_previous_sle({"item_code": item_code, "warehouse": warehouse,
+				"posting_date": posting_date, "posting_time": posting_time})
+			self.assertEqual(previous_sles[(item_code, warehouse)].name, previous_sle.name)
+
+		self.assertFalse(previous_sles.get((item_code, "_Test Warehouse 2 - _TC")))
+
 
 	def test_valid_batch(self):
 		create_batch_item_with_batch("Testing Batch Item 1", "001")
@@ -28,22 +28,12 @@ def _reorder_item():
 	default_company = (erpnext.get_default_company() or
 		frappe.db.sql("""select name from tabCompany limit 1""")[0][0])
 
-	items_to_consider = frappe.db.sql_list("""select name from `tabItem` item
-		where is_stock_item=1 and has_variants=0
-			and disabled=0
-			and (end_of_life is null or end_of_life='0000-00-00' or end_of_life > %(today)s)
-			and (exists (select name from `tabItem Reorder` ir where ir.parent=item.name)
-				or (variant_of is not null and variant_of != ''
-				and exists (select name from `tabItem Reorder` ir where ir.parent=item.variant_of))
-			)""",
-		{"today": nowdate()})
+	items_to_consider = get_items_for_reorder()
 
 	if not items_to_consider:
 		return
 
-	item_warehouse_projected_qty = get_item_warehouse_projected_qty(items_to_consider)
-
-	def add_to_material_request(item_code, warehouse, reorder_level, reorder_qty, material_request_type, warehouse_group=None):
+	def add_to_material_request(item_code, warehouse, reorder_level, reorder_qty, material_request_type, projected_qty):
 		if warehouse not in warehouse_company:
 			# a disabled warehouse
 			return
@@ -52,10 +42,7 @@ def _reorder_item():
 		reorder_qty = flt(reorder_qty)
 
 		# projected_qty will be 0 if Bin does not exist
-		if warehouse_group:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse_group))
-		else:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse))
+		projected_qty = flt(projected_qty)
 
 		if (reorder_level or reorder_qty) and projected_qty < reorder_level:
 			deficiency = reorder_level - projected_qty
@@ -70,44 +57,76 @@ def _reorder_item():
 				"reorder_qty": reorder_qty
 			})
 
-	for item_code in items_to_consider:
-		item = frappe.get_doc("Item", item_code)
-
-		if item.variant_of and not item.get("reorder_levels"):
-			item.update_template_tables()
-
-		if item.get("reorder_levels"):
-			for d in item.get("reorder_levels"):
-				add_to_material_request(item_code, d.warehouse, d.warehouse_reorder_level,
-					d.warehouse_reorder_qty, d.material_request_type, warehouse_group=d.warehouse_group)
+	for d in items_to_consider:
+		add_to_material_request(d.item_code, d.warehouse, d.warehouse_reorder_level,
+			d.warehouse_reorder_qty, d.material_request_type, d.projected_qty)
 
 	if material_requests:
 		return create_material_request(material_requests)
 
-def get_item_warehouse_projected_qty(items_to_consider):
-	item_warehouse_projected_qty = {}
-
-	for item_code, warehouse, projected_qty in frappe.db.sql("""select item_code, warehouse, projected_qty
-		from tabBin where item_code in ({0})
-			and (warehouse != "" and warehouse is not null)"""\
-		.format(", ".join(["%s"] * len(items_to_consider))), items_to_consider):
-
-		if item_code not in item_warehouse_projected_qty:
-			item_warehouse_projected_qty.setdefault(item_code, {})
-
-		if warehouse not in item_warehouse_projected_qty.get(item_code):
-			item_warehouse_projected_qty[item_code][warehouse] = flt(projected_qty)
-
-		warehouse_doc = frappe.get_doc("Warehouse", warehouse)
-
-		while warehouse_doc.parent_warehouse:
-			if not item_warehouse_projected_qty.get(item_code, {}).get(warehouse_doc.parent_warehouse):
-				item_warehouse_projected_qty.setdefault(item_code, {})[warehouse_doc.parent_warehouse] = flt(projected_qty)
-			else:
-				item_warehouse_projected_qty[item_code][warehouse_doc.parent_warehouse] += flt(projected_qty)
-			warehouse_doc = frappe.get_doc("Warehouse", warehouse_doc.parent_warehouse)
-
-	return item_warehouse_projected_qty
+def get_items_for_reorder():
+	"""
+		Returns the reorder levels of the items to consider (variants without reorder levels
+		use the template's), with the projected qty of the warehouse or warehouse group.
+		Projected qty of a warehouse group is summed from the bins of the warehouses
+		within its nested set bounds.
+	"""
+	item_conditions = """item.is_stock_item=1 and item.has_variants=0
+		and item.disabled=0
+		and (item.end_of_life is null or item.end_of_life='0000-00-00' or item.end_of_life > %(today)s)"""
+
+	return frappe.db.sql("""
+		select
+			reorder.item_code, reorder.warehouse, reorder.warehouse_group,
+			reorder.warehouse_reorder_level, reorder.warehouse_reorder_qty, reorder.material_request_type,
+			(select ifnull(sum(bin.projected_qty), 0)
+				from `tabBin` bin, `tabWarehouse` child
+				where bin.item_code = reorder.item_code and child.name = bin.warehouse
+					and child.lft >= wh.lft and child.rgt <= wh.rgt) as projected_qty
+		from (
+			select item.name as item_code, ir.warehouse, ir.warehouse_group, ir.warehouse_reorder_level,
+				ir.warehouse_reorder_qty, ir.material_request_type, ir.idx
+			from `tabItem` item, `tabItem Reorder` ir
+			where ir.parent = item.name and ir.parenttype = 'Item'
+				and {item_conditions}
+
+			union all
+
+			select item.name as item_code, ir.warehouse, null as warehouse_group, ir.warehouse_reorder_level,
+				ir.warehouse_reorder_qty, ir.material_request_type, ir.idx
+			from `tabItem` item, `tabItem Reorder` ir
+			where ir.parent = item.variant_of and ir.parenttype = 'Item'
+				and {item_conditions}
+				and not exists (select name from `tabItem Reorder` own where own.parent = item.name)
+		) reorder
+		left join `tabWarehouse` wh
+			on wh.name = ifnull(nullif(reorder.warehouse_group, ''), reorder.warehouse)
+		order by reorder.item_code, reorder.idx
+	""".format(item_conditions=item_conditions), {"today": nowdate()}, as_dict=1)
+
+def get_item_details_for_reorder(material_requests):
+	item_codes = list(set(d["item_code"] for requests in material_requests.values()
+		for items in requests.values() for d in items))
+
+	if not item_codes:
+		return {}
+
+	item_details = {}
+	for d in frappe.get_all("Item", filters={"name": ("in", item_codes)},
+		fields=["name", "item_name", "description", "item_group", "brand", "stock_uom",
+			"purchase_uom", "lead_time_days"]):
+		d.purchase_conversion_factor = 1.0
+		item_details[d.name] = d
+
+	for item_code, conversion_factor in frappe.db.sql("""
+		select item.name, uom.conversion_factor
+		from `tabItem` item, `tabUOM Conversion Detail` uom
+		where uom.parent = item.name and uom.uom = item.purchase_uom
+			and item.purchase_uom != item.stock_uom
+			and item.name in %s""", (item_codes,)):
+		item_details[item_code].purchase_conversion_factor = flt(conversion_factor) or 1.0
+
+	return item_details
 
 def create_material_request(material_requests):
 	"""	Create indent on reaching reorder level	"""
@@ -123,6 +142,8 @@ def create_material_request(material_requests):
 
 		frappe.log_error(frappe.get_traceback())
 
+	item_details = get_item_details_for_reorder(material_requests)
+
 	for request_type in material_requests:
 		for company in material_requests[request_type]:
 			try:
@@ -139,15 +160,14 @@ def create_material_request(material_requests):
 
 				for d in items:
 					d = frappe._dict(d)
-					item = frappe.get_doc("Item", d.item_code)
+					item = item_details[d.item_code]
 					uom = item.stock_uom
 					conversion_factor = 1.0
 
 					if request_type == 'Purchase':
 						uom = item.purchase_uom or item.stock_uom
 						if uom != item.stock_uom:
-							conversion_factor = frappe.db.get_value("UOM Conversion Detail",
-								{'parent': item.name, 'uom': uom}, 'conversion_factor') or 1.0
+							conversion_factor = item.purchase_conversion_factor
 
 					must_be_whole_number = frappe.db.get_value("UOM", uom, "must_be_whole_number", cache=True)
 					qty = d.reorder_qty / conversion_factor
@@ -893,6 +893,49 @@ def get_previous_sle(args, for_update=False):
 	sle = get_stock_ledger_entries(args, "<=", "desc", "limit 1", for_update=for_update)
 	return sle and sle[0] or {}
 
+def get_previous_sles(item_warehouse_pairs, posting_date=None, posting_time=None, chunk_size=100):
+	"""
+		get the last sle on or before the posting datetime for many (item_code, warehouse) pairs,
+		same as `get_previous_sle`, with one query per `chunk_size` pairs
+
+		returns {(item_code, warehouse): sle}
+	"""
+	if not posting_date:
+		posting_date = "1900-01-01"
+	if not posting_time:
+		posting_time = "00:00"
+
+	previous_sles = {}
+	item_warehouse_pairs = sorted(set(item_warehouse_pairs), key=lambda d: (d[0] or "", d[1] or ""))
+
+	for item_code, warehouse in item_warehouse_pairs:
+		if item_code and not warehouse:
+			# last sle of the item across warehouses
+			previous_sles[(item_code, warehouse)] = get_previous_sle({
+				"item_code": item_code,
+				"posting_date": posting_date,
+				"posting_time": posting_time
+			})
+
+	item_warehouse_pairs = [d for d in item_warehouse_pairs if d[0] and d[1]]
+
+	for i in range(0, len(item_warehouse_pairs), chunk_size):
+		queries, values = [], []
+		for item_code, warehouse in item_warehouse_pairs[i:i + chunk_size]:
+			queries.append("""(select *, timestamp(posting_date, posting_time) as "timestamp"
+				from `tabStock Ledger Entry`
+				where item_code = %s and warehouse = %s
+				and is_cancelled = 0
+				and timestamp(posting_date, posting_time) <= timestamp(%s, %s)
+				order by timestamp(posting_date, posting_time) desc, creation desc
+				limit 1)""")
+			values.extend([item_code, warehouse, posting_date, posting_time])
+
+		for sle in frappe.db.sql(" union all ".join(queries), values, as_dict=1):
+			previous_sles[(sle.item_code, sle.warehouse)] = sle
+
+	return previous_sles
+
 def get_stock_ledger_entries(previous_sle, operator=None,
 	order="desc", limit=None, for_update=False, debug=False, check_serial_no=True):
 	"""get stock ledger entries filtered by specific posting datetime conditions"""
@@ -41,42 +41,52 @@ def get_stock_value_from_bin(warehouse=None, item_code=None):
 	return stock_value
 
 def get_stock_value_on(warehouse=None, posting_date=None, item_code=None):
+	return sum(get_stock_values_on(warehouse, posting_date, item_code).values())
+
+def get_stock_values_on(warehouse=None, posting_date=None, item_code=None):
+	"""
+		Returns stock value of each (item_code, warehouse) as on the posting date.
+
+		The bins are used as the list of item-warehouse pairs and only the latest
+		stock ledger entry of each pair (as on the date) is read, instead of every
+		entry up to the date.
+	"""
 	if not posting_date: posting_date = nowdate()
 
-	values, condition = [posting_date], ""
+	values, condition = {"posting_date": posting_date}, ""
 
 	if warehouse:
 
 		lft, rgt, is_group = frappe.db.get_value("Warehouse", warehouse, ["lft", "rgt", "is_group"])
 
 		if is_group:
-			values.extend([lft, rgt])
-			condition += "and exists (\
-				select name from `tabWarehouse` wh where wh.name = sle.warehouse\
-				and wh.lft >= %s and wh.rgt <= %s)"
+			values.update({"lft": lft, "rgt": rgt})
+			condition += " and exists (\
+				select name from `tabWarehouse` wh where wh.name = bin.warehouse\
+				and wh.lft >= %(lft)s and wh.rgt <= %(rgt)s)"
 
 		else:
-			values.append(warehouse)
-			condition += " AND warehouse = %s"
+			values["warehouse"] = warehouse
+			condition += " and bin.warehouse = %(warehouse)s"
 
 	if item_code:
-		values.append(item_code)
-		condition += " AND item_code = %s"
-
-	stock_ledger_entries = frappe.db.sql("""
-		SELECT item_code, stock_value, name, warehouse
-		FROM `tabStock Ledger Entry` sle
-		WHERE posting_date <= %s {0}
-			and is_cancelled = 0
-		ORDER BY timestamp(posting_date, posting_time) DESC, creation DESC
+		values["item_code"] = item_code
+		condition += " and bin.item_code = %(item_code)s"
+
+	bins = frappe.db.sql("""
+		SELECT bin.item_code, bin.warehouse,
+			(SELECT sle.stock_value
+				FROM `tabStock Ledger Entry` sle
+				WHERE sle.warehouse = bin.warehouse and sle.item_code = bin.item_code
+					and sle.posting_date <= %(posting_date)s and sle.is_cancelled = 0
+				ORDER BY sle.posting_date DESC, sle.posting_time DESC, sle.creation DESC
+				LIMIT 1) as stock_value
+		FROM `tabBin` bin
+		WHERE 1 = 1 {0}
 	""".format(condition), values, as_dict=1)
 
-	sle_map = {}
-	for sle in stock_ledger_entries:
-		if not (sle.item_code, sle.warehouse) in sle_map:
-			sle_map[(sle.item_code, sle.warehouse)] = flt(sle.stock_value)
-
-	return sum(sle_map.values())
+	return {(d.item_code, d.warehouse): flt(d.stock_value)
+		for d in bins if d.stock_value is not None}
 
 @frappe.whitelist()
 def get_stock_balance(item_code, warehouse, posting_date=None, posting_time=None,
@@ -207,7 +217,7 @@ def _create_bin(item_code, warehouse):
 	return bin_obj
 
 @frappe.whitelist()
-def get_incoming_rate(args, raise_error_if_no_rate=True):
+def get_incoming_rate(args, raise_error_if_no_rate=True, previous_sle=None):
 	"""Get Incoming Rate based on valuation method"""
 	from erpnext.stock.stock_ledger import (
 		get_batch_incoming_rate,
@@ -233,7 +243,8 @@ def get_incoming_rate(args, raise_error_if_no_rate=True):
 		)
 	else:
 		valuation_method = get_valuation_method(args.get("item_code"))
-		previous_sle = get_previous_sle(args)
+		if previous_sle is None:
+			previous_sle = get_previous_sle(args)
 		if valuation_method in ('FIFO', 'LIFO'):
 			if previous_sle:
 				previous_stock_queue = json.loads(previous_sle.get('stock_queue', '[]') or '[]')
@@ -2,7 +2,8 @@
 # For license information, please see license.txt
 
 
-from datetime import datetime
+from bisect import bisect_left
+from datetime import datetime, timedelta
 
 import frappe
 from frappe import _
@@ -139,7 +140,8 @@ class ServiceLevelAgreement(Document):
 				frappe.throw(_("The Condition '{0}' is invalid").format(self.condition))
 
 	def get_service_level_agreement_priority(self, priority):
-		priority = frappe.get_doc("Service Level Priority", {"priority": priority, "parent": self.name})
+		priority = next((d for d in self.priorities if d.priority == priority), None) \
+			or frappe.get_doc("Service Level Priority", {"priority": priority, "parent": self.name})
 
 		return frappe._dict({
 			"priority": priority.priority,
@@ -236,71 +238,84 @@ class ServiceLevelAgreement(Document):
 
 
 def check_agreement_status():
-	service_level_agreements = frappe.get_all("Service Level Agreement", filters=[
-		{"enabled": 1},
-		{"default_service_level_agreement": 0}
-	], fields=["name"])
+	expired = frappe.get_all("Service Level Agreement", filters={
+		"enabled": 1,
+		"default_service_level_agreement": 0,
+		"end_date": ["<", getdate()]
+	}, pluck="name")
 
-	for service_level_agreement in service_level_agreements:
-		doc = frappe.get_doc("Service Level Agreement", service_level_agreement.name)
-		if doc.end_date and getdate(doc.end_date) < getdate(frappe.utils.getdate()):
-			frappe.db.set_value("Service Level Agreement", service_level_agreement.name, "enabled", 0)
+	if expired:
+		frappe.db.set_value("Service Level Agreement", {"name": ["in", expired]}, "enabled", 0)
 
 def get_active_service_level_agreement_for(doc):
 	if not frappe.db.get_single_value("Support Settings", "track_service_level_agreement"):
 		return
 
-	filters = [
-		["Service Level Agreement", "document_type", "=", doc.get('doctype')],
-		["Service Level Agreement", "enabled", "=", 1]
-	]
+	priority = doc.get('priority')
+	service_level_agreements = [sla for sla in get_service_level_agreements(doc.get('doctype'))
+		if not priority or priority in sla.priorities]
 
-	if doc.get('priority'):
-		filters.append(["Service Level Priority", "priority", "=", doc.get('priority')])
+	customer = doc.get('customer')
+	entities = None
 
-	or_filters = []
-	if doc.get('service_level_agreement'):
-		or_filters = [
-			["Service Level Agreement", "name", "=", doc.get('service_level_agreement')],
-		]
+	# check if the current document on which SLA is to be applied fulfills all the conditions
+	filtered_agreements = []
+	for agreement in service_level_agreements:
+		if agreement.default_service_level_agreement:
+			continue
 
-	customer = doc.get('customer')
-	if customer:
-		or_filters.extend([
-			["Service Level Agreement", "entity", "in", [customer] + get_customer_group(customer) + get_customer_territory(customer)],
-			["Service Level Agreement", "entity_type", "is", "not set"]
-		])
-	else:
-		or_filters.append(
-			["Service Level Agreement", "entity_type", "is", "not set"]
-		)
+		if agreement.entity_type and agreement.name != doc.get('service_level_agreement'):
+			if not customer:
+				continue
 
-	default_sla_filter = filters + [["Service Level Agreement", "default_service_level_agreement", "=", 1]]
-	default_sla = frappe.get_all("Service Level Agreement", filters=default_sla_filter,
-		fields=["name", "default_priority", "apply_sla_for_resolution", "condition"])
+			# customer groups and territories are only looked up if an agreement is for an entity
+			if entities is None:
+				entities = [customer] + get_customer_group(customer) + get_customer_territory(customer)
 
-	filters += [["Service Level Agreement", "default_service_level_agreement", "=", 0]]
-	agreements = frappe.get_all("Service Level Agreement", filters=filters, or_filters=or_filters,
-		fields=["name", "default_priority", "apply_sla_for_resolution", "condition"])
+			if agreement.entity not in entities:
+				continue
 
-	# check if the current document on which SLA is to be applied fulfills all the conditions
-	filtered_agreements = []
-	for agreement in agreements:
 		condition = agreement.get('condition')
 		if not condition or (condition and frappe.safe_eval(condition, None, get_context(doc))):
 			filtered_agreements.append(agreement)
 
 	# if any default sla
-	filtered_agreements += default_sla
+	filtered_agreements += [sla for sla in service_level_agreements if sla.default_service_level_agreement]
 
 	return filtered_agreements[0] if filtered_agreements else None
 
+def get_service_level_agreements(doctype):
+	"""Returns the enabled agreements for the doctype with their priorities, cached till an agreement changes"""
+	signature = frappe.db.sql("""select count(*), max(modified) from `tabService Level Agreement`
+		where document_type = %s""", doctype)[0]
+	cached = frappe.cache().hget("service_level_agreement", doctype)
+
+	if cached and cached[0] == signature:
+		service_level_agreements = cached[1]
+	else:
+		service_level_agreements = frappe.get_all("Service Level Agreement",
+			filters={"document_type": doctype, "enabled": 1},
+			fields=["name", "default_priority", "apply_sla_for_resolution", "condition",
+				"entity_type", "entity", "default_service_level_agreement"],
+			order_by="modified desc")
+
+		priorities = frappe.get_all("Service Level Priority",
+			filters={"parenttype": "Service Level Agreement", "parent": ["in", [sla.name for sla in service_level_agreements]]},
+			fields=["parent", "priority"]) if service_level_agreements else []
+
+		for sla in service_level_agreements:
+			sla.priorities = [d.priority for d in priorities if d.parent == sla.name]
+
+		frappe.cache().hset("service_level_agreement", doctype, (signature, service_level_agreements))
+
+	return service_level_agreements
+
 def get_context(doc):
 	return {"doc": doc.as_dict(), "nowdate": nowdate, "frappe": frappe._dict(utils=get_safe_globals().get("frappe").get("utils"))}
 
 def get_customer_group(customer):
 	customer_groups = []
-	customer_group = frappe.db.get_value("Customer", customer, "customer_group") if customer else None
+	customer_group = frappe.get_cached_value("Customer", customer, "customer_group") if customer else None
 	if customer_group:
 		ancestors = get_ancestors_of("Customer Group", customer_group)
 		customer_groups = [customer_group] + ancestors
@@ -310,7 +325,7 @@ def get_customer_group(customer):
 
 def get_customer_territory(customer):
 	customer_territories = []
-	customer_territory = frappe.db.get_value("Customer", customer, "territory") if customer else None
+	customer_territory = frappe.get_cached_value("Customer", customer, "territory") if customer else None
 	if customer_territory:
 		ancestors = get_ancestors_of("Territory", customer_territory)
 		customer_territories = [customer_territory] + ancestors
@@ -414,7 +429,11 @@ def process_sla(doc, sla):
 
 def handle_status_change(doc, apply_sla_for_resolution):
 	now_time = frappe.flags.current_time or now_datetime(doc.get("owner"))
-	prev_status = frappe.db.get_value(doc.doctype, doc.name, 'status')
+
+	# the saved status, loaded by save before validate
+	doc_before_save = doc.get_doc_before_save()
+	prev_status = doc_before_save.get('status') if doc_before_save \
+		else frappe.db.get_value(doc.doctype, doc.name, 'status')
 
 	hold_statuses = get_hold_statuses(doc.service_level_agreement)
 	fulfillment_statuses = get_fulfillment_statuses(doc.service_level_agreement)
@@ -492,15 +511,13 @@ def handle_status_change(doc, apply_sla_for_resolution):
 
 
 def get_fulfillment_statuses(service_level_agreement):
-	return [entry.status for entry in frappe.db.get_all("SLA Fulfilled On Status", filters={
-		"parent": service_level_agreement
-	}, fields=["status"])]
+	sla = frappe.get_cached_doc("Service Level Agreement", service_level_agreement)
+	return [entry.status for entry in sla.sla_fulfilled_on]
 
 
 def get_hold_statuses(service_level_agreement):
-	return [entry.status for entry in frappe.db.get_all("Pause SLA On Status", filters={
-		"parent": service_level_agreement
-	}, fields=["status"])]
+	sla = frappe.get_cached_doc("Service Level Agreement", service_level_agreement)
+	return [entry.status for entry in sla.pause_sla_on]
 
 
 def update_response_and_resolution_metrics(doc, apply_sla_for_resolution):
@@ -519,10 +536,18 @@ def get_expected_time_for(parameter, service_level, start_date_time):
 
 	allotted_seconds = get_allotted_seconds(parameter, service_level)
 	support_days = get_support_days(service_level)
-	holidays = get_holidays(service_level.get("holiday_list"))
+	holidays = sorted(set(getdate(d) for d in get_holidays(service_level.get("holiday_list"))))
 	weekdays = get_weekdays()
+	seconds_in_week = get_support_seconds_in_week(support_days)
 
 	while not expected_time_is_set:
+		# skip whole weeks of support while the time left spans them
+		while current_date_time.date() > getdate(start_date_time) \
+			and seconds_in_week and allotted_seconds and seconds_in_week < allotted_seconds \
+			and not has_holiday_between(holidays, current_date_time.date(), current_date_time.date() + timedelta(days=6)):
+			allotted_seconds -= seconds_in_week
+			current_date_time = add_to_date(current_date_time, days=7)
+
 		current_weekday = weekdays[current_date_time.weekday()]
 
 		if not is_holiday(current_date_time, holidays) and current_weekday in support_days:
@@ -569,6 +594,16 @@ def get_allotted_seconds(parameter, service_level):
 	return allotted_seconds
 
 
+def get_support_seconds_in_week(support_days):
+	return sum(max(time_diff_in_seconds(d.end_time, d.start_time), 0) for d in support_days.values())
+
+
+def has_holiday_between(holidays, from_date, to_date):
+	"""`holidays` is a sorted list of dates"""
+	index = bisect_left(holidays, from_date)
+	return index < len(holidays) and holidays[index] <= to_date
+
+
 def get_support_days(service_level):
 	support_days = {}
 	for service in service_level.get("support_and_resolution"):
@@ -619,7 +654,7 @@ def change_service_level_agreement_and_priority(self):
 
 
 def get_response_and_resolution_duration(doc):
-	sla = frappe.get_doc("Service Level Agreement", doc.service_level_agreement)
+	sla = frappe.get_cached_doc("Service Level Agreement", doc.service_level_agreement)
 	priority = sla.get_service_level_agreement_priority(doc.priority)
 	priority.update({
 		"support_and_resolution": sla.support_and_resolution,
@@ -695,7 +730,7 @@ def on_communication_update(doc, status):
 	else:
 		return
 
-	for_resolution = frappe.db.get_value('Service Level Agreement', parent.service_level_agreement, 'apply_sla_for_resolution')
+	for_resolution = frappe.get_cached_value('Service Level Agreement', parent.service_level_agreement, 'apply_sla_for_resolution')
 
 	handle_status_change(parent, for_resolution)
 	update_response_and_resolution_metrics(parent, for_resolution)
@@ -847,7 +882,9 @@ def update_agreement_status(doc, apply_sla_for_resolution):
 
 
 def is_holiday(date, holidays):
-	return getdate(date) in holidays
+	"""`holidays` is a sorted list of dates"""
+	date = getdate(date)
+	return has_holiday_between(holidays, date, date)
 
 
 def get_time_in_timedelta(time):
@@ -251,6 +251,31 @@ class TestServiceLevelAgreement(unittest.TestCase):
 		applied_sla = frappe.db.get_value('Lead', lead.name, 'service_level_agreement')
 		self.assertFalse(applied_sla)
 
+	def test_expected_time_over_weeks(self):
+		from frappe.utils import to_timedelta
+
+		from erpnext.support.doctype.service_level_agreement.service_level_agreement import (
+			get_expected_time_for,
+		)
+
+		make_holiday_list()
+		service_level = frappe._dict({
+			"resolution_time": 120 * 60 * 60,
+			"holiday_list": "__Test Holiday List",
+			"support_and_resolution": [
+				frappe._dict({"workday": workday, "start_time": to_timedelta("10:00:00"), "end_time": to_timedelta("18:00:00")})
+				for workday in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+			]
+		})
+
+		# 120 working hours from noon, whole weeks in between
+		self.assertEqual(get_expected_time_for("resolution", service_level, datetime.datetime(2019, 3, 11, 12, 0)),
+			datetime.datetime(2019, 4, 1, 12, 0))
+
+		# with holidays on 5th and 7th March
+		self.assertEqual(get_expected_time_for("resolution", service_level, datetime.datetime(2019, 3, 4, 12, 0)),
+			datetime.datetime(2019, 3, 27, 12, 0))
+
 	def tearDown(self):
 		for d in frappe.get_all("Service Level Agreement"):
 			frappe.delete_doc("Service Level Agreement", d.name, force=1)
@@ -5,6 +5,7 @@ import frappe
 from frappe.utils import cint, cstr
 from redisearch import AutoCompleter, Client, Query
 
+from erpnext.e_commerce.local_search_index import get_local_search_results, is_local_index_built
 from erpnext.e_commerce.redisearch_utils import (
 	WEBSITE_ITEM_CATEGORY_AUTOCOMPLETE,
 	WEBSITE_ITEM_INDEX,
@@ -70,9 +71,12 @@ def product_search(query, limit=10, fuzzy_search=True):
 	search_results = {"from_redisearch": True, "results": []}
 
 	if not is_search_module_loaded():
-		# Redisearch module not loaded
+		# Redisearch module not loaded, use the local index if built or query db
 		search_results["from_redisearch"] = False
-		search_results["results"] = get_product_data(query, 0, limit)
+		if is_local_index_built():
+			search_results["results"] = get_local_search_results(query, cint(limit))
+		else:
+			search_results["results"] = get_product_data(query, 0, limit)
 		return search_results
 
 	if not query:
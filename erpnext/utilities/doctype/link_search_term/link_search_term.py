@@ -0,0 +1,204 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Search index for the link queries of large masters.
+
+Every searchable value of a record is indexed by its trigrams, so that any text of
+three or more characters can be looked up by its trigrams instead of a `LIKE '%txt%'`
+scan. Shorter texts have no trigrams and are still searched by the scan. The index only
+narrows down the records, the link query still applies its own conditions and ordering
+to them.
+
+The index is kept up to date by the document hooks of the indexed doctypes, and by the
+rename of the masters they link to (like an Item Group), which rewrites the links in SQL.
+Any other write that skips the hooks, like `frappe.db.set_value` or an SQL update of an
+indexed field, must be followed by `rebuild_search_index` for the doctype.
+"""
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, cstr, unique
+
+# fields searched by the link queries in addition to the search fields of the doctype
+INDEXED_FIELDS = {
+	"Item": ["item_code", "item_group", "item_name"],
+	"Customer": ["customer_name"],
+	"Supplier": ["supplier_name"]
+}
+# the index is only used for masters with at least these many records
+MIN_RECORDS_FOR_INDEX = 50000
+REBUILD_BATCH_SIZE = 1000
+
+
+class LinkSearchTerm(Document):
+	"""A term a record is found by in link searches, see the module docstring"""
+	pass
+
+
+def get_indexed_fields(doctype):
+	meta = frappe.get_meta(doctype)
+	fields = meta.get_search_fields() + INDEXED_FIELDS.get(doctype, [])
+
+	return [field for field in unique(fields)
+		if field == "name" or (meta.has_field(field) and field != "description")]
+
+
+def get_terms(value):
+	value = cstr(value).lower()
+
+	return set(value[i:i + 3] for i in range(len(value) - 2))
+
+
+def get_query_terms(txt):
+	"""Returns the terms all records matching `txt` are indexed with"""
+	return get_terms(txt)
+
+
+def get_record_terms(record, fields, barcodes=None):
+	terms = set()
+	for field in fields:
+		terms.update(get_terms(record.get(field)))
+
+	for barcode in barcodes or []:
+		terms.update(get_terms(barcode))
+
+	return terms
+
+
+def update_search_index(doc, method=None):
+	"""Index the searchable values of the record, on update"""
+	if doc.doctype not in INDEXED_FIELDS:
+		return
+
+	barcodes = [d.barcode for d in doc.get("barcodes") or []]
+	terms = get_record_terms(doc, get_indexed_fields(doc.doctype), barcodes)
+
+	delete_from_search_index(doc)
+	insert_terms(doc.doctype, {doc.name: terms})
+
+
+def delete_from_search_index(doc, method=None, name=None):
+	frappe.db.delete("Link Search Term", {
+		"reference_doctype": doc.doctype,
+		"reference_name": name or doc.name
+	})
+
+
+def rename_in_search_index(doc, method=None, old=None, new=None, merge=False):
+	delete_from_search_index(doc, name=old)
+	update_search_index(doc)
+
+
+def reindex_linked_records(doc, method=None, old=None, new=None, merge=False):
+	"""The rename of a master rewrites the links to it in SQL, index the linking records again"""
+	for doctype in INDEXED_FIELDS:
+		meta = frappe.get_meta(doctype)
+		link_fields = [field for field in get_indexed_fields(doctype)
+			if meta.get_field(field) and meta.get_field(field).fieldtype == "Link"
+			and meta.get_field(field).options == doc.doctype]
+
+		if link_fields:
+			frappe.enqueue("erpnext.utilities.doctype.link_search_term.link_search_term.reindex_records",
+				queue="long", enqueue_after_commit=True, now=frappe.flags.in_test,
+				doctype=doctype, or_filters={field: new for field in link_fields})
+
+
+def reindex_records(doctype, or_filters):
+	"""Index the records of the doctype matching any of `or_filters` again"""
+	index_records(doctype, or_filters=or_filters, delete_existing=True)
+
+
+def insert_terms(doctype, terms_by_name):
+	values = []
+	for name, terms in terms_by_name.items():
+		values.extend((get_term_name(doctype, name, term), doctype, name, term) for term in terms)
+
+	if values:
+		frappe.db.bulk_insert("Link Search Term", fields=["name", "reference_doctype", "reference_name", "term"],
+			values=values, ignore_duplicates=True)
+
+
+def get_term_name(doctype, name, term):
+	"""
+		Terms are named by a hash of the record and the term, which are unique in the index,
+		instead of a random hash that could collide across millions of rows. A term inserted
+		twice, by a save during a rebuild, is the same row and is skipped.
+	"""
+	return hashlib.sha1("\0".join((doctype, cstr(name), term)).encode()).hexdigest()
+
+
+def rebuild_search_index(doctype):
+	"""Recreate the search index of all records of the doctype"""
+	frappe.db.delete("Link Search Term", {"reference_doctype": doctype})
+
+	index_records(doctype)
+
+	frappe.db.set_default(get_built_key(doctype), 1)
+
+
+def index_records(doctype, or_filters=None, delete_existing=False):
+	fields = get_indexed_fields(doctype)
+
+	start = 0
+	while True:
+		records = frappe.get_all(doctype, fields=fields, or_filters=or_filters, order_by="name",
+			limit_start=start, limit_page_length=REBUILD_BATCH_SIZE)
+		if not records:
+			break
+
+		if delete_existing:
+			frappe.db.delete("Link Search Term", {
+				"reference_doctype": doctype,
+				"reference_name": ("in", [d.name for d in records])
+			})
+
+		barcodes = {}
+		if doctype == "Item":
+			for d in frappe.get_all("Item Barcode", fields=["parent", "barcode"],
+				filters={"parent": ("in", [d.name for d in records]), "parenttype": "Item"}):
+				barcodes.setdefault(d.parent, []).append(d.barcode)
+
+		insert_terms(doctype, {d.name: get_record_terms(d, fields, barcodes.get(d.name)) for d in records})
+
+		start += REBUILD_BATCH_SIZE
+
+
+def get_built_key(doctype):
+	return "link_search_index_built_" + frappe.scrub(doctype)
+
+
+def use_search_index(doctype, txt, searchfields=None):
+	# texts without trigrams and LIKE wildcards in the text cannot be matched by the index
+	return bool(len(cstr(txt)) >= 3 and doctype in INDEXED_FIELDS
+		and not ("%" in txt or "_" in txt)
+		and not set(searchfields or []).difference(get_indexed_fields(doctype))
+		and cint(frappe.db.get_default(get_built_key(doctype)))
+		and frappe.db.count(doctype, cache=True) >= MIN_RECORDS_FOR_INDEX)
+
+
+def get_search_index_condition(doctype, txt, searchfields=None, fieldname="name"):
+	"""
+		Returns a condition restricting `fieldname` to the records indexed with all terms of `txt`,
+		or an empty string where the search index is not used
+	"""
+	if not use_search_index(doctype, txt, searchfields):
+		return ""
+
+	terms = get_query_terms(txt)
+
+	return """ and {fieldname} in (select reference_name from `tabLink Search Term`
+		where reference_doctype = {doctype} and term in ({terms})
+		group by reference_name having count(distinct term) = {count})""".format(
+			fieldname=fieldname,
+			doctype=frappe.db.escape(doctype),
+			terms=", ".join(frappe.db.escape(term) for term in terms),
+			count=len(terms)
+		).replace("%", "%%")
+
+
+def on_doctype_update():
+	frappe.db.add_index("Link Search Term", ["reference_doctype", "term"])
+	frappe.db.add_index("Link Search Term", ["reference_doctype", "reference_name"])